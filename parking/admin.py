@@ -1,6 +1,7 @@
 # admin.py
 from django.contrib import admin
-from .models import ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy
+from .utils import normalize_plate, plate_prefix_range
+from .models import ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy, ImportJob, LiveOccupancy
 
 
 class ParkingLotAdmin(admin.ModelAdmin):
@@ -12,6 +13,17 @@ class ParkingTransactionAdmin(admin.ModelAdmin):
     list_display = ('license_plate', 'parking_lot', 'entry_time', 'exit_time', 'revenue')
     list_filter = ('parking_lot', 'entry_time')
     search_fields = ('license_plate',)
+    search_help_text = 'Plate prefix; spaces, dashes and case are ignored.'
+    list_select_related = ('parking_lot',)
+    # Skip the unfiltered COUNT(*) over the whole table on every changelist page
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # A prefix range on the indexed plate_key instead of the default icontains full scan
+        if not normalize_plate(search_term.strip()):
+            return queryset, False
+        low, high = plate_prefix_range(search_term.strip())
+        return queryset.filter(plate_key__gte=low, plate_key__lt=high), False
 
 
 class ParkingHistoryAdmin(admin.ModelAdmin):
@@ -26,8 +38,21 @@ class HourlyOccupancyAdmin(admin.ModelAdmin):
     search_fields = ('parking_lot__name',)
 
 
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'file_name', 'status', 'rows_processed', 'rows_total', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('started_at', 'heartbeat_at', 'finished_at', 'created_at')
+
+
+class LiveOccupancyAdmin(admin.ModelAdmin):
+    list_display = ('parking_lot', 'occupied', 'updated_at')
+    list_select_related = ('parking_lot',)
+
+
 # Register the models with the admin site
 admin.site.register(ParkingLot, ParkingLotAdmin)
 admin.site.register(ParkingTransaction, ParkingTransactionAdmin)
 admin.site.register(ParkingHistory, ParkingHistoryAdmin)
 admin.site.register(HourlyOccupancy, HourlyOccupancyAdmin)
+admin.site.register(ImportJob, ImportJobAdmin)
+admin.site.register(LiveOccupancy, LiveOccupancyAdmin)
@@ -0,0 +1,202 @@
+# analytics.py
+import datetime
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.timezone import get_current_timezone
+
+from .archive import archived_stays
+from .cache import change_markers
+from .models import ParkingTransaction
+from .occupancy import day_hours
+from .utils import next_month, start_of_day
+
+# Histogram edges of the dwell-time distribution, in minutes; the last bin is open-ended
+DWELL_BINS = (0, 15, 30, 60, 120, 240, 480, 720, 1440)
+DWELL_PERCENTILES = (50, 75, 90, 95, 99)
+# Exit of a session that is still open; the curve has it leave at the current time
+OPEN_EXIT = np.iinfo(np.int64).max
+
+
+class Stays:
+    """
+    Transactions of one lot as parallel int64 arrays (ids, epoch seconds), sorted by entry.
+
+    Open sessions have OPEN_EXIT as their exit, so cached arrays stay valid as time passes.
+    ``exits_sorted`` is the exit times in their own order, for counting departures with searchsorted.
+    """
+    __slots__ = ('ids', 'entries', 'exits', 'exits_sorted')
+
+    def __init__(self, ids, entries, exits):
+        order = np.argsort(entries, kind='stable')
+        self.ids = ids[order]
+        self.entries = entries[order]
+        self.exits = exits[order]
+        self.exits_sorted = np.sort(self.exits)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def concat(cls, parts):
+        # Stays crossing a month boundary are in both months; keep one copy
+        ids = np.concatenate([part.ids for part in parts]) if parts else np.empty(0, np.int64)
+        entries = np.concatenate([part.entries for part in parts]) if parts else np.empty(0, np.int64)
+        exits = np.concatenate([part.exits for part in parts]) if parts else np.empty(0, np.int64)
+        _, first = np.unique(ids, return_index=True)
+        return cls(ids[first], entries[first], exits[first])
+
+
+def epoch_seconds(value):
+    return int(value.timestamp())
+
+
+def _chunk_arrays(rows):
+    count = len(rows)
+    return (
+        np.fromiter((row[0] for row in rows), np.int64, count),
+        np.fromiter((epoch_seconds(row[1]) for row in rows), np.int64, count),
+        np.fromiter((OPEN_EXIT if row[2] is None else epoch_seconds(row[2]) for row in rows), np.int64, count),
+    )
+
+
+def load_stays(parking_lot_id, start, end, chunk_size=20000):
+    """
+    Stays of a lot overlapping [start, end), read in chunks straight into arrays: the filter of
+    occupancy.hourly_counts plus the sessions still open. Archived transactions are included.
+    """
+    rows = (
+        ParkingTransaction.objects
+        .filter(Q(exit_time__gte=start) | Q(exit_time__isnull=True), parking_lot_id=parking_lot_id, entry_time__lt=end)
+        .values_list('id', 'entry_time', 'exit_time')
+        .iterator(chunk_size=chunk_size)
+    )
+    parts = []
+    while chunk := list(islice(rows, chunk_size)):
+        parts.append(_chunk_arrays(chunk))
+
+    archived = archived_stays(parking_lot_id, start, end)
+    if archived:
+        archived_rows = [(transaction_id, entry_time, exit_time)
+                         for transaction_id, (entry_time, exit_time) in archived.items()]
+        ids, entries, exits = _chunk_arrays(archived_rows)
+        # Rows an archive run has written out but not yet deleted are loaded once
+        fresh = ~np.isin(ids, np.concatenate([part[0] for part in parts])) if parts else slice(None)
+        parts.append((ids[fresh], entries[fresh], exits[fresh]))
+
+    if not parts:
+        return Stays(np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64))
+    return Stays(*(np.concatenate(arrays) for arrays in zip(*parts)))
+
+
+_stays_cache = OrderedDict()
+_stays_lock = threading.Lock()
+
+
+def month_stays(parking_lot_id, month):
+    """
+    Stays overlapping a month, from a per-process LRU cache of ANALYTICS_CACHE_MONTHS lot-months.
+
+    Entries are keyed on the lot's transaction change marker, so any write to the lot's
+    transactions (imports, gate events, archiving) makes the next call reload.
+    """
+    marker, = change_markers([('transaction', parking_lot_id)])
+    key = (parking_lot_id, month)
+    with _stays_lock:
+        cached = _stays_cache.get(key)
+        if cached is not None and cached[0] == marker:
+            _stays_cache.move_to_end(key)
+            return cached[1]
+
+    stays = load_stays(parking_lot_id, start_of_day(month), start_of_day(next_month(month)))
+    with _stays_lock:
+        _stays_cache[key] = (marker, stays)
+        _stays_cache.move_to_end(key)
+        while len(_stays_cache) > getattr(settings, 'ANALYTICS_CACHE_MONTHS', 128):
+            _stays_cache.popitem(last=False)
+    return stays
+
+
+def clear_stays_cache():
+    with _stays_lock:
+        _stays_cache.clear()
+
+
+def period_stays(parking_lot_id, start_date, end_date):
+    # Stays overlapping the days start_date..end_date inclusive, assembled from cached months
+    months = []
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        months.append(month_stays(parking_lot_id, month))
+        month = next_month(month)
+    return months[0] if len(months) == 1 else Stays.concat(months)
+
+
+def day_bounds(start_date, end_date):
+    # Epoch seconds of each local midnight from start_date to the day after end_date
+    days = (end_date - start_date).days + 1
+    return np.array([epoch_seconds(start_of_day(start_date + datetime.timedelta(days=offset)))
+                     for offset in range(days + 1)], np.int64)
+
+
+def dwell_time(stays, start_date, end_date):
+    """
+    Distribution of the length of stays that began between start_date and end_date, in minutes:
+    count, mean, percentiles and a histogram over DWELL_BINS. Sessions still open have no length
+    yet and are left out.
+    """
+    bounds = day_bounds(start_date, end_date)
+    first, last = np.searchsorted(stays.entries, [bounds[0], bounds[-1]])
+    entries, exits = stays.entries[first:last], stays.exits[first:last]
+    closed = exits != OPEN_EXIT
+    minutes = np.sort((exits[closed] - entries[closed]) / 60)
+    edges = np.searchsorted(minutes, DWELL_BINS)
+    counts = np.diff(np.append(edges, len(minutes)))
+    return {
+        'count': len(minutes),
+        'mean_minutes': round(float(minutes.mean()), 2) if len(minutes) else None,
+        'percentiles': {
+            f'p{percentile}': round(float(value), 2)
+            for percentile, value in zip(DWELL_PERCENTILES, np.percentile(minutes, DWELL_PERCENTILES))
+        } if len(minutes) else {},
+        'histogram': [
+            {'minutes_from': low, 'minutes_to': high, 'count': int(count)}
+            for low, high, count in zip(DWELL_BINS, DWELL_BINS[1:] + (None,), counts)
+        ],
+    }
+
+
+def turnover(stays, capacity, start_date, end_date):
+    # (date, sessions started, sessions per space) for each day, counting sessions still open
+    bounds = day_bounds(start_date, end_date)
+    sessions = np.diff(np.searchsorted(stays.entries, bounds))
+    rates = np.round(sessions / capacity, 4) if capacity > 0 else np.zeros(len(sessions))
+    return [
+        (start_date + datetime.timedelta(days=offset), int(count), float(rate))
+        for offset, (count, rate) in enumerate(zip(sessions, rates))
+    ]
+
+
+def occupancy_curve(stays, capacity, day, resolution=1):
+    """
+    Vehicles parked at each ``resolution``-minute mark of a local day, counting a stay from its
+    entry up to, but not including, its exit: entries so far minus exits so far. Open sessions
+    are parked until now, which is why curves from today on are never cached.
+    """
+    minutes = np.arange(0, 60, resolution)
+    # Minutes past each of the 24 local hour starts of day_hours, as in the hourly buckets
+    hours = np.array([epoch_seconds(hour_start) for _, hour_start in day_hours(day, get_current_timezone())], np.int64)
+    marks = (hours[:, None] + minutes * 60).ravel()
+    times = [datetime.time(hour, minute) for hour in range(24) for minute in minutes.tolist()]
+    # Open sessions sort last among the exits and leave at the current time
+    still_open = len(stays) - np.searchsorted(stays.exits_sorted, OPEN_EXIT)
+    departed = (np.searchsorted(stays.exits_sorted, marks, side='right')
+                + np.where(marks >= epoch_seconds(timezone.now()), still_open, 0))
+    occupied = np.searchsorted(stays.entries, marks, side='right') - departed
+    rates = np.round(occupied * 100 / capacity, 2) if capacity > 0 else np.zeros(len(occupied))
+    return [(moment, int(count), float(rate)) for moment, count, rate in zip(times, occupied, rates)]
@@ -0,0 +1,214 @@
+# archive.py
+import heapq
+import os
+import shutil
+import uuid
+from operator import itemgetter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import localtime
+
+from .cache import record_change
+from .models import ParkingTransaction, bulk_deletion
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - only needed once transactions are archived
+    pa = None
+
+ARCHIVE_COLUMNS = ('id', 'parking_lot_id', 'license_plate', 'entry_time', 'exit_time', 'revenue')
+
+
+def archive_dir():
+    return Path(getattr(settings, 'ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive')) / 'transactions'
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImproperlyConfigured('pyarrow is required to read or write archived transactions.')
+
+
+def archive_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('parking_lot_id', pa.int64()),
+        ('license_plate', pa.string()),
+        ('entry_time', pa.timestamp('us', tz='UTC')),
+        ('exit_time', pa.timestamp('us', tz='UTC')),
+        ('revenue', pa.decimal128(10, 2)),
+    ])
+
+
+def entry_month(entry_time):
+    # Partitions follow the local calendar, like the rest of the analytics
+    return localtime(entry_time).date().replace(day=1)
+
+
+def partition_path(parking_lot_id, month):
+    return archive_dir() / f"lot={parking_lot_id}" / f"{month:%Y-%m}.parquet"
+
+
+def archived_partitions(parking_lot_ids=None, first_month=None, last_month=None):
+    """
+    Paths of the archive files for the given lots (all when None) whose month lies in
+    [first_month, last_month], either bound being optional. Only lists directories.
+    """
+    root = archive_dir()
+    if parking_lot_ids is None:
+        directories = sorted(root.glob('lot=*')) if root.is_dir() else []
+    else:
+        directories = [root / f"lot={parking_lot_id}" for parking_lot_id in sorted(set(parking_lot_ids))]
+
+    first = f"{first_month:%Y-%m}" if first_month else None
+    last = f"{last_month:%Y-%m}" if last_month else None
+    paths = []
+    for directory in directories:
+        if not directory.is_dir():
+            continue
+        for path in sorted(directory.glob('*.parquet')):
+            if (first is None or path.stem >= first) and (last is None or path.stem <= last):
+                paths.append(path)
+    return paths
+
+
+def read_archive(paths, columns, expression=None):
+    # One table for the given partition files, or None when there are none
+    if not paths:
+        return None
+    require_pyarrow()
+    dataset = ds.dataset([str(path) for path in paths], format='parquet', schema=archive_schema())
+    return dataset.to_table(columns=list(columns), filter=expression)
+
+
+def write_partition(parking_lot_id, month, rows):
+    """
+    Add rows (tuples in ARCHIVE_COLUMNS order) to a lot's month file, merging with what an
+    earlier run archived there. The file is replaced atomically, so readers never see half of it.
+    """
+    require_pyarrow()
+    path = partition_path(parking_lot_id, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pylist([dict(zip(ARCHIVE_COLUMNS, row)) for row in rows], schema=archive_schema())
+    if path.exists():
+        existing = pq.read_table(path, schema=archive_schema())
+        # Rows archived by a run that stopped before deleting them are already there
+        table = table.filter(pc.invert(pc.is_in(table.column('id'), value_set=existing.column('id'))))
+        table = pa.concat_tables([existing, table])
+    table = table.sort_by('id')
+
+    temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    try:
+        pq.write_table(table, temporary, compression='zstd')
+        os.replace(temporary, path)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+    return path
+
+
+def archive_transactions(cutoff, parking_lot_ids=None, batch_size=5000):
+    """
+    Move transactions that closed before ``cutoff`` into per-lot, per-month Parquet files.
+
+    Each month is written out before its rows leave the table, and rows are deleted in batches
+    under bulk_deletion: archiving changes no occupancy, so there are no dirty hours to mark, and
+    the change is recorded once per lot. A run that fails part way is picked up by the next one.
+    Returns {(parking_lot_id, month): rows}.
+    """
+    require_pyarrow()
+    candidates = ParkingTransaction.objects.filter(exit_time__lt=cutoff)
+    if parking_lot_ids:
+        candidates = candidates.filter(parking_lot_id__in=parking_lot_ids)
+    lot_ids = candidates.values_list('parking_lot_id', flat=True).distinct().order_by('parking_lot_id')
+
+    archived = {}
+    for parking_lot_id in list(lot_ids):
+        rows = (
+            candidates.filter(parking_lot_id=parking_lot_id)
+            .order_by('entry_time', 'id')
+            .values_list(*ARCHIVE_COLUMNS)
+        )
+        month, pending = None, []
+        for row in _fetch_in_pages(rows, batch_size):
+            row_month = entry_month(row[3])
+            if pending and row_month != month:
+                archived[(parking_lot_id, month)] = _move_partition(parking_lot_id, month, pending, cutoff, batch_size)
+                pending = []
+            month = row_month
+            pending.append(row)
+        if pending:
+            archived[(parking_lot_id, month)] = _move_partition(parking_lot_id, month, pending, cutoff, batch_size)
+        record_change('transaction', {parking_lot_id})
+    return archived
+
+
+def _fetch_in_pages(rows, page_size):
+    # Keyset pages on (entry_time, id), each read in full: no cursor stays open on the table while
+    # a month's rows are deleted, which SQLite would let skip or repeat rows
+    page = list(rows[:page_size])
+    while page:
+        yield from page
+        entry_time, last_id = page[-1][3], page[-1][0]
+        page = list(rows.filter(Q(entry_time__gt=entry_time) | Q(entry_time=entry_time, id__gt=last_id))[:page_size])
+
+
+def _move_partition(parking_lot_id, month, rows, cutoff, batch_size):
+    write_partition(parking_lot_id, month, rows)
+    ids = [row[0] for row in rows]
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic(), bulk_deletion():
+            ParkingTransaction.objects.filter(id__in=ids[start:start + batch_size], exit_time__lt=cutoff).delete()
+    return len(rows)
+
+
+def archived_stays(parking_lot_id, start, end):
+    """
+    {id: (entry_time, exit_time)} of archived transactions of a lot parked at some point in
+    [start, end), matching the hot-table filter of occupancy.hourly_counts.
+    """
+    paths = archived_partitions([parking_lot_id], last_month=entry_month(end))
+    if not paths:
+        return {}
+    require_pyarrow()
+    table = read_archive(paths, ('id', 'entry_time', 'exit_time'),
+                         (ds.field('entry_time') < end) & (ds.field('exit_time') >= start))
+    return dict(zip(table.column('id').to_pylist(),
+                    zip(table.column('entry_time').to_pylist(), table.column('exit_time').to_pylist())))
+
+
+def archived_transaction_rows(parking_lot_ids=None, start=None, end=None, batch_size=10000):
+    """
+    Archived rows in ARCHIVE_COLUMNS order with start <= entry_time < end, ordered by id.
+
+    Each partition is sorted by id when written, so its record batches are streamed and merged
+    with the others; memory stays at one batch per file.
+    """
+    paths = archived_partitions(parking_lot_ids, first_month=start and entry_month(start),
+                                last_month=end and entry_month(end))
+    if not paths:
+        return iter(())
+    require_pyarrow()
+    expression = None
+    if start is not None:
+        expression = ds.field('entry_time') >= start
+    if end is not None:
+        expression = ds.field('entry_time') < end if expression is None else expression & (ds.field('entry_time') < end)
+    return heapq.merge(*(_partition_rows(path, expression, batch_size) for path in paths), key=itemgetter(0))
+
+
+def _partition_rows(path, expression, batch_size):
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=list(ARCHIVE_COLUMNS)):
+        if expression is not None:
+            batch = batch.filter(expression)
+        yield from zip(*(batch.column(name).to_pylist() for name in ARCHIVE_COLUMNS))
+
+
+def delete_lot_archive(parking_lot_id):
+    shutil.rmtree(archive_dir() / f"lot={parking_lot_id}", ignore_errors=True)
@@ -0,0 +1,173 @@
+# async_views.py
+"""
+Async variants of the read endpoints, routed instead of the DRF views when ASYNC_READ_VIEWS is on
+(the default under asgi.py). Responses match the sync views; DRF has no async APIView, so these are
+plain Django views rendering with parking.renderers.dumps.
+"""
+import asyncio
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Sum
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+from .cache import async_cached_view
+from .live import live_occupancy_row, live_payload
+from .renderers import Rows, dumps, wants_columns
+from .models import ParkingLot, ParkingHistory, HourlyOccupancy, MonthlyRevenueRollup
+from .rollups import grand_total
+from .serializers import SummarySerializer, ParkingLotSerializer, ParkingLotDetailSerializer
+from .utils import month_range, year_range
+from .views import lot_summary, lot_history, lot_peak_hours, lot_detail
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def _run_query(query):
+    try:
+        return query()
+    finally:
+        # This pool thread's connection outlives the request otherwise; honours CONN_MAX_AGE
+        close_old_connections()
+
+
+async def gather_queries(*queries):
+    """
+    Run independent query callables at the same time, each on its own thread and connection.
+
+    The async ORM sends every query to one shared thread, so awaiting several of them together
+    still runs them one after another. With ASYNC_CONCURRENT_QUERIES off they go through that
+    thread in turn, which is what tests inside a transaction need.
+    """
+    if not getattr(settings, 'ASYNC_CONCURRENT_QUERIES', True):
+        return [await sync_to_async(query)() for query in queries]
+    return await asyncio.gather(*(sync_to_async(_run_query, thread_sensitive=False)(query) for query in queries))
+
+
+@require_GET
+@async_cached_view('summary', lambda request: [('lot', None), ('history', None)])
+async def summary(request):
+    total_revenue, lots = await gather_queries(
+        grand_total,
+        lambda: ParkingLot.objects.aggregate(totalLots=Count('id'), totalCapacity=Sum('capacity')),
+    )
+    return json_response(SummarySerializer({
+        'totalRevenue': total_revenue,
+        'totalLots': lots['totalLots'],
+        'totalCapacity': lots['totalCapacity'] or 0,
+    }).data)
+
+
+@require_GET
+@async_cached_view('parking-lot-list', lambda request: [('lot', None)])
+async def parking_lot_list(request):
+    parking_lots = [parking_lot async for parking_lot in ParkingLot.objects.all()]
+    return json_response(ParkingLotSerializer(parking_lots, many=True).data)
+
+
+@require_GET
+@async_cached_view('revenue-line', lambda request: [('history', None)])
+async def revenue_line(request):
+    revenue_data = (
+        MonthlyRevenueRollup.objects
+        .filter(parking_lot__isnull=False)
+        .values('month')
+        .annotate(monthly_revenue=Sum('total_revenue'))
+        .order_by('month')
+        .values_list('month', 'monthly_revenue')
+    )
+    rows = [(month.strftime('%B %Y'), revenue) async for month, revenue in revenue_data]
+    return json_response(Rows(['month', 'revenue'], rows, wants_columns(request)))
+
+
+@require_GET
+@async_cached_view('revenue-bar', lambda request: [('lot', None), ('history', None)])
+async def revenue_bar(request):
+    month = request.GET.get('month')
+    year = request.GET.get('year')
+    if not month or not year:
+        return json_response({'error': 'Month and year are required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        month_start = datetime.date(int(year), int(month), 1)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    revenue_data = (
+        MonthlyRevenueRollup.objects
+        .filter(month=month_start, parking_lot__isnull=False)
+        .values('parking_lot__name')
+        .annotate(monthly_revenue=Sum('total_revenue'))
+        .order_by('parking_lot__name')
+        .values_list('parking_lot__name', 'monthly_revenue')
+    )
+    return json_response(Rows(['lotName', 'revenue'], [row async for row in revenue_data], wants_columns(request)))
+
+
+@require_GET
+@async_cached_view('parking-lot-historical-occupancy', lambda request, pk: [('history', pk)])
+async def historical_occupancy(request, pk):
+    month_start, month_end = month_range(request.GET.get('month'))
+    rows = ParkingHistory.objects.filter(
+        parking_lot_id=pk, date__gte=month_start, date__lt=month_end).values_list('date', 'occupancy_rate')
+    return json_response(Rows(['date', 'occupancy_rate'], [row async for row in rows], wants_columns(request)))
+
+
+@require_GET
+@async_cached_view('parking-lot-peak-hours', lambda request, pk: [('hourly', pk)])
+async def peak_hours(request, pk):
+    selected_date = request.GET.get('date')
+    rows = HourlyOccupancy.objects.filter(
+        parking_lot_id=pk, date=parse_date(selected_date) if selected_date else None).values_list(
+        'hour', 'occupancy_rate')
+    return json_response(Rows(['hour', 'occupancy_rate'], [row async for row in rows], wants_columns(request)))
+
+
+@require_GET
+@async_cached_view('parking-lot-revenue', lambda request, pk: [('history', pk)])
+async def revenue(request, pk):
+    month_start, month_end = month_range(request.GET.get('month'))
+    rows = ParkingHistory.objects.filter(
+        parking_lot_id=pk, date__gte=month_start, date__lt=month_end).values_list('date', 'total_revenue')
+    return json_response(Rows(['date', 'total_revenue'], [row async for row in rows], wants_columns(request)))
+
+
+@require_GET
+@async_cached_view('parking-lot-monthly-revenue', lambda request, pk: [('history', pk)])
+async def monthly_revenue(request, pk):
+    selected_year = request.GET.get('year')
+    if not selected_year:
+        return json_response([])
+    year_start, year_end = year_range(selected_year)
+    rows = MonthlyRevenueRollup.objects.filter(
+        parking_lot_id=pk, month__gte=year_start, month__lt=year_end).order_by('month').values_list(
+        'month', 'total_revenue')
+    return json_response(Rows(['month', 'total_revenue'], [row async for row in rows], wants_columns(request)))
+
+
+@require_GET
+@async_cached_view('parking-lot-detail', lambda request, pk: [('lot', pk), ('history', pk), ('hourly', pk)])
+async def parking_lot_detail(request, pk):
+    # The three detail queries don't depend on each other, so they run side by side
+    parking_lot, history, hours = await gather_queries(
+        lambda: lot_summary(pk),
+        lambda: lot_history(pk, request.GET.get('month'), request.GET.get('year')),
+        lambda: lot_peak_hours(pk, request.GET.get('date')),
+    )
+    if parking_lot is None:
+        return json_response({'error': 'Parking lot not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return json_response(ParkingLotDetailSerializer(lot_detail(parking_lot, history, hours)).data)
+
+
+@require_GET
+async def live(request, pk):
+    data = live_payload(await live_occupancy_row(pk).afirst())
+    if data is None:
+        return json_response({'error': 'Parking lot not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return json_response(data)
@@ -0,0 +1,202 @@
+# benchmarks.py
+import datetime
+import io
+import itertools
+import statistics
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import urls as parking_urls
+from .exports import transaction_rows, history_rows, stream_csv, write_xlsx
+from .importers import TRANSACTION_COLUMNS, HISTORY_COLUMNS
+from .models import ParkingLot, ImportJob
+from .synthetic import SYNTHETIC_LOT_PREFIX, generate_synthetic_data, clear_synthetic_data
+
+# Query strings for the endpoints that need parameters, filled from the generated period
+URL_QUERIES = {
+    'revenue-bar': 'month={month_number}&year={year}',
+    'batch-analytics': 'lots=all&start={start}&end={end}&metrics=occupancy,revenue,peak_hours',
+    'parking-lot-historical-occupancy': 'month={month}',
+    'parking-lot-peak-hours': 'date={date}',
+    'parking-lot-revenue': 'month={month}',
+    'parking-lot-monthly-revenue': 'year={year}',
+    'parking-lot-detail': 'month={month}&year={year}&date={date}',
+    'parking-lot-dwell-time': 'month={month}',
+    'parking-lot-turnover': 'month={month}',
+    'parking-lot-occupancy-curve': 'date={date}&resolution=5',
+    'parking-transactions': 'lot={lot}&start={start}',
+    'parked-vehicles': 'plate={plate_prefix}',
+    'export_parking_transactions': 'lot={lot}&start={date}&end={date}',
+    'export_parking_history': 'lot={lot}',
+}
+# Write endpoints are timed by their own steps below
+WRITE_URLS = {'batch_import_parking_history', 'batch_import_parking_transaction', 'parking-lot-entries',
+              'parking-lot-exits'}
+
+
+def summarize(seconds):
+    milliseconds = sorted(value * 1000 for value in seconds)
+    return {
+        'runs': len(milliseconds),
+        'min_ms': round(milliseconds[0], 3),
+        'median_ms': round(statistics.median(milliseconds), 3),
+        'p95_ms': round(milliseconds[min(len(milliseconds) - 1, int(0.95 * len(milliseconds)))], 3),
+    }
+
+
+def timed_request(client, method, url, repeat=1, data=None):
+    timings, queries = [], 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data) if data is not None else getattr(client, method)(url)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            timings.append(time.perf_counter() - started)
+        queries = len(context.captured_queries)
+    return {'status': response.status_code, 'queries': queries, 'bytes': len(content), **summarize(timings)}
+
+
+def url_context(start_date, end_date):
+    lot = ParkingLot.objects.filter(name__startswith=SYNTHETIC_LOT_PREFIX).order_by('id').first()
+    plate = lot.parkingtransaction_set.values_list('plate_key', flat=True).first() or 'A'
+    job = ImportJob.objects.create(kind=ImportJob.KIND_PARKING_HISTORY, file_name='benchmark.csv',
+                                   status=ImportJob.STATUS_SUCCEEDED)
+    middle = start_date + (end_date - start_date) / 2
+    return {
+        'lot': lot.id,
+        'job': job.id,
+        'plate_prefix': plate[:2],
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'date': middle.isoformat(),
+        'month': middle.strftime('%Y-%m'),
+        'month_number': middle.month,
+        'year': middle.year,
+    }
+
+
+def time_urls(client, context, repeat):
+    # Every GET route in parking/urls.py; a new route without parameters here still gets timed
+    results = {}
+    for pattern in parking_urls.urlpatterns:
+        if pattern.name in WRITE_URLS:
+            continue
+        kwargs = {}
+        if 'pk' in pattern.pattern.converters:
+            kwargs['pk'] = context['job'] if pattern.name == 'import-job' else context['lot']
+        url = reverse(pattern.name, kwargs=kwargs)
+        query = URL_QUERIES.get(pattern.name)
+        if query:
+            url = f"{url}?{query.format(**context)}"
+        results[pattern.name] = {'url': url, **timed_request(client, 'get', url, repeat)}
+    return results
+
+
+def time_gate_events(client, lot_id, repeat):
+    # Entries for fresh plates, then their exits, so every event succeeds
+    plates = [f"BENCH{i:04d}" for i in range(repeat)]
+    events = {
+        'parking-lot-entries': lambda plate: {'licensePlate': plate},
+        'parking-lot-exits': lambda plate: {'licensePlate': plate, 'revenue': '5.00'},
+    }
+    results = {}
+    for name, data in events.items():
+        url = reverse(name, kwargs={'pk': lot_id})
+        timings = []
+        for plate in plates:
+            started = time.perf_counter()
+            response = client.post(url, data(plate))
+            timings.append(time.perf_counter() - started)
+        results[name] = {'url': url, 'status': response.status_code, **summarize(timings)}
+    return results
+
+
+def upload(headers, rows, file_format, title):
+    if file_format == 'csv':
+        content = ''.join(stream_csv(headers, rows)).encode()
+    else:
+        with write_xlsx(headers, rows, title) as output:
+            content = output.read()
+    return SimpleUploadedFile(f'benchmark.{file_format}', content)
+
+
+def time_imports(client, import_rows):
+    results = {}
+    for file_format in ('csv', 'xlsx'):
+        transactions = upload(TRANSACTION_COLUMNS, itertools.islice(transaction_rows(), import_rows), file_format,
+                              'Parking Transactions')
+        result = timed_request(client, 'post', f"{reverse('batch_import_parking_transaction')}?background=0",
+                               data={'file': transactions})
+        results[f'batch_import_parking_transaction:{file_format}'] = {'rows': import_rows, **result}
+
+        history = upload(HISTORY_COLUMNS, list(history_rows()), file_format, 'Parking History')
+        result = timed_request(client, 'post', f"{reverse('batch_import_parking_history')}?background=0",
+                               data={'file': history})
+        results[f'batch_import_parking_history:{file_format}'] = result
+    return results
+
+
+def time_command(*args):
+    started = time.perf_counter()
+    call_command(*args, stdout=io.StringIO())
+    return round(time.perf_counter() - started, 3)
+
+
+def run_scale(transactions, lots=10, days=90, start_date=datetime.date(2024, 1, 1), seed=42, repeat=5,
+              import_rows=5000):
+    """
+    Generate one data set and time every endpoint, the import views and calculate_hourly_occupancy on it.
+
+    Runs against the current database and replaces any synthetic lots already there.
+    """
+    clear_synthetic_data()
+    started = time.perf_counter()
+    counts = generate_synthetic_data(lots=lots, transactions=transactions, days=days, start_date=start_date,
+                                     seed=seed)
+    generate_seconds = round(time.perf_counter() - started, 3)
+
+    end_date = start_date + datetime.timedelta(days=days - 1)
+    client = Client()
+    context = url_context(start_date, end_date)
+    result = {
+        'transactions': transactions,
+        'lots': lots,
+        'days': days,
+        'rows': counts,
+        'generate_seconds': generate_seconds,
+        'urls': time_urls(client, context, repeat),
+        'gate_events': time_gate_events(client, context['lot'], repeat),
+        'calculate_hourly_occupancy': {
+            'full_seconds': time_command('calculate_hourly_occupancy', '--start', context['start'],
+                                         '--end', context['end'], '--workers', '1'),
+        },
+    }
+    # Imports last: they add rows and leave hours dirty for the incremental run
+    result['imports'] = time_imports(client, min(import_rows, transactions))
+    result['calculate_hourly_occupancy']['incremental_seconds'] = time_command(
+        'calculate_hourly_occupancy', '--incremental', '--workers', '1')
+    return result
+
+
+def regressions(baseline, current, tolerance=0.2):
+    # (scale, metric, before, after) for timings more than ``tolerance`` slower than the baseline
+    def timings(results):
+        for scale in results['scales']:
+            for section in ('urls', 'gate_events', 'imports'):
+                for name, entry in scale[section].items():
+                    yield (scale['transactions'], f'{section}.{name}'), entry['median_ms']
+            for name, seconds in scale['calculate_hourly_occupancy'].items():
+                yield (scale['transactions'], f'calculate_hourly_occupancy.{name}'), seconds * 1000
+
+    before = dict(timings(baseline))
+    return [
+        (scale, metric, before[(scale, metric)], value)
+        for (scale, metric), value in timings(current)
+        if (scale, metric) in before and value > before[(scale, metric)] * (1 + tolerance)
+    ]
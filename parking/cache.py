@@ -0,0 +1,202 @@
+# cache.py
+import functools
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import read_from_replica
+
+STATS_KEY = 'parking:cache-stats:{outcome}:{name}'
+MARKER_KEY = 'parking:changed:{table}:{scope}'
+
+
+def dashboard_cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def record_change(table, lot_ids=()):
+    """
+    Note a write to one of the served tables, optionally scoped to some parking lots.
+
+    Runs once the writing transaction commits, so readers never cache or tag pre-commit
+    data under the new markers. Only responses depending on the touched scopes change key.
+    """
+    lot_ids = set(lot_ids)
+    transaction.on_commit(lambda: _record_change(table, lot_ids))
+
+
+def _record_change(table, lot_ids):
+    # Plain sets rather than counters: concurrent writers can't lose an update, any new value invalidates
+    changed_at = time.time_ns()
+    markers = {MARKER_KEY.format(table=table, scope='all'): changed_at}
+    markers.update({MARKER_KEY.format(table=table, scope=lot_id): changed_at for lot_id in lot_ids})
+    dashboard_cache().set_many(markers, timeout=None)
+
+
+def change_markers(scopes):
+    """
+    Last change time (ns) of each (table, lot_id or None) scope, from the cache only.
+
+    A scope without a marker gets one set to now: clients then re-fetch once, which is
+    always safe.
+    """
+    cache = dashboard_cache()
+    keys = [MARKER_KEY.format(table=table, scope='all' if lot_id is None else lot_id) for table, lot_id in scopes]
+    markers = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in markers}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        markers.update(missing)
+    return [markers[key] for key in keys]
+
+
+def _count(outcome, name):
+    cache = dashboard_cache()
+    key = STATS_KEY.format(outcome=outcome, name=name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats(names):
+    cache = dashboard_cache()
+    values = cache.get_many([STATS_KEY.format(outcome=outcome, name=name)
+                             for name in names for outcome in ('hit', 'miss')])
+    endpoints = {
+        name: {
+            'hits': values.get(STATS_KEY.format(outcome='hit', name=name), 0),
+            'misses': values.get(STATS_KEY.format(outcome='miss', name=name), 0),
+        }
+        for name in names
+    }
+    hits = sum(entry['hits'] for entry in endpoints.values())
+    misses = sum(entry['misses'] for entry in endpoints.values())
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hitRate': round(hits / (hits + misses), 4) if hits + misses else None,
+        'endpoints': endpoints,
+    }
+
+
+def _query_params(request):
+    # request.GET works for both Django and DRF requests
+    return sorted((key, value) for key in request.GET for value in request.GET.getlist(key))
+
+
+def response_digest(name, request, kwargs, markers):
+    raw = repr((name, sorted(kwargs.items()), _query_params(request), markers))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _cached_lookup(name, scopes, request, kwargs, suffix=''):
+    """
+    (etag, last_modified, cache key, cached entry) for a request, from the change markers of
+    the scopes the response depends on.
+
+    The markers are part of both the ETag and the cache key, so a write only retires the
+    responses of the scopes it touched. The key is None when the client's copy is current.
+    """
+    markers = change_markers(scopes(request, **kwargs))
+    digest = response_digest(name, request, kwargs, markers)
+    etag, last_modified = quote_etag(digest), int(max(markers) // 1_000_000_000)
+    if get_conditional_response(request, etag=etag, last_modified=last_modified) is not None:
+        return etag, last_modified, None, None
+    key = f"parking:response:{digest}{suffix}"
+    cached = dashboard_cache().get(key)
+    _count('hit' if cached is not None else 'miss', name)
+    return etag, last_modified, key, cached
+
+
+def _not_modified(request, etag, last_modified):
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response.status_code == status.HTTP_304_NOT_MODIFIED:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def cached_get(name, scopes, cacheable=None):
+    """
+    ETag / Last-Modified validation and response caching for an APIView ``get``.
+
+    ``scopes(request, **kwargs)`` returns the (table, lot_id or None) pairs the response depends on.
+    If-None-Match / If-Modified-Since are answered with 304 before the view runs any query, and
+    successful responses are cached under their change markers. Requests for which
+    ``cacheable(request, **kwargs)`` is false depend on more than the markers (the current time)
+    and are always computed, without validators.
+
+    Misses are computed on the primary: markers move when the primary commits, and a lagging
+    replica would get its older data cached and tagged as current until the next write.
+    """
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            if cacheable is not None and not cacheable(request, **kwargs):
+                _count('miss', name)
+                return get(self, request, *args, **kwargs)
+            etag, last_modified, key, cached = _cached_lookup(name, scopes, request, kwargs)
+            if key is None:
+                return _not_modified(request, etag, last_modified)
+
+            if cached is not None:
+                response = Response(cached, status=status.HTTP_200_OK)
+            else:
+                with read_from_replica(False):
+                    response = get(self, request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    data = list(response.data) if isinstance(response.data, QuerySet) else response.data
+                    response.data = data
+                    dashboard_cache().set(key, data, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 24 * 60 * 60))
+            if response.status_code == status.HTTP_200_OK:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def async_cached_view(name, scopes):
+    """
+    cached_get for ``async def view(request, **kwargs)`` function views.
+
+    Entries hold the rendered JSON body, so a hit is returned without touching the view or
+    re-encoding; cache and marker reads run in one hop to the sync thread.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, **kwargs):
+            etag, last_modified, key, cached = await sync_to_async(_cached_lookup)(
+                name, scopes, request, kwargs, ':json')
+            if key is None:
+                return _not_modified(request, etag, last_modified)
+
+            if cached is not None:
+                response = HttpResponse(cached, content_type='application/json')
+            else:
+                with read_from_replica(False):
+                    response = await view(request, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    await sync_to_async(dashboard_cache().set)(
+                        key, response.content, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 24 * 60 * 60))
+            if response.status_code == status.HTTP_200_OK:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
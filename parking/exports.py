@@ -0,0 +1,115 @@
+# exports.py
+import csv
+import datetime
+import heapq
+import tempfile
+from operator import itemgetter
+
+import openpyxl
+from django.utils.timezone import localtime
+
+from .archive import archived_transaction_rows
+from .importers import TRANSACTION_COLUMNS, HISTORY_COLUMNS
+from .models import ParkingLot, ParkingTransaction, ParkingHistory
+from .utils import start_of_day
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    # csv.writer target that hands each formatted line straight back
+    def write(self, value):
+        return value
+
+
+def distinct_ids(rows):
+    # Rows an archive run has written out but not yet deleted come from both sources, one after the other
+    last_id = None
+    for row in rows:
+        if row[0] != last_id:
+            yield row
+        last_id = row[0]
+
+
+def transaction_rows(parking_lot_ids=None, start_date=None, end_date=None):
+    # Same columns and time format the transaction importer reads back; archived rows are merged in by id
+    transactions = ParkingTransaction.objects.order_by('id')
+    start = start_of_day(start_date) if start_date else None
+    end = start_of_day(end_date + datetime.timedelta(days=1)) if end_date else None
+    if parking_lot_ids:
+        transactions = transactions.filter(parking_lot_id__in=parking_lot_ids)
+    if start:
+        transactions = transactions.filter(entry_time__gte=start)
+    if end:
+        transactions = transactions.filter(entry_time__lt=end)
+
+    rows = transactions.values_list('id', 'parking_lot__name', 'license_plate', 'entry_time', 'exit_time', 'revenue')
+    rows = rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    lots = ParkingLot.objects.filter(id__in=parking_lot_ids) if parking_lot_ids else ParkingLot.objects.all()
+    lot_names = dict(lots.values_list('id', 'name'))
+    archived = (
+        (transaction_id, lot_names[lot_id], *rest)
+        for transaction_id, lot_id, *rest in archived_transaction_rows(parking_lot_ids or None, start, end)
+        if lot_id in lot_names
+    )
+    rows = distinct_ids(heapq.merge(archived, rows, key=itemgetter(0)))
+
+    for _, lot_name, license_plate, entry_time, exit_time, revenue in rows:
+        yield (
+            lot_name,
+            license_plate,
+            localtime(entry_time).replace(tzinfo=None),
+            localtime(exit_time).replace(tzinfo=None) if exit_time else None,
+            revenue,
+        )
+
+
+def history_rows(parking_lot_ids=None, start_date=None, end_date=None):
+    history = ParkingHistory.objects.order_by('parking_lot_id', 'date')
+    if parking_lot_ids:
+        history = history.filter(parking_lot_id__in=parking_lot_ids)
+    if start_date:
+        history = history.filter(date__gte=start_date)
+    if end_date:
+        history = history.filter(date__lte=end_date)
+
+    rows = history.values_list('parking_lot__name', 'date', 'occupancy_rate', 'total_revenue')
+    yield from rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def write_xlsx(headers, rows, title):
+    """
+    Write rows with openpyxl's write-only mode into a temporary file and return it rewound.
+
+    Rows go to disk as they are produced, so memory stays flat; the file is streamed out afterwards.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+EXPORTS = {
+    'parking_transaction': (TRANSACTION_COLUMNS, transaction_rows, 'Parking Transactions'),
+    'parking_history': (HISTORY_COLUMNS, history_rows, 'Parking History'),
+}
@@ -0,0 +1,362 @@
+# importers.py
+import importlib
+import os
+from contextlib import nullcontext
+from decimal import Decimal
+from itertools import islice
+
+import openpyxl
+import pandas as pd
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ParkingLot, ParkingTransaction, ParkingHistory
+from .utils import normalize_plate
+
+TRANSACTION_COLUMNS = ["Parking Lot", "License Plate", "Entry Time", "Exit Time", "Revenue"]
+HISTORY_COLUMNS = ["parking_lot", "date", "occupancy_rate", "total_revenue"]
+
+
+class ImportValidationError(Exception):
+    pass
+
+
+def read_xlsx_chunks(file, chunk_size=5000):
+    """
+    Yield the active sheet as DataFrames of at most chunk_size rows, keyed by the header row.
+
+    The workbook is opened in read-only mode so rows are streamed from the file instead of
+    being loaded into memory all at once.
+    """
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(value).strip() if value is not None else '' for value in header]
+        first_row = 2
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            frame = pd.DataFrame(chunk, columns=columns, dtype=object)
+            frame.index = range(first_row, first_row + len(chunk))
+            first_row += len(chunk)
+            yield frame.dropna(how='all')
+    finally:
+        workbook.close()
+
+
+def read_csv_chunks(file, chunk_size=5000):
+    # Values stay as strings; the record builders convert whole columns at once
+    with pd.read_csv(file, chunksize=chunk_size, dtype=str, skipinitialspace=True) as reader:
+        first_row = 2
+        for frame in reader:
+            frame.columns = [str(column).strip() for column in frame.columns]
+            frame.index = range(first_row, first_row + len(frame))
+            first_row += len(frame)
+            yield frame.dropna(how='all')
+
+
+def read_parquet_chunks(file, chunk_size=5000):
+    # Reads one row group at a time, split into batches of at most chunk_size rows
+    pq = _import_pyarrow('parquet')
+    yield from _number_rows(batch.to_pandas() for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_size))
+
+
+def read_arrow_chunks(file, chunk_size=5000):
+    ipc = _import_pyarrow('ipc')
+    reader = ipc.open_file(file)
+    batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    yield from _number_rows(
+        batch.slice(offset, chunk_size).to_pandas()
+        for batch in batches
+        for offset in range(0, batch.num_rows, chunk_size)
+    )
+
+
+def _import_pyarrow(module):
+    try:
+        return importlib.import_module(f'pyarrow.{module}')
+    except ImportError:
+        raise ImportValidationError('Parquet and Arrow uploads require the pyarrow package.')
+
+
+def _number_rows(frames):
+    first_row = 1
+    for frame in frames:
+        frame.index = range(first_row, first_row + len(frame))
+        first_row += len(frame)
+        yield frame
+
+
+UPLOAD_READERS = {
+    '.xlsx': read_xlsx_chunks,
+    '.csv': read_csv_chunks,
+    '.parquet': read_parquet_chunks,
+    '.pq': read_parquet_chunks,
+    '.arrow': read_arrow_chunks,
+    '.feather': read_arrow_chunks,
+}
+
+
+def read_upload_chunks(file, chunk_size=5000):
+    # Pick a reader from the file extension; anything unrecognised is treated as Excel as before
+    extension = os.path.splitext(file.name or '')[1].lower()
+    reader = UPLOAD_READERS.get(extension, read_xlsx_chunks)
+    return reader(file, chunk_size=chunk_size)
+
+
+def require_columns(frame, columns):
+    missing = [column for column in columns if column not in frame.columns]
+    if missing:
+        raise ImportValidationError(f"Missing columns: {', '.join(missing)}")
+
+
+# A time of day followed by a UTC offset, as in "2024-03-31T01:30:00+01:00" or "...Z"
+UTC_OFFSET = r'\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:[Zz]|[+-]\d{2}(?::?\d{2})?)$'
+
+
+def has_utc_offset(values):
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return pd.Series(True, index=values.index)
+    if pd.api.types.is_datetime64_dtype(values.dtype):
+        return pd.Series(False, index=values.index)
+    return values.astype('string').str.strip().str.contains(UTC_OFFSET, na=False)
+
+
+def parse_datetimes(values, column, required=False):
+    """
+    Vectorized parse of a column of datetimes/ISO strings into aware timestamps.
+
+    Values with a UTC offset keep it, even when the offsets differ within the column (an export
+    spanning a DST change); naive values are in the current time zone.
+    """
+    offset = has_utc_offset(values)
+    try:
+        naive = pd.to_datetime(values.mask(offset), errors='coerce', format='ISO8601')
+        aware = pd.to_datetime(values.where(offset), errors='coerce', format='ISO8601', utc=True)
+    except (ValueError, TypeError) as e:
+        raise ImportValidationError(f"Invalid {column}: {e}")
+    invalid = naive.isna() & aware.isna() & values.notna()
+    if required:
+        invalid |= values.isna()
+    if invalid.any():
+        raise ImportValidationError(f"Invalid {column} in row(s) {_row_list(values.index[invalid])}")
+
+    current_timezone = timezone.get_current_timezone()
+    if naive.dt.tz is None:
+        naive = naive.dt.tz_localize(current_timezone)
+    return naive.dt.tz_convert(current_timezone).where(~offset, aware.dt.tz_convert(current_timezone))
+
+
+def parse_decimals(values, column, default=0, required=False):
+    parsed = pd.to_numeric(values, errors='coerce')
+    invalid = parsed.isna() & values.notna()
+    if required:
+        invalid |= values.isna()
+    if invalid.any():
+        raise ImportValidationError(f"Invalid {column} in row(s) {_row_list(values.index[invalid])}")
+    if default is None:
+        return parsed.round(2)
+    return parsed.fillna(default).round(2)
+
+
+def to_decimal(value):
+    return None if pd.isna(value) else Decimal(f"{value:.2f}")
+
+
+def resolve_lots(names, lot_ids):
+    names = names.astype('string').str.strip()
+    resolved = names.map(lot_ids)
+    unknown = resolved.isna()
+    if unknown.any():
+        missing = sorted(set(names[unknown].fillna('')))
+        raise ImportValidationError(f"Parking lot {', '.join(missing)} does not exist.")
+    return resolved.astype('int64')
+
+
+def _row_list(index, limit=10):
+    rows = [str(row) for row in index[:limit]]
+    if len(index) > limit:
+        rows.append('...')
+    return ', '.join(rows)
+
+
+def transaction_records(frame, lot_ids):
+    require_columns(frame, TRANSACTION_COLUMNS)
+    parking_lot_ids = resolve_lots(frame["Parking Lot"], lot_ids)
+    entry_times = parse_datetimes(frame["Entry Time"], "Entry Time", required=True)
+    exit_times = parse_datetimes(frame["Exit Time"], "Exit Time")
+    revenues = parse_decimals(frame["Revenue"], "Revenue")
+    plates = frame["License Plate"].astype('string').str.strip()
+    if plates.isna().any():
+        raise ImportValidationError(f"Missing License Plate in row(s) {_row_list(frame.index[plates.isna()])}")
+
+    return [
+        ParkingTransaction(
+            parking_lot_id=parking_lot_id,
+            license_plate=plate,
+            entry_time=entry_time.to_pydatetime(),
+            exit_time=None if pd.isna(exit_time) else exit_time.to_pydatetime(),
+            revenue=to_decimal(revenue),
+        )
+        for parking_lot_id, plate, entry_time, exit_time, revenue in zip(
+            parking_lot_ids, plates, entry_times, exit_times, revenues)
+    ]
+
+
+def import_parking_transactions(chunks, batch_size=5000, progress=None, atomic=True):
+    """
+    Insert transactions from an iterable of DataFrame chunks in fixed-size batches.
+
+    With atomic=True everything runs in one database transaction, so a bad row anywhere rejects
+    the whole file. Otherwise each chunk commits on its own; progress(rows) runs inside the chunk's
+    transaction, so a progress count saved there always matches the rows committed.
+    """
+    lot_ids = dict(ParkingLot.objects.values_list('name', 'id'))
+    imported = 0
+    with transaction.atomic() if atomic else nullcontext():
+        for frame in chunks:
+            records = transaction_records(frame, lot_ids)
+            try:
+                with transaction.atomic():
+                    for start in range(0, len(records), batch_size):
+                        ParkingTransaction.objects.bulk_create(records[start:start + batch_size])
+                    imported += len(records)
+                    if progress:
+                        progress(imported)
+            except IntegrityError:
+                # unique_open_session: the rows open a plate twice in a lot, or reopen a parked one
+                raise ImportValidationError(
+                    f"Rows {frame.index[0]}-{frame.index[-1]} open a second session for a vehicle already parked.")
+    return imported
+
+
+def history_records(frame, lot_ids):
+    # Older sheets may carry other header labels; the column order has always been fixed
+    if list(frame.columns) != HISTORY_COLUMNS and len(frame.columns) == len(HISTORY_COLUMNS):
+        frame = frame.set_axis(HISTORY_COLUMNS, axis=1)
+    require_columns(frame, HISTORY_COLUMNS)
+    parking_lot_ids = resolve_lots(frame["parking_lot"], lot_ids)
+    dates = parse_datetimes(frame["date"], "date", required=True).dt.date
+    occupancy_rates = parse_decimals(frame["occupancy_rate"], "occupancy_rate", default=None)
+    total_revenues = parse_decimals(frame["total_revenue"], "total_revenue", required=True)
+
+    # A day listed twice in the same sheet keeps its last row
+    records = {}
+    for parking_lot_id, day, occupancy_rate, total_revenue in zip(
+            parking_lot_ids, dates, occupancy_rates, total_revenues):
+        records[(parking_lot_id, day)] = ParkingHistory(
+            parking_lot_id=parking_lot_id,
+            date=day,
+            occupancy_rate=to_decimal(occupancy_rate),
+            total_revenue=to_decimal(total_revenue),
+        )
+    return records
+
+
+def upsert_parking_history(chunks, batch_size=5000, progress=None, atomic=True):
+    """
+    Insert or update ParkingHistory rows on their (parking_lot, date) key.
+
+    Re-importing the same sheet is a no-op; returns counts of inserted, updated and unchanged rows.
+    """
+    lot_ids = dict(ParkingLot.objects.values_list('name', 'id'))
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    rows = 0
+    with transaction.atomic() if atomic else nullcontext():
+        for frame in chunks:
+            records = list(history_records(frame, lot_ids).items())
+            with transaction.atomic():
+                for start in range(0, len(records), batch_size):
+                    counts_batch = _upsert_history_batch(dict(records[start:start + batch_size]))
+                    for key, value in counts_batch.items():
+                        counts[key] += value
+                rows += len(frame)
+                if progress:
+                    progress(rows)
+    return counts
+
+
+def validate_upload(chunks, build_records, check_records=None):
+    # Convert every chunk without writing anything, passing the records to check_records(frame, records)
+    # when given; returns the number of data rows
+    lot_ids = dict(ParkingLot.objects.values_list('name', 'id'))
+    rows = 0
+    for frame in chunks:
+        records = build_records(frame, lot_ids)
+        if check_records:
+            check_records(frame, records)
+        rows += len(frame)
+    return rows
+
+
+def open_session_check(committed_rows=0):
+    """
+    A validate_upload check for transaction records: rejects rows opening a second session for a
+    vehicle in a lot (see unique_open_session), twice within the file or while it is already parked.
+
+    The first ``committed_rows`` rows were imported by an earlier attempt of the same job, so they
+    are only compared with the rest of the file, not with the open sessions they created.
+    """
+    opened = {}
+    position = 0
+
+    def check(frame, records):
+        nonlocal position
+        fresh = {}
+        for row, record in zip(frame.index, records):
+            if record.exit_time is None:
+                key = (record.parking_lot_id, normalize_plate(record.license_plate))
+                if key in opened:
+                    raise ImportValidationError(f"Row {row} opens a second session for {record.license_plate}, "
+                                                f"already open in row {opened[key]}.")
+                opened[key] = row
+                if position >= committed_rows:
+                    fresh[key] = row
+            position += 1
+        if not fresh:
+            return
+        parked = set(
+            ParkingTransaction.objects
+            .filter(exit_time__isnull=True, parking_lot_id__in={key[0] for key in fresh},
+                    plate_key__in={key[1] for key in fresh})
+            .values_list('parking_lot_id', 'plate_key')
+        )
+        conflicts = sorted(row for key, row in fresh.items() if key in parked)
+        if conflicts:
+            raise ImportValidationError(f"Vehicle already parked in row(s) {_row_list(pd.Index(conflicts))}")
+
+    return check
+
+
+def _upsert_history_batch(records):
+    existing = {
+        (parking_lot_id, day): (occupancy_rate, total_revenue)
+        for parking_lot_id, day, occupancy_rate, total_revenue in ParkingHistory.objects.filter(
+            parking_lot_id__in={key[0] for key in records},
+            date__in={key[1] for key in records},
+        ).values_list('parking_lot_id', 'date', 'occupancy_rate', 'total_revenue')
+    }
+
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    changed = []
+    for key, record in records.items():
+        if key not in existing:
+            counts['inserted'] += 1
+        elif existing[key] != (record.occupancy_rate, record.total_revenue):
+            counts['updated'] += 1
+        else:
+            counts['unchanged'] += 1
+            continue
+        changed.append(record)
+
+    ParkingHistory.objects.bulk_create(
+        changed,
+        update_conflicts=True,
+        unique_fields=['parking_lot', 'date'],
+        update_fields=['occupancy_rate', 'total_revenue'],
+    )
+    return counts
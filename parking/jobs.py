@@ -0,0 +1,117 @@
+# jobs.py
+import logging
+import os
+import uuid
+from contextlib import closing
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .importers import (ImportValidationError, read_upload_chunks, validate_upload, open_session_check,
+                        transaction_records, history_records, import_parking_transactions, upsert_parking_history)
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# kind: (build_records, importer, check factory taking the rows already committed, or None)
+IMPORTERS = {
+    ImportJob.KIND_PARKING_TRANSACTION: (transaction_records, import_parking_transactions, open_session_check),
+    ImportJob.KIND_PARKING_HISTORY: (history_records, upsert_parking_history, None),
+}
+
+
+def spool_dir():
+    return Path(getattr(settings, 'IMPORT_SPOOL_DIR', Path(settings.BASE_DIR) / 'import_spool'))
+
+
+def submit_import(kind, upload):
+    # Copy the upload to disk chunk by chunk and queue it for process_imports
+    directory = spool_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    extension = os.path.splitext(upload.name or '')[1].lower()
+    path = directory / f"{uuid.uuid4().hex}{extension}"
+    with open(path, 'wb') as spooled:
+        for chunk in upload.chunks():
+            spooled.write(chunk)
+    return ImportJob.objects.create(kind=kind, file_name=upload.name or '', file_path=str(path))
+
+
+def requeue_stale_jobs():
+    # A worker that died mid-import stops beating; its job goes back to the queue and resumes
+    stale = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_JOB_TIMEOUT', 300))
+    return ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING).filter(
+        Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True, started_at__lt=stale)
+    ).update(status=ImportJob.STATUS_PENDING)
+
+
+def claim_next_job():
+    # The conditional update makes sure only one worker picks up a given job
+    requeue_stale_jobs()
+    for job_id in ImportJob.objects.filter(status=ImportJob.STATUS_PENDING).order_by('id').values_list('id', flat=True):
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(id=job_id, status=ImportJob.STATUS_PENDING).update(
+            status=ImportJob.STATUS_RUNNING, started_at=now, heartbeat_at=now)
+        if claimed:
+            return ImportJob.objects.get(id=job_id)
+    return None
+
+
+def skip_rows(chunks, rows):
+    # Drop the first ``rows`` data rows, which a previous attempt already committed
+    for frame in chunks:
+        if rows >= len(frame):
+            rows -= len(frame)
+            continue
+        yield frame.iloc[rows:] if rows else frame
+        rows = 0
+
+
+def run_job(job):
+    """
+    Validate the spooled file in full, then import it chunk by chunk while recording progress.
+
+    Validation errors reject the file before anything is written; each chunk commits on its own
+    together with rows_processed, so the status endpoint can follow it and a job re-queued after a
+    worker crash resumes after the last committed chunk.
+    """
+    build_records, importer, check = IMPORTERS[job.kind]
+    resume_from = job.rows_processed
+
+    def progress(rows):
+        job.rows_processed = resume_from + rows
+        ImportJob.objects.filter(id=job.id).update(rows_processed=job.rows_processed, heartbeat_at=timezone.now())
+
+    def heartbeat(chunks):
+        for frame in chunks:
+            ImportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now())
+            yield frame
+
+    try:
+        # Close the chunk reader before its file, even when a chunk fails validation
+        with open(job.file_path, 'rb') as spooled, closing(read_upload_chunks(spooled)) as chunks:
+            job.rows_total = validate_upload(heartbeat(chunks), build_records, check and check(resume_from))
+        ImportJob.objects.filter(id=job.id).update(rows_total=job.rows_total)
+
+        with open(job.file_path, 'rb') as spooled, closing(read_upload_chunks(spooled)) as chunks:
+            result = importer(heartbeat(skip_rows(chunks, resume_from)), progress=progress, atomic=False)
+        job.result = result if isinstance(result, dict) else {'imported': resume_from + result}
+        job.status = ImportJob.STATUS_SUCCEEDED
+    except ImportValidationError as e:
+        job.status = ImportJob.STATUS_FAILED
+        job.error = str(e)
+    except Exception as e:
+        logger.exception("Import job %s failed", job.id)
+        job.status = ImportJob.STATUS_FAILED
+        job.error = f"Error processing file: {e}"
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'rows_total', 'rows_processed', 'result', 'error', 'finished_at'])
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+    return job
+
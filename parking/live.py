@@ -0,0 +1,153 @@
+# live.py
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ParkingLot, ParkingTransaction, LiveOccupancy
+from .utils import normalize_plate
+
+
+class GateEventError(Exception):
+    pass
+
+
+def adjust_live_occupancy(parking_lot_id, delta):
+    # A single-row UPDATE ... SET occupied = occupied + delta; the row lock serialises gates of the same lot
+    updated = LiveOccupancy.objects.filter(parking_lot_id=parking_lot_id).update(
+        occupied=Greatest(F('occupied') + delta, Value(0)), updated_at=timezone.now())
+    if not updated:
+        # First event for this lot: start from the open transactions, which already include this one
+        reconcile_live_occupancy([parking_lot_id])
+
+
+@transaction.atomic
+def record_entry(parking_lot, license_plate, entry_time=None):
+    # unique_open_session settles entries racing past this check; the loser rolls back its savepoint
+    already_parked = GateEventError(f"{license_plate} is already parked in {parking_lot.name}.")
+    if ParkingTransaction.objects.filter(plate_key=normalize_plate(license_plate), parking_lot=parking_lot,
+                                         exit_time__isnull=True).exists():
+        raise already_parked
+    try:
+        with transaction.atomic():
+            parking_transaction = ParkingTransaction.objects.create(
+                parking_lot=parking_lot, license_plate=license_plate, entry_time=entry_time or timezone.now())
+    except IntegrityError:
+        raise already_parked
+    adjust_live_occupancy(parking_lot.id, 1)
+    return parking_transaction
+
+
+@transaction.atomic
+def record_exit(parking_lot, license_plate, exit_time=None, revenue=None):
+    parking_transaction = (
+        ParkingTransaction.objects
+        .select_for_update()
+        .filter(plate_key=normalize_plate(license_plate), parking_lot=parking_lot, exit_time__isnull=True)
+        .order_by('-entry_time')
+        .first()
+    )
+    if parking_transaction is None:
+        raise GateEventError(f"{license_plate} has no open session in {parking_lot.name}.")
+    parking_transaction.exit_time = exit_time or timezone.now()
+    if parking_transaction.exit_time < parking_transaction.entry_time:
+        raise GateEventError('Exit time is before the entry time.')
+    if revenue is not None:
+        parking_transaction.revenue = revenue
+    parking_transaction.save(update_fields=['exit_time', 'revenue'])
+    adjust_live_occupancy(parking_lot.id, -1)
+    return parking_transaction
+
+
+def close_duplicate_open_sessions(dry_run=False):
+    """
+    Close every open session followed by a later open session of the same vehicle in the same lot,
+    at that later entry: the vehicle must have left before coming back. These predate the
+    unique_open_session constraint. Returns the closed transactions, with their new exit times.
+    """
+    open_sessions = (
+        ParkingTransaction.objects
+        .filter(exit_time__isnull=True)
+        .order_by('parking_lot_id', 'plate_key', 'entry_time', 'id')
+        .only('id', 'parking_lot_id', 'license_plate', 'plate_key', 'entry_time', 'exit_time')
+    )
+    closed, previous = [], None
+    for session in open_sessions.iterator():
+        if previous is not None and (previous.parking_lot_id, previous.plate_key) == (session.parking_lot_id,
+                                                                                    session.plate_key):
+            previous.exit_time = session.entry_time
+            closed.append(previous)
+        previous = session
+    if closed and not dry_run:
+        with transaction.atomic():
+            ParkingTransaction.objects.bulk_update(closed, ['exit_time'], batch_size=1000)
+        reconcile_live_occupancy({session.parking_lot_id for session in closed})
+    return closed
+
+
+def reconcile_live_occupancy(parking_lot_ids=None):
+    """
+    Reset live counters to the number of open transactions, returning {lot_id: (old, new)} for
+    every counter that had drifted (imports and admin edits don't go through the gate API).
+
+    Counter rows are locked before counting, so a gate event committing meanwhile waits and
+    applies its increment on top of the corrected value.
+    """
+    lots = ParkingLot.objects.order_by('id')
+    if parking_lot_ids is not None:
+        lots = lots.filter(id__in=parking_lot_ids)
+    lot_ids = list(lots.values_list('id', flat=True))
+
+    drift = {}
+    with transaction.atomic():
+        LiveOccupancy.objects.bulk_create(
+            [LiveOccupancy(parking_lot_id=lot_id, occupied=0, updated_at=timezone.now()) for lot_id in lot_ids],
+            ignore_conflicts=True,
+        )
+        current = dict(
+            LiveOccupancy.objects.select_for_update().filter(parking_lot_id__in=lot_ids)
+            .values_list('parking_lot_id', 'occupied')
+        )
+        open_counts = dict(
+            ParkingTransaction.objects
+            .filter(parking_lot_id__in=lot_ids, exit_time__isnull=True)
+            .values('parking_lot_id')
+            .annotate(open=Count('id'))
+            .values_list('parking_lot_id', 'open')
+        )
+        now = timezone.now()
+        for lot_id in lot_ids:
+            expected = open_counts.get(lot_id, 0)
+            if current.get(lot_id) != expected:
+                drift[lot_id] = (current.get(lot_id), expected)
+                LiveOccupancy.objects.filter(parking_lot_id=lot_id).update(occupied=expected, updated_at=now)
+    return drift
+
+
+def live_occupancy_row(parking_lot_id):
+    # One primary key lookup joined to the counter row; never touches ParkingTransaction. Always on
+    # the primary: ParkingLot is a replica model, but the counter must not lag behind the gates
+    return (
+        ParkingLot.objects
+        .using(DEFAULT_DB_ALIAS)
+        .filter(id=parking_lot_id)
+        .values('id', 'name', 'capacity', 'live_occupancy__occupied', 'live_occupancy__updated_at')
+    )
+
+
+def live_payload(row):
+    if row is None:
+        return None
+    occupied = row['live_occupancy__occupied'] or 0
+    return {
+        'lot': row['id'],
+        'lotName': row['name'],
+        'capacity': row['capacity'],
+        'occupied': occupied,
+        'free': max(row['capacity'] - occupied, 0),
+        'updatedAt': row['live_occupancy__updated_at'],
+    }
+
+
+def live_occupancy(parking_lot_id):
+    return live_payload(live_occupancy_row(parking_lot_id).first())
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from parking.archive import archive_transactions, archive_dir
+from parking.models import ParkingTransaction
+
+
+class Command(BaseCommand):
+    help = 'Move closed parking transactions past the retention window into Parquet files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True,
+                            help='Archive transactions that closed more than this many days ago')
+        parser.add_argument('--lot', type=int, action='append', dest='lots', help='Only archive this lot (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per DELETE batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 1:
+            raise CommandError('--older-than must be at least 1 day.')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+
+        if options['dry_run']:
+            candidates = ParkingTransaction.objects.filter(exit_time__lt=cutoff)
+            if options['lots']:
+                candidates = candidates.filter(parking_lot_id__in=options['lots'])
+            self.stdout.write(f"{candidates.count()} transactions closed before {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+
+        archived = archive_transactions(cutoff, parking_lot_ids=options['lots'], batch_size=options['batch_size'])
+        for (lot_id, month), rows in archived.items():
+            self.stdout.write(f"Lot {lot_id} {month:%Y-%m}: {rows} transactions archived")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {sum(archived.values())} transactions into {len(archived)} files under {archive_dir()}."))
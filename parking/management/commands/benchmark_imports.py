@@ -0,0 +1,80 @@
+import io
+import time
+from datetime import datetime, timedelta
+import openpyxl
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from parking.importers import (TRANSACTION_COLUMNS, ImportValidationError, read_upload_chunks,
+                               import_parking_transactions)
+from parking.models import ParkingLot
+
+
+class Command(BaseCommand):
+    help = 'Compare parking transaction import throughput for XLSX, CSV and Parquet uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Rows per generated file')
+        parser.add_argument('--lots', type=int, default=20, help='Number of parking lots referenced')
+        parser.add_argument('--formats', default='xlsx,csv,parquet', help='Comma-separated formats to compare')
+
+    def handle(self, *args, **options):
+        frame = self.sample_frame(options['rows'], options['lots'])
+        lot_names = sorted(frame["Parking Lot"].unique())
+
+        for file_format in options['formats'].split(','):
+            file_format = file_format.strip()
+            try:
+                upload = SimpleUploadedFile(f'benchmark.{file_format}', self.encode(frame, file_format))
+            except ImportError as e:
+                self.stderr.write(f"{file_format}: skipped ({e})")
+                continue
+
+            # Import into a throwaway transaction so the benchmark leaves no data behind
+            with transaction.atomic():
+                ParkingLot.objects.bulk_create([ParkingLot(name=name, capacity=100) for name in lot_names])
+                started = time.perf_counter()
+                try:
+                    imported = import_parking_transactions(read_upload_chunks(upload))
+                except ImportValidationError as e:
+                    self.stderr.write(f"{file_format}: failed ({e})")
+                    transaction.set_rollback(True)
+                    continue
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{file_format:>8}: {imported} rows in {elapsed:.2f}s "
+                f"({imported / elapsed:,.0f} rows/sec, {upload.size / 1024 / 1024:.1f} MiB)"
+            )
+
+    def sample_frame(self, rows, lots):
+        start = datetime(2024, 1, 1)
+        entries = [start + timedelta(minutes=7 * i) for i in range(rows)]
+        return pd.DataFrame({
+            "Parking Lot": [f"Benchmark Lot {i % lots}" for i in range(rows)],
+            "License Plate": [f"BM{i:07d}" for i in range(rows)],
+            "Entry Time": entries,
+            "Exit Time": [entry + timedelta(minutes=30 + i % 300) for i, entry in enumerate(entries)],
+            "Revenue": [round(2 + (i % 50) * 0.5, 2) for i in range(rows)],
+        }, columns=TRANSACTION_COLUMNS)
+
+    def encode(self, frame, file_format):
+        buffer = io.BytesIO()
+        if file_format == 'xlsx':
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet()
+            sheet.append(TRANSACTION_COLUMNS)
+            for row in frame.itertuples(index=False):
+                sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+            workbook.save(buffer)
+        elif file_format == 'csv':
+            frame.to_csv(buffer, index=False)
+        elif file_format in ('parquet', 'pq'):
+            frame.to_parquet(buffer, index=False, row_group_size=50000)
+        elif file_format in ('arrow', 'feather'):
+            frame.to_feather(buffer)
+        else:
+            raise ImportError(f"unknown format '{file_format}'")
+        return buffer.getvalue()
@@ -0,0 +1,104 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, AsyncClient, override_settings
+from django.urls import include, path
+from parking.models import ParkingLot
+from parking.urls import read_urlpatterns
+
+
+class SyncURLConf:
+    urlpatterns = [path('api/', include(read_urlpatterns(use_async=False)))]
+
+
+class AsyncURLConf:
+    urlpatterns = [path('api/', include(read_urlpatterns(use_async=True)))]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = ('Compare read endpoint latency under concurrent load for the WSGI path (DRF views on a fixed '
+            'thread pool) and the ASGI path (async views on one event loop), in process')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per path')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--urls', help='Comma-separated URLs to cycle through (default: summary and lot details)')
+        parser.add_argument('--cache', action='store_true', help='Keep the dashboard response cache enabled')
+
+    def handle(self, *args, **options):
+        urls = options['urls'].split(',') if options['urls'] else self.default_urls()
+        overrides = {'DEBUG': False, 'ALLOWED_HOSTS': ['testserver']}
+        if not options['cache']:
+            overrides['CACHES'] = {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'dashboard': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            }
+        self.stdout.write(f"{options['requests']} requests, {options['concurrency']} in flight, "
+                          f"{len(urls)} URL(s), WSGI threads: {options['threads']}")
+
+        with override_settings(ROOT_URLCONF=SyncURLConf, **overrides):
+            self.report('WSGI', *self.run_wsgi(urls, options))
+        with override_settings(ROOT_URLCONF=AsyncURLConf, **overrides):
+            self.report('ASGI', *asyncio.run(self.run_asgi(urls, options)))
+
+    def default_urls(self):
+        lot_ids = list(ParkingLot.objects.order_by('id').values_list('id', flat=True)[:5])
+        if not lot_ids:
+            raise CommandError('No parking lots to benchmark against; import or generate some data first.')
+        return ['/api/summary/'] + [
+            f'/api/parking-lot/{lot_id}/detail/?month=2024-05&year=2024&date=2024-05-01' for lot_id in lot_ids]
+
+    def run_wsgi(self, urls, options):
+        local = threading.local()
+        in_flight = threading.BoundedSemaphore(options['concurrency'])
+
+        def request(url, submitted):
+            try:
+                if not hasattr(local, 'client'):
+                    local.client = Client()
+                status_code = local.client.get(url).status_code
+                # Latency includes the wait for a free worker thread
+                return time.perf_counter() - submitted, status_code
+            finally:
+                in_flight.release()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            futures = []
+            for i in range(options['requests']):
+                in_flight.acquire()
+                futures.append(pool.submit(request, urls[i % len(urls)], time.perf_counter()))
+            results = [future.result() for future in futures]
+        return results, time.perf_counter() - started
+
+    async def run_asgi(self, urls, options):
+        client = AsyncClient()
+        in_flight = asyncio.Semaphore(options['concurrency'])
+
+        async def request(url):
+            async with in_flight:
+                submitted = time.perf_counter()
+                response = await client.get(url)
+                return time.perf_counter() - submitted, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request(urls[i % len(urls)]) for i in range(options['requests'])))
+        return results, time.perf_counter() - started
+
+    def report(self, label, results, elapsed):
+        latencies = [latency * 1000 for latency, _ in results]
+        errors = sum(1 for _, status_code in results if status_code >= 500)
+        self.stdout.write(
+            f"{label}: {len(results) / elapsed:,.0f} req/s, p50 {statistics.median(latencies):.1f} ms, "
+            f"p95 {percentile(latencies, 0.95):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms"
+            + (f", {errors} errors" if errors else '')
+        )
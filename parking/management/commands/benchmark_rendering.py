@@ -0,0 +1,49 @@
+import time
+from datetime import date, time as hour_of_day, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from parking.renderers import FastJSONRenderer, Rows, orjson
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON rendering time of DRF\'s JSONRenderer and the fast row/columnar renderer on hourly series'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='10000,100000', help='Comma-separated row counts')
+        parser.add_argument('--repeat', type=int, default=5, help='Renders per variant; the best is reported')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write('orjson is not installed; the fast renderer falls back to the standard library.')
+        columns = ['date', 'hour', 'occupancy_rate']
+        for count in [int(value) for value in options['rows'].split(',')]:
+            rows = self.hourly_rows(count)
+            variants = {
+                'drf values()': (JSONRenderer(), [dict(zip(columns, row)) for row in rows]),
+                'fast rows': (FastJSONRenderer(), Rows(columns, rows)),
+                'fast columnar': (FastJSONRenderer(), Rows(columns, rows, columnar=True)),
+            }
+            self.stdout.write(f"{count} rows:")
+            baseline = None
+            for label, (renderer, data) in variants.items():
+                best, size = self.best_render(renderer, data, options['repeat'])
+                baseline = baseline or best
+                self.stdout.write(f"  {label:>14}: {best * 1000:8.1f} ms  {size / 1024:8.0f} KiB  "
+                                  f"{baseline / best:5.1f}x")
+
+    def hourly_rows(self, count):
+        # A year-long style series: one row per lot hour, Decimal occupancy rates like the ORM returns
+        start = date(2024, 1, 1)
+        return [
+            (start + timedelta(days=i // 24), hour_of_day(i % 24), Decimal(f"{(i * 37) % 10000 / 100:.2f}"))
+            for i in range(count)
+        ]
+
+    def best_render(self, renderer, data, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = renderer.render(data)
+            timings.append(time.perf_counter() - started)
+        return min(timings), len(content)
@@ -1,41 +1,91 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from django.core.management.base import BaseCommand
-from django.utils.timezone import make_aware
-from parking.models import ParkingTransaction, ParkingLot, HourlyOccupancy
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_date
+from parking.models import ParkingLot
+from parking.occupancy import split_date_range, run_task, recompute_dirty_hours
 
 
 class Command(BaseCommand):
     help = 'Calculate and save hourly occupancy rates'
 
-    def handle(self, *args, **kwargs):
-        # Define the date range for the calculation, e.g., yesterday
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=32)
-
-        parking_lots = ParkingLot.objects.all()
-
-        for parking_lot in parking_lots:
-            # Calculate hourly occupancy for each hour of the previous day
-            for hour in range(24):
-                hour_start = make_aware(datetime.combine(start_date, datetime.min.time()) + timedelta(hours=hour))
-                hour_end = hour_start + timedelta(hours=1)
-
-                # Count the number of vehicles that were parked during this hour
-                occupancy_count = ParkingTransaction.objects.filter(
-                    parking_lot=parking_lot,
-                    entry_time__lt=hour_end,
-                    exit_time__gte=hour_start
-                ).count()
-
-                # Calculate occupancy rate
-                occupancy_rate = (occupancy_count / parking_lot.capacity) * 100
-
-                # Save the data into the HourlyOccupancy model
-                HourlyOccupancy.objects.update_or_create(
-                    parking_lot=parking_lot,
-                    date=start_date,
-                    hour=hour_start.time(),
-                    defaults={'occupancy_rate': occupancy_rate},
-                )
-
-        self.stdout.write(self.style.SUCCESS('Successfully calculated and saved hourly occupancy rates.'))
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to calculate (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to calculate, inclusive (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per upsert batch')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--chunk-days', type=int, help='Split each lot into ranges of this many days')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only recalculate hours whose transactions changed since the last run')
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            if options['start'] or options['end']:
+                raise CommandError('--incremental cannot be combined with --start/--end.')
+            saved = recompute_dirty_hours(batch_size=options['batch_size'])
+            for parking_lot_id, rows in saved.items():
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"lot {parking_lot_id}: {rows} rows")
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully recalculated {sum(saved.values())} changed hourly occupancy rates.'
+            ))
+            return
+
+        # Default to the single day the command has always calculated
+        default_date = datetime.now().date() - timedelta(days=32)
+        start_date = self.parse_day(options['start']) if options['start'] else default_date
+        end_date = self.parse_day(options['end']) if options['end'] else start_date
+        if end_date < start_date:
+            raise CommandError('--end must not be before --start.')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+        if options['chunk_days'] is not None and options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1.')
+
+        tasks = []
+        for parking_lot in ParkingLot.objects.order_by('id'):
+            if parking_lot.capacity <= 0:
+                self.stderr.write(f"Skipping {parking_lot.name}: capacity must be positive.")
+                continue
+            for range_start, range_end in split_date_range(start_date, end_date, options['chunk_days']):
+                tasks.append((parking_lot.id, parking_lot.capacity, range_start, range_end, options['batch_size']))
+
+        # Every (lot, date, hour) belongs to exactly one task, so the result
+        # does not depend on how tasks are spread over workers
+        if options['workers'] == 1:
+            results = map(run_task, tasks)
+        else:
+            results = self.run_in_pool(tasks, options['workers'])
+
+        saved = 0
+        for done, (task, rows) in enumerate(results, 1):
+            saved += rows
+            if options['verbosity'] > 1 or options['workers'] > 1:
+                parking_lot_id, _, range_start, range_end, _ = task
+                self.stdout.write(f"[{done}/{len(tasks)}] lot {parking_lot_id} {range_start}..{range_end}: {rows} rows")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully calculated and saved {saved} hourly occupancy rates '
+            f'from {start_date} to {end_date}.'
+        ))
+
+    def run_in_pool(self, tasks, workers):
+        # Don't hand the parent's connection to the children; each worker opens its own
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+            futures = [pool.submit(run_task, task) for task in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def parse_day(self, value):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+        return day
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from parking.live import close_duplicate_open_sessions
+
+
+class Command(BaseCommand):
+    help = 'Close open parking transactions superseded by a later entry of the same vehicle in the same lot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the sessions that would be closed')
+
+    def handle(self, *args, **options):
+        closed = close_duplicate_open_sessions(dry_run=options['dry_run'])
+        for session in closed:
+            self.stdout.write(f"Lot {session.parking_lot_id}: transaction {session.id} ({session.license_plate}, "
+                              f"entered {session.entry_time:%Y-%m-%d %H:%M}) closed at {session.exit_time:%Y-%m-%d %H:%M}")
+        action = 'would be closed' if options['dry_run'] else 'closed'
+        self.stdout.write(self.style.SUCCESS(f"{len(closed)} duplicate open sessions {action}."))
@@ -0,0 +1,45 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from parking.models import ParkingLot
+from parking.synthetic import SYNTHETIC_LOT_PREFIX, generate_synthetic_data, clear_synthetic_data
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic parking lots, transactions, history and hourly occupancy for testing and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lots', type=int, default=10, help='Number of parking lots')
+        parser.add_argument('--transactions', type=int, default=100000, help='Number of parking transactions')
+        parser.add_argument('--days', type=int, default=90, help='Length of the generated period in days')
+        parser.add_argument('--start', default='2024-01-01', help='First day of the period (YYYY-MM-DD)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated lots first')
+
+    def handle(self, *args, **options):
+        if options['lots'] < 1 or options['transactions'] < 0 or options['days'] < 1:
+            raise CommandError('--lots and --days must be at least 1 and --transactions not negative.')
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('--start must be YYYY-MM-DD.')
+
+        if options['clear']:
+            self.stdout.write(f"Deleted {clear_synthetic_data()} synthetic lots.")
+        elif ParkingLot.objects.filter(name__startswith=SYNTHETIC_LOT_PREFIX).exists():
+            raise CommandError('Synthetic lots already exist; pass --clear to replace them.')
+
+        started = time.perf_counter()
+        counts = generate_synthetic_data(
+            lots=options['lots'],
+            transactions=options['transactions'],
+            days=options['days'],
+            start_date=start_date,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['lots']} lots, {counts['transactions']} transactions, {counts['history']} history rows "
+            f"and {counts['hourly_occupancy']} hourly occupancy rows in {time.perf_counter() - started:.1f}s."
+        ))
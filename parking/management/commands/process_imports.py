@@ -0,0 +1,58 @@
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from parking.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued batch import jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of jobs to process concurrently')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.work, args=(stop, options), name=f'import-worker-{i}', daemon=True)
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            self.stdout.write('Stopping after the current jobs finish...')
+            for thread in threads:
+                thread.join()
+
+    def work(self, stop, options):
+        # Each thread uses its own database connection
+        try:
+            while not stop.is_set():
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+                    continue
+
+                started = time.perf_counter()
+                self.stdout.write(f"Import #{job.id} ({job.file_name}) started")
+                job = run_job(job)
+                elapsed = time.perf_counter() - started
+                message = f"Import #{job.id} {job.status}: {job.rows_processed} rows in {elapsed:.1f}s"
+                if job.error:
+                    self.stderr.write(f"{message} - {job.error}")
+                else:
+                    self.stdout.write(self.style.SUCCESS(message))
+        finally:
+            connection.close()
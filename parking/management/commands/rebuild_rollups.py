@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from parking.models import ParkingHistory, MonthlyRevenueRollup
+from parking.rollups import expected_revenue_rollups, rebuild_revenue_rollups, grand_total
+
+
+class Command(BaseCommand):
+    help = 'Verify the monthly revenue rollups against ParkingHistory and rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report differences, do not rebuild')
+
+    def handle(self, *args, **options):
+        differences = self.compare()
+        for difference in differences[:50]:
+            self.stdout.write(difference)
+        if len(differences) > 50:
+            self.stdout.write(f"... and {len(differences) - 50} more")
+
+        if options['check']:
+            if differences:
+                raise CommandError(f"{len(differences)} rollup rows differ from ParkingHistory.")
+            self.stdout.write(self.style.SUCCESS('Revenue rollups match ParkingHistory.'))
+            return
+
+        rebuild_revenue_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt revenue rollups ({len(differences)} rows were out of date).'
+        ))
+
+    def compare(self):
+        expected = {
+            (row['parking_lot_id'], row['month']): row['total_revenue'] for row in expected_revenue_rollups()
+        }
+        actual = dict(
+            ((parking_lot_id, month), total_revenue)
+            for parking_lot_id, month, total_revenue in MonthlyRevenueRollup.objects
+            .filter(parking_lot__isnull=False)
+            .values_list('parking_lot_id', 'month', 'total_revenue')
+        )
+
+        differences = []
+        for key in sorted(expected.keys() | actual.keys(), key=lambda key: (key[0], key[1])):
+            if expected.get(key) != actual.get(key):
+                parking_lot_id, month = key
+                differences.append(
+                    f"lot {parking_lot_id} {month:%Y-%m}: expected {expected.get(key)}, rollup has {actual.get(key)}")
+
+        expected_total = ParkingHistory.objects.aggregate(total=Sum('total_revenue'))['total'] or 0
+        if expected_total != grand_total():
+            differences.append(f"grand total: expected {expected_total}, rollup has {grand_total()}")
+        return differences
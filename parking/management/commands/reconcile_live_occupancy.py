@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from parking.live import reconcile_live_occupancy
+
+
+class Command(BaseCommand):
+    help = 'Reset live occupancy counters to the number of open parking transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, help='Keep running, reconciling every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            drift = reconcile_live_occupancy()
+            for lot_id, (counted, expected) in drift.items():
+                self.stdout.write(f"Lot {lot_id}: counter was {counted}, {expected} sessions are open")
+            self.stdout.write(self.style.SUCCESS(f"Reconciled live occupancy ({len(drift)} counters corrected)."))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,89 @@
+import json
+import platform
+import subprocess
+import sys
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases, override_settings
+from django.utils import timezone
+from parking.benchmarks import run_scale, regressions
+
+
+class Command(BaseCommand):
+    help = ('Time every API endpoint, the import views and calculate_hourly_occupancy on synthetic data at '
+            'several scales, in a throwaway test database, and write the results as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,10000,100000', help='Comma-separated transaction counts')
+        parser.add_argument('--lots', type=int, default=10, help='Parking lots per data set')
+        parser.add_argument('--days', type=int, default=90, help='Days covered by each data set')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per endpoint')
+        parser.add_argument('--import-rows', type=int, default=5000, help='Rows per timed import upload')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+        parser.add_argument('--compare', help='Earlier results file to check for regressions')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Slowdown against --compare that counts as a regression (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',')]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers.')
+
+        results = {'meta': self.meta(options), 'scales': []}
+        # Never touch the real data: build the test database the test runner would use
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=['testserver'],
+                # Measure the database path, not response cache hits
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'dashboard': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                },
+            ):
+                for scale in scales:
+                    self.stderr.write(f"Benchmarking {scale} transactions...")
+                    results['scales'].append(run_scale(
+                        scale, lots=options['lots'], days=options['days'], seed=options['seed'],
+                        repeat=options['repeat'], import_rows=options['import_rows']))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        output = json.dumps(results, indent=2, sort_keys=True, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as results_file:
+                results_file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                slower = regressions(json.load(baseline_file), results, options['tolerance'])
+            for scale, metric, before, after in slower:
+                self.stderr.write(f"{scale} transactions, {metric}: {before:.1f} ms -> {after:.1f} ms")
+            if slower:
+                raise CommandError(f"{len(slower)} timings regressed by more than {options['tolerance']:.0%}.")
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                    check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'database': connection.vendor,
+            'seed': options['seed'],
+            'lots': options['lots'],
+            'days': options['days'],
+            'repeat': options['repeat'],
+        }
@@ -0,0 +1,135 @@
+# metrics.py
+"""
+In-process request metrics rendered in the Prometheus text exposition format.
+
+Each server process keeps its own registry; scrape every worker (or run one per container).
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        # Cumulative counts are built at render time, so an observation touches one bucket
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self.series.items())
+        for labels, (counts, total, count) in series:
+            label_text = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{format_bound(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total!r}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_bound(bound):
+    return bound if isinstance(bound, str) else repr(float(bound))
+
+
+REQUEST_DURATION = Histogram('parking_http_request_duration_seconds', 'Time spent handling requests, by URL name.',
+                             ('view', 'method', 'status'), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram('parking_http_request_db_queries', 'SQL queries issued per request, by URL name.',
+                            ('view', 'method'), QUERY_BUCKETS)
+REQUEST_DB_DURATION = Histogram('parking_http_request_db_duration_seconds',
+                                'Time spent in SQL queries per request, by URL name.', ('view', 'method'),
+                                LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram('parking_http_response_size_bytes', 'Response body size, by URL name.',
+                          ('view', 'method'), SIZE_BUCKETS)
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_DURATION, RESPONSE_SIZE)
+
+
+class QueryStats:
+    # Queries of one request; async views may run them on several threads at once
+    __slots__ = ('count', 'duration', 'lock')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, duration):
+        with self.lock:
+            self.count += 1
+            self.duration += duration
+
+
+current_queries = contextvars.ContextVar('parking_request_queries', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection (see apps.py).
+
+    Contextvars follow a request into sync_to_async threads, so queries are attributed to the
+    request that issued them whichever thread runs them. Outside a request it is a pass-through.
+    """
+    stats = current_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(time.perf_counter() - started)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def observe_request(view, method, status, duration, stats):
+    REQUEST_DURATION.observe((view, method, str(status)), duration)
+    REQUEST_QUERIES.observe((view, method), stats.count)
+    REQUEST_DB_DURATION.observe((view, method), stats.duration)
+
+
+def observe_response_size(view, method, size):
+    RESPONSE_SIZE.observe((view, method), size)
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
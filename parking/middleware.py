@@ -0,0 +1,234 @@
+# middleware.py
+import cProfile
+import hmac
+import io
+import json
+import pstats
+import random
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+
+from .metrics import QueryStats, current_queries, observe_request, observe_response_size
+from .routers import read_from_replica, replica_alias
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unmatched>'
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL query count and time, and response size per URL name for /metrics.
+
+    Put it first in MIDDLEWARE so the latency covers the rest of the stack. Works for both sync
+    and async views without an extra thread switch. Queries run while a streamed body is being
+    sent are not attributed to the request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = current_queries.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = current_queries.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        view = view_label(request)
+        observe_request(view, request.method, response.status_code, time.perf_counter() - started, stats)
+        if not response.streaming:
+            observe_response_size(view, request.method, len(response.content))
+        elif response.is_async:
+            response.streaming_content = self.count_async(response.streaming_content, view, request.method)
+        else:
+            response.streaming_content = self.count(response.streaming_content, view, request.method)
+        return response
+
+    @staticmethod
+    def count(chunks, view, method):
+        # Streamed bodies are measured as they are sent
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+        observe_response_size(view, method, size)
+
+    @staticmethod
+    async def count_async(chunks, view, method):
+        size = 0
+        async for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+        observe_response_size(view, method, size)
+
+
+class ReplicaReadMiddleware:
+    """
+    Let ReadReplicaRouter serve the analytics reads of GET and HEAD requests from the replica.
+
+    Removes itself from the stack when no DATABASE_READ_REPLICA is configured. Streamed bodies
+    (the exports) are produced after the view returns and read from the primary, and so are the
+    responses the dashboard cache stores (see cache.cached_get).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_alias():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with read_from_replica(request.method in ('GET', 'HEAD')):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with read_from_replica(request.method in ('GET', 'HEAD')):
+            return await self.get_response(request)
+
+
+class SQLRecorder:
+    # Execute wrapper collecting every statement of a profiled request with its duration
+    def __init__(self, alias):
+        self.alias = alias
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append({
+                'database': self.alias,
+                'sql': sql,
+                'params': repr(params)[:500],
+                'many': many,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+@contextmanager
+def recording(connection, recorder):
+    # Like connection.execute_wrapper(), but removes the recorder by identity: a connection opened
+    # during the request appends record_query after it, which a plain pop() would take off instead
+    connection.execute_wrappers.append(recorder)
+    try:
+        yield
+    finally:
+        connection.execute_wrappers.remove(recorder)
+
+
+class ProfilingMiddleware:
+    """
+    Profile single requests with cProfile and record their SQL, when asked to.
+
+    A request is profiled when it carries ``X-Profile: <PROFILING_TOKEN>`` (or ``?profile=<token>``),
+    or is picked by PROFILING_SAMPLE_RATE. ``X-Profile-Output: inline`` (or ``?profile_output=inline``)
+    returns the report instead of the response body; otherwise it is written to PROFILING_DIR
+    as ``<id>.prof`` (pstats, e.g. for snakeviz) and ``<id>.json``, and the id is sent in
+    ``X-Profile-Id``. With PROFILING_ENABLED off the middleware removes itself from the stack.
+
+    cProfile sees the request thread only: for async views, queries are listed but time spent
+    in sync_to_async threads shows up as waiting.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.headers.get('X-Profile') or request.GET.get('profile')
+        expected = getattr(settings, 'PROFILING_TOKEN', None)
+        requested = bool(token and expected and hmac.compare_digest(token, expected))
+        sampled = not requested and random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        if not (requested or sampled):
+            return self.get_response(request)
+
+        recorders = [SQLRecorder(alias) for alias in connections]
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for recorder in recorders:
+                stack.enter_context(recording(connections[recorder.alias], recorder))
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already running in this thread
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+
+        statements = [statement for recorder in recorders for statement in recorder.statements]
+        report = self.report(request, response, duration, statements, profiler)
+        inline = (request.headers.get('X-Profile-Output') or request.GET.get('profile_output')) == 'inline'
+        if requested and inline:
+            return JsonResponse(report, json_dumps_params={'indent': 2})
+
+        self.save(report, profiler)
+        response['X-Profile-Id'] = report['id']
+        return response
+
+    def report(self, request, response, duration, statements, profiler):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).strip_dirs().sort_stats('cumulative').print_stats(
+            getattr(settings, 'PROFILING_TOP_FUNCTIONS', 40))
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.view_name if match is not None else None,
+            'status': response.status_code,
+            'durationMs': round(duration * 1000, 3),
+            'sqlCount': len(statements),
+            'sqlMs': round(sum(statement['ms'] for statement in statements), 3),
+            'sql': statements,
+            'profile': output.getvalue(),
+        }
+
+    def save(self, report, profiler):
+        directory = Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / f"{report['id']}.prof")
+        with open(directory / f"{report['id']}.json", 'w') as report_file:
+            json.dump(report, report_file, indent=2)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:34
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_hourly_occupancy(apps, schema_editor):
+    # Keep the most recently written row for each (parking_lot, date, hour)
+    HourlyOccupancy = apps.get_model('parking', 'HourlyOccupancy')
+    duplicates = (
+        HourlyOccupancy.objects
+        .values('parking_lot', 'date', 'hour')
+        .annotate(keep_id=Max('id'), rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    for entry in duplicates:
+        HourlyOccupancy.objects.filter(
+            parking_lot=entry['parking_lot'], date=entry['date'], hour=entry['hour']
+        ).exclude(id=entry['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0006_hourlyoccupancy_parking_lot'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_hourly_occupancy, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='hourlyoccupancy',
+            constraint=models.UniqueConstraint(fields=('parking_lot', 'date', 'hour'), name='unique_hourly_occupancy'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_hourlyoccupancy_unique_hourly_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyOccupancyHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.TimeField()),
+                ('parking_lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='parking.parkinglot')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('parking_lot', 'date', 'hour'), name='unique_dirty_occupancy_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:05
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_parking_history(apps, schema_editor):
+    # Re-imported sheets left several rows per lot and day; keep the latest one
+    ParkingHistory = apps.get_model('parking', 'ParkingHistory')
+    duplicates = (
+        ParkingHistory.objects
+        .values('parking_lot', 'date')
+        .annotate(keep_id=Max('id'), rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    for entry in duplicates:
+        ParkingHistory.objects.filter(
+            parking_lot=entry['parking_lot'], date=entry['date']
+        ).exclude(id=entry['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0008_dirtyoccupancyhour'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_parking_history, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='parkinghistory',
+            constraint=models.UniqueConstraint(fields=('parking_lot', 'date'), name='unique_parking_history_day'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0010_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parkinghistory',
+            index=models.Index(fields=['date'], name='parking_history_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(fields=['parking_lot', 'entry_time', 'exit_time'], name='transaction_lot_time_idx'),
+        ),
+    ]
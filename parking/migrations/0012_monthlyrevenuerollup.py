@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_revenue_rollups(apps, schema_editor):
+    ParkingHistory = apps.get_model('parking', 'ParkingHistory')
+    MonthlyRevenueRollup = apps.get_model('parking', 'MonthlyRevenueRollup')
+    monthly = (
+        ParkingHistory.objects
+        .annotate(month=TruncMonth('date'))
+        .values('parking_lot_id', 'month')
+        .annotate(total_revenue=Sum('total_revenue'))
+    )
+    MonthlyRevenueRollup.objects.bulk_create(
+        [MonthlyRevenueRollup(**row) for row in monthly],
+        batch_size=1000,
+    )
+    MonthlyRevenueRollup.objects.create(
+        total_revenue=ParkingHistory.objects.aggregate(total=Sum('total_revenue'))['total'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0011_analytics_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(blank=True, null=True)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('parking_lot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='parking.parkinglot')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='revenue_rollup_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('parking_lot', 'month'), name='unique_monthly_revenue_rollup')],
+            },
+        ),
+        migrations.RunPython(populate_revenue_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0012_monthlyrevenuerollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(fields=['entry_time', 'id'], name='transaction_time_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(fields=['parking_lot', 'entry_time', 'id'], name='transaction_lot_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(fields=['license_plate', 'entry_time', 'id'], name='transaction_plate_key_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def populate_live_occupancy(apps, schema_editor):
+    ParkingLot = apps.get_model('parking', 'ParkingLot')
+    LiveOccupancy = apps.get_model('parking', 'LiveOccupancy')
+    lots = ParkingLot.objects.annotate(open=Count('parkingtransaction', filter=models.Q(parkingtransaction__exit_time__isnull=True)))
+    now = timezone.now()
+    LiveOccupancy.objects.bulk_create(
+        [LiveOccupancy(parking_lot_id=lot.id, occupied=lot.open, updated_at=now) for lot in lots],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0013_transaction_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveOccupancy',
+            fields=[
+                ('parking_lot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='live_occupancy', serialize=False, to='parking.parkinglot')),
+                ('occupied', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(populate_live_occupancy, migrations.RunPython.noop),
+    ]
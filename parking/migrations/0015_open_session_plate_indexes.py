@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:55
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0014_liveoccupancy'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='parkingtransaction',
+            name='transaction_plate_key_idx',
+        ),
+        migrations.AddField(
+            model_name='parkingtransaction',
+            name='plate_key',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Upper(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace('license_plate', models.Value(' '), models.Value('')), models.Value('-'), models.Value(''))), output_field=models.CharField(max_length=20)),
+        ),
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(fields=['plate_key', 'entry_time', 'id'], name='transaction_plate_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(condition=models.Q(('exit_time__isnull', True)), fields=['plate_key', 'parking_lot'], name='transaction_open_plate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(condition=models.Q(('exit_time__isnull', True)), fields=['parking_lot'], name='transaction_open_lot_idx'),
+        ),
+    ]
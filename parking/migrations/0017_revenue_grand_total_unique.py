@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:23
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def drop_duplicate_grand_totals(apps, schema_editor):
+    # Racing refreshes could leave several grand total rows; keep the first, the next refresh corrects it
+    MonthlyRevenueRollup = apps.get_model('parking', 'MonthlyRevenueRollup')
+    grand_totals = MonthlyRevenueRollup.objects.filter(parking_lot__isnull=True, month__isnull=True).order_by('id')
+    first = grand_totals.values_list('id', flat=True).first()
+    if first is not None:
+        grand_totals.exclude(id=first).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0016_importjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_grand_totals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='monthlyrevenuerollup',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('parking_lot', models.Value(0)), condition=models.Q(('month__isnull', True), ('parking_lot__isnull', True)), name='unique_revenue_grand_total'),
+        ),
+    ]
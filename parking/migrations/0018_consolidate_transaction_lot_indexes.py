@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0017_revenue_grand_total_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='parkingtransaction',
+            name='transaction_lot_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='parkingtransaction',
+            name='transaction_lot_key_idx',
+        ),
+        migrations.AlterField(
+            model_name='parkingtransaction',
+            name='parking_lot',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='parking.parkinglot'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingtransaction',
+            index=models.Index(fields=['parking_lot', 'entry_time', 'id', 'exit_time'], name='transaction_lot_key_idx'),
+        ),
+    ]
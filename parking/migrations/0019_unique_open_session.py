@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+def check_duplicate_open_sessions(apps, schema_editor):
+    # Racing gate entries could open a vehicle twice in a lot. Closing the extra sessions changes
+    # revenue and occupancy data, so that is left to an explicit close_duplicate_open_sessions run
+    ParkingTransaction = apps.get_model('parking', 'ParkingTransaction')
+    duplicates = list(
+        ParkingTransaction.objects.filter(exit_time__isnull=True)
+        .values('parking_lot_id', 'plate_key')
+        .annotate(sessions=models.Count('id'))
+        .filter(sessions__gt=1)
+        .order_by('parking_lot_id', 'plate_key')[:20]
+    )
+    if duplicates:
+        listed = '\n'.join(f"  lot {row['parking_lot_id']}, plate {row['plate_key']}: {row['sessions']} open sessions"
+                           for row in duplicates)
+        raise RuntimeError(
+            "Vehicles with more than one open session in a lot (first 20):\n"
+            f"{listed}\nClose them before migrating, e.g. with manage.py close_duplicate_open_sessions.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0018_consolidate_transaction_lot_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_open_sessions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='parkingtransaction',
+            name='transaction_open_plate_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='parkingtransaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('exit_time__isnull', True)), fields=('plate_key', 'parking_lot'), name='unique_open_session'),
+        ),
+    ]
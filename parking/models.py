@@ -1,4 +1,24 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, Replace, Upper
+
+from .cache import record_change
+
+bulk_deleting = ContextVar('parking_bulk_deleting', default=False)
+
+
+@contextmanager
+def bulk_deletion():
+    # For bulk jobs that record their own changes and need no occupancy or rollup refresh for the
+    # rows they delete: the per-row post_delete receivers in signals.py skip their work meanwhile
+    token = bulk_deleting.set(True)
+    try:
+        yield
+    finally:
+        bulk_deleting.reset(token)
 
 
 class ParkingLot(models.Model):
@@ -9,23 +29,132 @@ class ParkingLot(models.Model):
         return f"{self.name}"
 
 
+class ParkingTransactionQuerySet(models.QuerySet):
+    # Bulk writes skip model signals, so occupancy hours are marked dirty here instead
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .occupancy import mark_transactions_dirty
+        objs = super().bulk_create(objs, *args, **kwargs)
+        mark_transactions_dirty(objs)
+        record_change('transaction', {obj.parking_lot_id for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        ids = [obj.pk for obj in objs]
+        self._mark_dirty(ids)
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        self._mark_dirty(ids)
+        record_change('transaction', {obj.parking_lot_id for obj in objs})
+        return rows
+
+    def update(self, **kwargs):
+        # Both the old and the new time spans need recalculating
+        ids = list(self.values_list('pk', flat=True))
+        lot_ids = set(self.values_list('parking_lot_id', flat=True).distinct())
+        self._mark_dirty(ids)
+        rows = super().update(**kwargs)
+        self._mark_dirty(ids)
+        record_change('transaction', lot_ids | set(self.model.objects.filter(pk__in=ids)
+                                                   .values_list('parking_lot_id', flat=True).distinct()))
+        return rows
+
+    def _mark_dirty(self, ids, chunk_size=1000):
+        from .occupancy import mark_transactions_dirty
+        for start in range(0, len(ids), chunk_size):
+            mark_transactions_dirty(self.model.objects.filter(pk__in=ids[start:start + chunk_size]))
+
+
 class ParkingTransaction(models.Model):
-    parking_lot = models.ForeignKey(ParkingLot, on_delete=models.CASCADE)
+    # Indexed by transaction_lot_key_idx, which leads with the lot
+    parking_lot = models.ForeignKey(ParkingLot, on_delete=models.CASCADE, db_index=False)
     license_plate = models.CharField(max_length=20)
+    # Upper-cased with spaces and dashes removed, matching utils.normalize_plate; the database keeps it
+    # in step with license_plate on every write path, bulk ones included
+    plate_key = models.GeneratedField(
+        expression=Upper(Replace(Replace('license_plate', Value(' '), Value('')), Value('-'), Value(''))),
+        output_field=models.CharField(max_length=20),
+        db_persist=True,
+    )
     entry_time = models.DateTimeField()
     exit_time = models.DateTimeField(null=True, blank=True)
     revenue = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
+    objects = ParkingTransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pages of the transaction list, ordered on (entry_time, id) within each filter.
+            # The lot one carries exit_time too, so the per-lot time window scans of the occupancy
+            # and analytics sweeps read it alone
+            models.Index(fields=['entry_time', 'id'], name='transaction_time_key_idx'),
+            models.Index(fields=['parking_lot', 'entry_time', 'id', 'exit_time'], name='transaction_lot_key_idx'),
+            # Exact plate lookups in entry order, and prefix searches as a range on plate_key
+            models.Index(fields=['plate_key', 'entry_time', 'id'], name='transaction_plate_key_idx'),
+            # Open sessions are a tiny fraction of the table; these stay small and hot
+            models.Index(fields=['parking_lot'], condition=Q(exit_time__isnull=True),
+                         name='transaction_open_lot_idx'),
+        ]
+        constraints = [
+            # A vehicle has at most one open session per lot. Leading with plate_key lets the
+            # constraint's index serve plate prefix searches over open sessions too
+            models.UniqueConstraint(fields=['plate_key', 'parking_lot'], condition=Q(exit_time__isnull=True),
+                                    name='unique_open_session'),
+        ]
+
     def __str__(self):
         return f"{self.license_plate} at {self.parking_lot.name}"
 
 
+class ParkingHistoryQuerySet(models.QuerySet):
+    # Keep the revenue rollups in step with bulk writes, which don't send model signals
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .rollups import refresh_revenue_rollups, history_months
+        objs = super().bulk_create(objs, *args, **kwargs)
+        months = history_months(objs)
+        refresh_revenue_rollups(months)
+        record_change('history', {parking_lot_id for parking_lot_id, _ in months})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .rollups import refresh_revenue_rollups, history_months
+        objs = list(objs)
+        months = history_months(self.model.objects.filter(pk__in=[obj.pk for obj in objs]))
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        months |= history_months(objs)
+        refresh_revenue_rollups(months)
+        record_change('history', {parking_lot_id for parking_lot_id, _ in months})
+        return rows
+
+    def update(self, **kwargs):
+        from .rollups import refresh_revenue_rollups, history_months
+        ids = list(self.values_list('pk', flat=True))
+        months = history_months(self.model.objects.filter(pk__in=ids))
+        rows = super().update(**kwargs)
+        months |= history_months(self.model.objects.filter(pk__in=ids))
+        refresh_revenue_rollups(months)
+        record_change('history', {parking_lot_id for parking_lot_id, _ in months})
+        return rows
+
+
 class ParkingHistory(models.Model):
     parking_lot = models.ForeignKey(ParkingLot, on_delete=models.CASCADE)
     date = models.DateField()
     occupancy_rate = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
     total_revenue = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
 
+    objects = ParkingHistoryQuerySet.as_manager()
+
+    class Meta:
+        # The unique constraint doubles as the (parking_lot, date) index for per-lot range filters
+        constraints = [
+            models.UniqueConstraint(fields=['parking_lot', 'date'], name='unique_parking_history_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='parking_history_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.parking_lot.name} - {self.date} - Occupancy: {self.occupancy_rate}% - Revenue: ${self.total_revenue}"
 
@@ -36,6 +165,101 @@ class HourlyOccupancy(models.Model):
     hour = models.TimeField()
     occupancy_rate = models.DecimalField(max_digits=5, decimal_places=2)
 
+    class Meta:
+        # Also the (parking_lot, date, hour) index used by the peak hours lookup
+        constraints = [
+            models.UniqueConstraint(fields=['parking_lot', 'date', 'hour'], name='unique_hourly_occupancy'),
+        ]
+
     def __str__(self):
         return f"{self.parking_lot.name} - {self.date} {self.hour} - Occupancy: {self.occupancy_rate}%"
 
+
+
+class DirtyOccupancyHour(models.Model):
+    # An hourly occupancy bucket whose transactions changed since it was last calculated
+    parking_lot = models.ForeignKey(ParkingLot, on_delete=models.CASCADE)
+    date = models.DateField()
+    hour = models.TimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['parking_lot', 'date', 'hour'], name='unique_dirty_occupancy_hour'),
+        ]
+
+    def __str__(self):
+        return f"{self.parking_lot_id} - {self.date} {self.hour}"
+
+
+class ImportJob(models.Model):
+    KIND_PARKING_TRANSACTION = 'parking_transaction'
+    KIND_PARKING_HISTORY = 'parking_history'
+    KIND_CHOICES = [
+        (KIND_PARKING_TRANSACTION, 'Parking transactions'),
+        (KIND_PARKING_HISTORY, 'Parking history'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)
+    rows_total = models.IntegerField(null=True, blank=True)
+    rows_processed = models.IntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched by the worker after every chunk; a running job whose heartbeat stops is re-queued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import #{self.pk} - {self.status}"
+
+
+class MonthlyRevenueRollup(models.Model):
+    # One row per lot and month with revenue, plus a single grand total row with
+    # neither lot nor month; maintained from ParkingHistory by parking.rollups
+    parking_lot = models.ForeignKey(ParkingLot, on_delete=models.CASCADE, null=True, blank=True)
+    month = models.DateField(null=True, blank=True)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['parking_lot', 'month'], name='unique_monthly_revenue_rollup'),
+            # NULLs never conflict in the constraint above, so the grand total row needs its own
+            models.UniqueConstraint(Coalesce('parking_lot', Value(0)),
+                                    condition=Q(parking_lot__isnull=True, month__isnull=True),
+                                    name='unique_revenue_grand_total'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='revenue_rollup_month_idx'),
+        ]
+
+    def __str__(self):
+        if self.parking_lot_id is None:
+            return f"Total - Revenue: ${self.total_revenue}"
+        return f"{self.parking_lot.name} - {self.month:%Y-%m} - Revenue: ${self.total_revenue}"
+
+
+class LiveOccupancy(models.Model):
+    # Vehicles currently inside each lot, kept in step by the gate event API and
+    # periodically reconciled against open transactions by parking.live
+    parking_lot = models.OneToOneField(ParkingLot, on_delete=models.CASCADE, primary_key=True,
+                                       related_name='live_occupancy')
+    occupied = models.IntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.parking_lot.name} - {self.occupied} occupied"
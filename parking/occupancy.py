@@ -0,0 +1,206 @@
+# occupancy.py
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import chain
+
+from django.db import models, transaction
+from django.utils.timezone import make_aware, localdate, get_current_timezone
+
+from .archive import archived_stays
+from .cache import record_change
+from .models import ParkingTransaction, HourlyOccupancy, DirtyOccupancyHour, ParkingLot
+
+HOUR = timedelta(hours=1)
+
+
+def hour_buckets(start_date, end_date):
+    # One (date, hour_start) pair per hour from start_date to end_date inclusive,
+    # built the same way the original per-hour loop built its windows
+    current_timezone = get_current_timezone()
+    buckets = []
+    day = start_date
+    while day <= end_date:
+        buckets.extend(day_hours(day, current_timezone))
+        day += timedelta(days=1)
+    return buckets
+
+
+@lru_cache(maxsize=4096)
+def day_hours(day, tz):
+    midnight = datetime.combine(day, datetime.min.time())
+    return tuple((day, make_aware(midnight + timedelta(hours=hour), tz)) for hour in range(24))
+
+
+def hourly_counts(parking_lot_id, buckets, chunk_size=5000):
+    """
+    Count vehicles parked during each bucket with a single pass over the lot's transactions.
+
+    A transaction counts for an hour when entry_time < hour_end and exit_time >= hour_start,
+    exactly like the original ``count()`` query, so open transactions are never counted.
+    Archived transactions are included when the buckets reach back to them.
+    """
+    if not buckets:
+        return []
+
+    starts = [hour_start for _, hour_start in buckets]
+    ends = [hour_start + HOUR for hour_start in starts]
+
+    transactions = (
+        ParkingTransaction.objects
+        .filter(parking_lot_id=parking_lot_id, entry_time__lt=ends[-1], exit_time__gte=starts[0])
+        .order_by('entry_time', 'id')
+        .values_list('id', 'entry_time', 'exit_time')
+    )
+    archived = archived_stays(parking_lot_id, starts[0], ends[-1])
+    # Rows an archive run has written out but not yet deleted are counted once
+    stays = chain(archived.values(), (
+        (entry_time, exit_time)
+        for transaction_id, entry_time, exit_time in transactions.iterator(chunk_size=chunk_size)
+        if transaction_id not in archived
+    ))
+
+    # Sweep: +1 at the first bucket a transaction covers, -1 after the last one
+    deltas = [0] * (len(buckets) + 1)
+    for entry_time, exit_time in stays:
+        first = bisect_right(ends, entry_time)
+        last = bisect_right(starts, exit_time) - 1
+        if first <= last:
+            deltas[first] += 1
+            deltas[last + 1] -= 1
+
+    counts = []
+    running = 0
+    for delta in deltas[:-1]:
+        running += delta
+        counts.append(running)
+    return counts
+
+
+def lot_occupancy(parking_lot_id, capacity, buckets, chunk_size=5000):
+    counts = hourly_counts(parking_lot_id, buckets, chunk_size=chunk_size)
+    return [
+        HourlyOccupancy(
+            parking_lot_id=parking_lot_id,
+            date=day,
+            hour=hour_start.time(),
+            occupancy_rate=(count / capacity) * 100,
+        )
+        for (day, hour_start), count in zip(buckets, counts)
+    ]
+
+
+def save_hourly_occupancy(records, batch_size=1000):
+    # Upsert on the (parking_lot, date, hour) natural key
+    HourlyOccupancy.objects.bulk_create(
+        records,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['parking_lot', 'date', 'hour'],
+        update_fields=['occupancy_rate'],
+    )
+    record_change('hourly', {record.parking_lot_id for record in records})
+    return len(records)
+
+
+def split_date_range(start_date, end_date, chunk_days=None):
+    # Inclusive (start, end) day ranges of at most chunk_days each
+    if not chunk_days:
+        return [(start_date, end_date)]
+    ranges = []
+    day = start_date
+    while day <= end_date:
+        chunk_end = min(day + timedelta(days=chunk_days - 1), end_date)
+        ranges.append((day, chunk_end))
+        day = chunk_end + timedelta(days=1)
+    return ranges
+
+
+def recompute_occupancy(parking_lot_id, capacity, start_date, end_date, batch_size=1000):
+    buckets = hour_buckets(start_date, end_date)
+    records = lot_occupancy(parking_lot_id, capacity, buckets)
+    return save_hourly_occupancy(records, batch_size=batch_size)
+
+
+def run_task(task):
+    # Entry point for pool workers; each worker process holds its own DB connection
+    parking_lot_id, capacity, start_date, end_date, batch_size = task
+    return task, recompute_occupancy(parking_lot_id, capacity, start_date, end_date, batch_size=batch_size)
+
+
+def transaction_hours(entry_time, exit_time):
+    # (date, hour_start) buckets a transaction counts towards, see hourly_counts()
+    if entry_time is None or exit_time is None:
+        return []
+    current_timezone = get_current_timezone()
+    return [
+        (day, hour_start)
+        for day, hour_start in hour_buckets(localdate(entry_time, current_timezone),
+                                            localdate(exit_time, current_timezone))
+        if entry_time < hour_start + HOUR and exit_time >= hour_start
+    ]
+
+
+def mark_transactions_dirty(transactions, batch_size=1000):
+    if isinstance(transactions, models.QuerySet):
+        rows = transactions.values_list('parking_lot_id', 'entry_time', 'exit_time').iterator(chunk_size=batch_size)
+    else:
+        rows = ((t.parking_lot_id, t.entry_time, t.exit_time) for t in transactions)
+
+    pending = {}
+    for parking_lot_id, entry_time, exit_time in rows:
+        for day, hour_start in transaction_hours(entry_time, exit_time):
+            pending[(parking_lot_id, day, hour_start.time())] = None
+        if len(pending) >= batch_size:
+            _save_dirty_hours(pending, batch_size)
+            pending = {}
+    _save_dirty_hours(pending, batch_size)
+
+
+def _save_dirty_hours(keys, batch_size):
+    DirtyOccupancyHour.objects.bulk_create(
+        [DirtyOccupancyHour(parking_lot_id=lot_id, date=day, hour=hour) for lot_id, day, hour in keys],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def bucket_clusters(buckets):
+    # Split sorted buckets where days are not adjacent, so each sweep only streams nearby transactions
+    clusters = []
+    for bucket in buckets:
+        if clusters and (bucket[0] - clusters[-1][-1][0]).days <= 1:
+            clusters[-1].append(bucket)
+        else:
+            clusters.append([bucket])
+    return clusters
+
+
+def recompute_dirty_hours(batch_size=1000):
+    """
+    Recompute only the buckets recorded in DirtyOccupancyHour, one lot at a time.
+
+    The dirty rows are claimed and the new rates saved in the same transaction, so a failed
+    run leaves them in place for the next one.
+    """
+    saved = {}
+    lot_ids = DirtyOccupancyHour.objects.values_list('parking_lot_id', flat=True).distinct().order_by('parking_lot_id')
+    for parking_lot in ParkingLot.objects.filter(id__in=list(lot_ids)).order_by('id'):
+        if parking_lot.capacity <= 0:
+            continue
+        with transaction.atomic():
+            dirty = list(
+                DirtyOccupancyHour.objects
+                .filter(parking_lot=parking_lot)
+                .order_by('date', 'hour')
+                .values_list('id', 'date', 'hour')
+            )
+            buckets = [(day, make_aware(datetime.combine(day, hour))) for _, day, hour in dirty]
+            rows = 0
+            for cluster in bucket_clusters(buckets):
+                rows += save_hourly_occupancy(lot_occupancy(parking_lot.id, parking_lot.capacity, cluster),
+                                              batch_size=batch_size)
+            for start in range(0, len(dirty), batch_size):
+                DirtyOccupancyHour.objects.filter(id__in=[row[0] for row in dirty[start:start + batch_size]]).delete()
+        saved[parking_lot.id] = rows
+    return saved
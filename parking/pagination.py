@@ -0,0 +1,47 @@
+# pagination.py
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(entry_time, pk):
+    raw = json.dumps([entry_time.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        entry_time, pk = json.loads(raw)
+        entry_time = parse_datetime(entry_time)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor.')
+    if entry_time is None or not isinstance(pk, int):
+        raise InvalidCursor('Invalid cursor.')
+    return entry_time, pk
+
+
+def keyset_page(queryset, cursor=None, limit=50):
+    """
+    One page of ``queryset`` ordered newest first on (entry_time, id), starting after ``cursor``.
+
+    The cursor is the key of the last row already seen, so every page is a single index range
+    read of ``limit + 1`` rows whatever its depth, and there is no COUNT(*).
+    Returns (rows, next cursor or None).
+    """
+    queryset = queryset.order_by('-entry_time', '-id')
+    if cursor:
+        entry_time, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(entry_time__lt=entry_time) | Q(entry_time=entry_time, id__lt=pk))
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].entry_time, rows[-1].id)
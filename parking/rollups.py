@@ -0,0 +1,113 @@
+# rollups.py
+from collections import defaultdict
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from .models import ParkingHistory, MonthlyRevenueRollup
+from .utils import next_month
+
+
+def history_months(records):
+    # (parking_lot_id, first day of month) pairs touched by some ParkingHistory rows
+    if isinstance(records, models.QuerySet):
+        rows = records.values_list('parking_lot_id', 'date')
+    else:
+        rows = ((record.parking_lot_id, record.date) for record in records)
+    return {(parking_lot_id, day.replace(day=1)) for parking_lot_id, day in rows if day is not None}
+
+
+def refresh_revenue_rollups(keys):
+    """
+    Recompute the rollup rows for the given (parking_lot_id, month) pairs from ParkingHistory,
+    then the grand total from the per-lot rows.
+
+    Work is proportional to the number of changed months, not the size of the history table.
+    """
+    if not keys:
+        return
+
+    months_by_lot = defaultdict(set)
+    for parking_lot_id, month in keys:
+        months_by_lot[parking_lot_id].add(month)
+
+    with transaction.atomic():
+        totals = {}
+        for parking_lot_id, months in months_by_lot.items():
+            monthly = (
+                ParkingHistory.objects
+                .filter(parking_lot_id=parking_lot_id, date__gte=min(months), date__lt=next_month(max(months)))
+                .annotate(month=TruncMonth('date'))
+                .values('month')
+                .annotate(total_revenue=Sum('total_revenue'))
+                .values_list('month', 'total_revenue')
+            )
+            for month, total_revenue in monthly:
+                if month in months:
+                    totals[(parking_lot_id, month)] = total_revenue
+
+        MonthlyRevenueRollup.objects.bulk_create(
+            [MonthlyRevenueRollup(parking_lot_id=parking_lot_id, month=month, total_revenue=total_revenue)
+             for (parking_lot_id, month), total_revenue in totals.items()],
+            update_conflicts=True,
+            unique_fields=['parking_lot', 'month'],
+            update_fields=['total_revenue'],
+        )
+
+        # Months whose history rows are all gone lose their rollup row
+        for parking_lot_id, months in months_by_lot.items():
+            emptied = [month for month in months if (parking_lot_id, month) not in totals]
+            if emptied:
+                MonthlyRevenueRollup.objects.filter(parking_lot_id=parking_lot_id, month__in=emptied).delete()
+
+        refresh_grand_total()
+
+
+def refresh_grand_total():
+    total_revenue = (
+        MonthlyRevenueRollup.objects
+        .filter(parking_lot__isnull=False)
+        .aggregate(total=Sum('total_revenue'))['total'] or 0
+    )
+    grand_total_row = MonthlyRevenueRollup.objects.filter(parking_lot__isnull=True, month__isnull=True)
+    if grand_total_row.update(total_revenue=total_revenue):
+        return
+    try:
+        with transaction.atomic():
+            MonthlyRevenueRollup.objects.create(parking_lot=None, month=None, total_revenue=total_revenue)
+    except IntegrityError:
+        # A concurrent refresh created the row first
+        grand_total_row.update(total_revenue=total_revenue)
+
+
+def grand_total():
+    return (
+        MonthlyRevenueRollup.objects
+        .filter(parking_lot__isnull=True, month__isnull=True)
+        .values_list('total_revenue', flat=True)
+        .first()
+    ) or 0
+
+
+def rebuild_revenue_rollups():
+    # Replace every rollup row with values aggregated from the full ParkingHistory table
+    with transaction.atomic():
+        MonthlyRevenueRollup.objects.all().delete()
+        MonthlyRevenueRollup.objects.bulk_create(
+            [MonthlyRevenueRollup(parking_lot_id=row['parking_lot_id'], month=row['month'],
+                                  total_revenue=row['total_revenue'])
+             for row in expected_revenue_rollups()],
+            batch_size=1000,
+        )
+        refresh_grand_total()
+
+
+def expected_revenue_rollups():
+    return (
+        ParkingHistory.objects
+        .annotate(month=TruncMonth('date'))
+        .values('parking_lot_id', 'month')
+        .annotate(total_revenue=Sum('total_revenue'))
+        .order_by('parking_lot_id', 'month')
+    )
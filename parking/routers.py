@@ -0,0 +1,62 @@
+# routers.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Tables the dashboards read; a lagging copy of these is good enough for analytics.
+# Live counters, the import queue and everything outside this app stay on the primary.
+REPLICA_MODELS = {
+    'parking.parkinglot',
+    'parking.parkingtransaction',
+    'parking.parkinghistory',
+    'parking.hourlyoccupancy',
+    'parking.monthlyrevenuerollup',
+}
+
+replica_reads = ContextVar('parking_replica_reads', default=False)
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    # Set around GET requests by ReplicaReadMiddleware; use enabled=False to pin a block to the primary
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def replica_alias():
+    return getattr(settings, 'DATABASE_READ_REPLICA', None)
+
+
+class ReadReplicaRouter:
+    """
+    Send analytics reads made while serving a GET request to the read replica.
+
+    Everything else uses the primary: writes, reads inside a transaction on the primary (imports,
+    gate events), and all reads from management commands and workers, which never opt in.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        alias = replica_alias()
+        if (alias and replica_reads.get() and model._meta.label_lower in REPLICA_MODELS
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != replica_alias()
@@ -1,6 +1,7 @@
 # serializers.py
 from rest_framework import serializers
-from .models import ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy, ParkingHistory
+from django.utils import timezone
+from .models import ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy, ParkingHistory, ImportJob
 
 
 class SummarySerializer(serializers.Serializer):
@@ -33,4 +34,45 @@ class ParkingLotDetailSerializer(serializers.Serializer):
     historicalOccupancy = serializers.ListField()
     peakHours = serializers.ListField()
     revenueData = serializers.ListField()
-    monthlyRevenueData = serializers.ListField()
\ No newline at end of file
+    monthlyRevenueData = serializers.ListField()
+
+
+class ParkingTransactionSerializer(serializers.ModelSerializer):
+    parkingLot = serializers.IntegerField(source='parking_lot_id')
+    parkingLotName = serializers.CharField(source='parking_lot.name')
+    licensePlate = serializers.CharField(source='license_plate')
+    entryTime = serializers.DateTimeField(source='entry_time')
+    exitTime = serializers.DateTimeField(source='exit_time')
+
+    class Meta:
+        model = ParkingTransaction
+        fields = ['id', 'parkingLot', 'parkingLotName', 'licensePlate', 'entryTime', 'exitTime', 'revenue']
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    fileName = serializers.CharField(source='file_name')
+    rowsTotal = serializers.IntegerField(source='rows_total')
+    rowsProcessed = serializers.IntegerField(source='rows_processed')
+    rowsPerSecond = serializers.SerializerMethodField()
+    elapsedSeconds = serializers.SerializerMethodField()
+    errors = serializers.SerializerMethodField()
+    createdAt = serializers.DateTimeField(source='created_at')
+    startedAt = serializers.DateTimeField(source='started_at')
+    finishedAt = serializers.DateTimeField(source='finished_at')
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'kind', 'fileName', 'status', 'rowsTotal', 'rowsProcessed', 'rowsPerSecond',
+                  'elapsedSeconds', 'result', 'errors', 'createdAt', 'startedAt', 'finishedAt']
+
+    def get_elapsedSeconds(self, job):
+        if not job.started_at:
+            return None
+        return round(((job.finished_at or timezone.now()) - job.started_at).total_seconds(), 3)
+
+    def get_rowsPerSecond(self, job):
+        elapsed = self.get_elapsedSeconds(job)
+        return round(job.rows_processed / elapsed, 1) if elapsed else None
+
+    def get_errors(self, job):
+        return [job.error] if job.error else []
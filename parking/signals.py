@@ -0,0 +1,75 @@
+# signals.py
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .archive import delete_lot_archive
+from .cache import record_change
+from .models import ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy, bulk_deleting
+from .occupancy import mark_transactions_dirty
+from .rollups import refresh_revenue_rollups, history_months
+
+
+@receiver(pre_save, sender=ParkingTransaction)
+def mark_previous_hours_dirty(sender, instance, raw=False, **kwargs):
+    # An edit can move a transaction out of hours it used to count towards
+    if raw or instance.pk is None:
+        return
+    mark_transactions_dirty(ParkingTransaction.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=ParkingTransaction)
+def mark_hours_dirty(sender, instance, **kwargs):
+    mark_transactions_dirty([instance])
+
+
+@receiver(post_delete, sender=ParkingTransaction)
+def mark_deleted_hours_dirty(sender, instance, origin=None, **kwargs):
+    # Nothing to recompute when the transaction goes with its lot
+    if isinstance(origin, ParkingLot) or getattr(origin, 'model', None) is ParkingLot or bulk_deleting.get():
+        return
+    mark_transactions_dirty([instance])
+
+
+@receiver(pre_save, sender=ParkingHistory)
+def refresh_previous_revenue_month(sender, instance, raw=False, **kwargs):
+    # Moving a row to another lot or month changes the rollup it used to belong to
+    if raw or instance.pk is None:
+        return
+    instance._previous_revenue_months = history_months(ParkingHistory.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=ParkingHistory)
+def refresh_revenue_month(sender, instance, **kwargs):
+    refresh_revenue_rollups(history_months([instance]) | getattr(instance, '_previous_revenue_months', set()))
+
+
+@receiver(post_delete, sender=ParkingHistory)
+def refresh_deleted_revenue_month(sender, instance, **kwargs):
+    if bulk_deleting.get():
+        return
+    refresh_revenue_rollups(history_months([instance]))
+
+
+CHANGE_TABLES = {
+    ParkingLot: 'lot',
+    ParkingTransaction: 'transaction',
+    ParkingHistory: 'history',
+    HourlyOccupancy: 'hourly',
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def record_write(sender, instance, signal, **kwargs):
+    # Any write to data the read APIs serve invalidates cached responses and ETags
+    table = CHANGE_TABLES.get(sender)
+    if table and not (signal is post_delete and bulk_deleting.get()):
+        record_change(table, {instance.pk if sender is ParkingLot else instance.parking_lot_id})
+
+
+@receiver(post_delete, sender=ParkingLot)
+def delete_archived_transactions(sender, instance, **kwargs):
+    # Archived transactions go with their lot, like the rows in the table do
+    parking_lot_id = instance.pk
+    transaction.on_commit(lambda: delete_lot_archive(parking_lot_id))
@@ -0,0 +1,148 @@
+# synthetic.py
+import datetime
+import math
+import string
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from django.db import models, transaction
+from django.utils.timezone import make_aware, localdate
+
+from .cache import record_change
+from .live import reconcile_live_occupancy
+from .models import (ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy, DirtyOccupancyHour,
+                     LiveOccupancy, MonthlyRevenueRollup, bulk_deletion)
+from .occupancy import hour_buckets, lot_occupancy, save_hourly_occupancy
+from .rollups import refresh_grand_total
+
+SYNTHETIC_LOT_PREFIX = 'Synthetic Lot'
+
+# Relative share of arrivals by hour of day: commuter peaks at 8-9 and 17-18, quiet nights
+ARRIVALS_BY_HOUR = np.array([1, 1, 1, 1, 1, 2, 4, 9, 12, 9, 6, 6, 7, 6, 5, 5, 7, 10, 9, 6, 4, 3, 2, 1], dtype=float)
+MEDIAN_STAY_MINUTES = 120
+
+
+def plate_pool(rng, size):
+    # Repeat visitors: transactions draw plates from a pool a fraction of their number
+    letters = np.array(list(string.ascii_uppercase))
+    prefixes = rng.choice(letters, size=(size, 3))
+    numbers = rng.integers(0, 10000, size=size)
+    return [f"{''.join(prefix)}{number:04d}" for prefix, number in zip(prefixes, numbers)]
+
+
+def generate_synthetic_data(lots=10, transactions=100000, days=90, start_date=datetime.date(2024, 1, 1), seed=42,
+                            batch_size=5000):
+    """
+    Create ``lots`` parking lots with ``transactions`` transactions spread over ``days`` days,
+    then the matching HourlyOccupancy (through the occupancy engine) and daily ParkingHistory rows.
+
+    The same arguments and seed always produce the same data. Returns row counts per model.
+    """
+    rng = np.random.default_rng(seed)
+    end_date = start_date + datetime.timedelta(days=days - 1)
+
+    # Lot sizes follow the traffic they get, with headroom over the average load
+    weights = rng.dirichlet(np.ones(lots) * 2)
+    mean_stay = MEDIAN_STAY_MINUTES * math.exp(0.8 ** 2 / 2)
+    average_parked = transactions * mean_stay / (days * 24 * 60)
+    capacities = [int(math.ceil(weight * average_parked * 2.5)) + 20 for weight in weights]
+    rates = rng.choice([Decimal('2.00'), Decimal('2.50'), Decimal('3.00'), Decimal('4.00')], size=lots)
+
+    lot_indexes = rng.choice(lots, size=transactions, p=weights)
+    day_offsets = rng.integers(0, days, size=transactions)
+    hours = rng.choice(24, size=transactions, p=ARRIVALS_BY_HOUR / ARRIVALS_BY_HOUR.sum())
+    minutes = day_offsets * 1440 + hours * 60 + rng.integers(0, 60, size=transactions)
+    stays = np.clip(rng.lognormal(math.log(MEDIAN_STAY_MINUTES), 0.8, size=transactions), 5, 2 * 1440).astype(int)
+    plates = plate_pool(rng, max(transactions // 5, 100))
+    plate_indexes = rng.integers(0, len(plates), size=transactions)
+    order = np.argsort(minutes, kind='stable')
+
+    origin = make_aware(datetime.datetime.combine(start_date, datetime.time.min))
+    # Stays running past the end of the period are the vehicles still parked "now"
+    open_after = make_aware(datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min))
+
+    with transaction.atomic():
+        parking_lots = ParkingLot.objects.bulk_create([
+            ParkingLot(name=f"{SYNTHETIC_LOT_PREFIX} {index:03d}", capacity=capacity)
+            for index, capacity in enumerate(capacities)
+        ])
+
+        revenue_by_day = defaultdict(Decimal)
+        batch = []
+        for position in order:
+            parking_lot = parking_lots[lot_indexes[position]]
+            entry_time = origin + datetime.timedelta(minutes=int(minutes[position]))
+            exit_time = entry_time + datetime.timedelta(minutes=int(stays[position]))
+            revenue = Decimal(0)
+            if exit_time > open_after:
+                exit_time = None
+            else:
+                revenue = rates[lot_indexes[position]] * math.ceil(stays[position] / 60)
+                revenue_by_day[(parking_lot.id, localdate(entry_time))] += revenue
+            batch.append(ParkingTransaction(parking_lot=parking_lot, license_plate=plates[plate_indexes[position]],
+                                            entry_time=entry_time, exit_time=exit_time, revenue=revenue))
+            if len(batch) >= batch_size:
+                _insert_transactions(batch)
+                batch = []
+        _insert_transactions(batch)
+
+        buckets = hour_buckets(start_date, end_date)
+        hourly_rows = 0
+        history = []
+        for parking_lot in parking_lots:
+            records = lot_occupancy(parking_lot.id, parking_lot.capacity, buckets)
+            hourly_rows += save_hourly_occupancy(records)
+            rates_by_day = defaultdict(list)
+            for record in records:
+                rates_by_day[record.date].append(record.occupancy_rate)
+            history.extend(
+                ParkingHistory(parking_lot=parking_lot, date=day,
+                               occupancy_rate=round(sum(day_rates) / len(day_rates), 2),
+                               total_revenue=revenue_by_day.get((parking_lot.id, day), 0))
+                for day, day_rates in rates_by_day.items()
+            )
+        ParkingHistory.objects.bulk_create(history, batch_size=batch_size)
+        record_change('transaction', [parking_lot.id for parking_lot in parking_lots])
+        reconcile_live_occupancy([parking_lot.id for parking_lot in parking_lots])
+
+    return {
+        'lots': len(parking_lots),
+        'transactions': transactions,
+        'history': len(history),
+        'hourly_occupancy': hourly_rows,
+    }
+
+
+def _insert_transactions(batch):
+    # Occupancy is computed for the whole period afterwards, so skip the per-row dirty-hour marking
+    # that ParkingTransaction.objects.bulk_create does
+    if batch:
+        models.QuerySet(ParkingTransaction).bulk_create(batch)
+
+
+def clear_synthetic_data(batch_size=5000):
+    """
+    Delete the synthetic lots and everything attached to them, returning the number of lots.
+
+    Dependent rows are deleted in id batches under bulk_deletion, so the cascade never loads every
+    transaction at once and the per-row delete signals don't mark hours or refresh rollups for
+    data that is going away; the changes are recorded once at the end.
+    """
+    lots = ParkingLot.objects.filter(name__startswith=SYNTHETIC_LOT_PREFIX)
+    lot_ids = list(lots.values_list('id', flat=True))
+    if not lot_ids:
+        return 0
+    with transaction.atomic():
+        with bulk_deletion():
+            for model in (ParkingTransaction, ParkingHistory, HourlyOccupancy, DirtyOccupancyHour, LiveOccupancy,
+                          MonthlyRevenueRollup):
+                rows = model.objects.filter(parking_lot_id__in=lot_ids)
+                while ids := list(rows.values_list('pk', flat=True)[:batch_size]):
+                    model.objects.filter(pk__in=ids).delete()
+        refresh_grand_total()
+        # The lots themselves go with their signals: the lot change and their archive directories
+        lots.delete()
+        for table in ('transaction', 'history', 'hourly'):
+            record_change(table, lot_ids)
+    return len(lot_ids)
@@ -1,3 +1,1467 @@
-from django.test import TestCase
+import importlib.util
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
 
-# Create your tests here.
+import openpyxl
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management.base import CommandError
+from django.core.cache import caches
+from django.urls import include, path
+from django.db import IntegrityError, connection
+from django.db.models import Q, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, make_aware
+from rest_framework.response import Response
+from rest_framework.test import APITestCase
+
+from .analytics import Stays, clear_stays_cache, month_stays, period_stays
+from .archive import (ARCHIVE_COLUMNS, archive_transactions, archived_partitions, archived_transaction_rows,
+                      write_partition)
+from .cache import async_cached_view, cached_get
+from .jobs import claim_next_job, run_job
+from .live import GateEventError, live_occupancy_row, record_entry
+from .models import (ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy, DirtyOccupancyHour, ImportJob,
+                     MonthlyRevenueRollup, LiveOccupancy)
+from .occupancy import hour_buckets, hourly_counts, split_date_range
+from .pagination import encode_cursor
+from . import urls as parking_urls
+from .benchmarks import run_scale, regressions
+from .metrics import install_query_wrapper, record_query, reset_metrics
+from .middleware import ProfilingMiddleware, ReplicaReadMiddleware
+from .renderers import FastJSONRenderer, Rows
+from .rollups import grand_total
+from .routers import ReadReplicaRouter, read_from_replica, replica_reads
+from .synthetic import generate_synthetic_data, clear_synthetic_data
+from .urls import read_urlpatterns
+
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'dashboard': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def setUpModule():
+    # Response caching is exercised by ResponseCacheTests only
+    override = override_settings(CACHES=TEST_CACHES)
+    override.enable()
+    unittest.addModuleCleanup(override.disable)
+
+
+def aware(*args):
+    return make_aware(datetime(*args))
+
+
+def xlsx_upload(rows, name='upload.xlsx'):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class HourlyOccupancyEngineTests(TestCase):
+    def setUp(self):
+        self.lot = ParkingLot.objects.create(name='Central', capacity=10)
+
+    def test_sweep_matches_per_hour_count(self):
+        rng = random.Random(7)
+        base = aware(2024, 5, 1)
+        transactions = []
+        for i in range(300):
+            entry = base + timedelta(minutes=rng.randint(-600, 3 * 24 * 60))
+            exit_ = None if i % 17 == 0 else entry + timedelta(minutes=rng.randint(-30, 600))
+            transactions.append(ParkingTransaction(
+                parking_lot=self.lot, license_plate=f'P{i}', entry_time=entry, exit_time=exit_))
+        # Boundary cases: exactly on the hour
+        transactions.append(ParkingTransaction(
+            parking_lot=self.lot, license_plate='EDGE1', entry_time=aware(2024, 5, 1, 3), exit_time=aware(2024, 5, 1, 5)))
+        ParkingTransaction.objects.bulk_create(transactions)
+
+        buckets = hour_buckets(date(2024, 5, 1), date(2024, 5, 3))
+        counts = hourly_counts(self.lot.id, buckets)
+
+        expected = [
+            ParkingTransaction.objects.filter(
+                parking_lot=self.lot, entry_time__lt=hour_start + timedelta(hours=1), exit_time__gte=hour_start
+            ).count()
+            for _, hour_start in buckets
+        ]
+        self.assertEqual(counts, expected)
+
+    def test_command_upserts_range(self):
+        ParkingTransaction.objects.create(
+            parking_lot=self.lot, license_plate='A', entry_time=aware(2024, 5, 1, 8, 30), exit_time=aware(2024, 5, 1, 10))
+        call_command('calculate_hourly_occupancy', '--start', '2024-05-01', '--end', '2024-05-02', stdout=io.StringIO())
+        call_command('calculate_hourly_occupancy', '--start', '2024-05-01', '--end', '2024-05-02', stdout=io.StringIO())
+
+        self.assertEqual(HourlyOccupancy.objects.count(), 48)
+        rates = dict(HourlyOccupancy.objects.filter(date=date(2024, 5, 1)).values_list('hour', 'occupancy_rate'))
+        self.assertEqual(rates[time(8)], Decimal('10.00'))
+        self.assertEqual(rates[time(10)], Decimal('10.00'))
+        self.assertEqual(rates[time(11)], Decimal('0.00'))
+
+    def test_chunked_ranges_give_same_result(self):
+        ParkingTransaction.objects.create(
+            parking_lot=self.lot, license_plate='A', entry_time=aware(2024, 5, 1, 22), exit_time=aware(2024, 5, 3, 1))
+        call_command('calculate_hourly_occupancy', '--start', '2024-05-01', '--end', '2024-05-04', stdout=io.StringIO())
+        whole = list(HourlyOccupancy.objects.order_by('date', 'hour').values_list('date', 'hour', 'occupancy_rate'))
+        HourlyOccupancy.objects.all().delete()
+        call_command('calculate_hourly_occupancy', '--start', '2024-05-01', '--end', '2024-05-04',
+                     '--chunk-days', '3', stdout=io.StringIO())
+        chunked = list(HourlyOccupancy.objects.order_by('date', 'hour').values_list('date', 'hour', 'occupancy_rate'))
+        self.assertEqual(whole, chunked)
+
+    def test_split_date_range(self):
+        self.assertEqual(split_date_range(date(2024, 1, 1), date(2024, 1, 5), 2), [
+            (date(2024, 1, 1), date(2024, 1, 2)),
+            (date(2024, 1, 3), date(2024, 1, 4)),
+            (date(2024, 1, 5), date(2024, 1, 5)),
+        ])
+        self.assertEqual(split_date_range(date(2024, 1, 1), date(2024, 1, 5)), [(date(2024, 1, 1), date(2024, 1, 5))])
+
+
+class IncrementalOccupancyTests(TestCase):
+    def setUp(self):
+        self.lot = ParkingLot.objects.create(name='Central', capacity=4)
+
+    def rates(self):
+        return list(HourlyOccupancy.objects.filter(occupancy_rate__gt=0)
+                    .order_by('date', 'hour').values_list('date', 'hour', 'occupancy_rate'))
+
+    def test_writes_mark_touched_hours(self):
+        ParkingTransaction.objects.bulk_create([ParkingTransaction(
+            parking_lot=self.lot, license_plate='A', entry_time=aware(2024, 5, 1, 8, 30), exit_time=aware(2024, 5, 1, 10))])
+        self.assertEqual(sorted(DirtyOccupancyHour.objects.values_list('hour', flat=True)), [time(8), time(9), time(10)])
+
+        # Open sessions do not count towards any hour
+        ParkingTransaction.objects.create(parking_lot=self.lot, license_plate='B', entry_time=aware(2024, 5, 2, 8))
+        self.assertEqual(DirtyOccupancyHour.objects.filter(date=date(2024, 5, 2)).count(), 0)
+
+    def test_incremental_matches_full_recompute(self):
+        ParkingTransaction.objects.create(
+            parking_lot=self.lot, license_plate='A', entry_time=aware(2024, 5, 1, 8, 30), exit_time=aware(2024, 5, 1, 10))
+        moved = ParkingTransaction.objects.create(
+            parking_lot=self.lot, license_plate='B', entry_time=aware(2024, 5, 1, 9), exit_time=aware(2024, 5, 1, 12))
+        call_command('calculate_hourly_occupancy', '--incremental', stdout=io.StringIO())
+        self.assertFalse(DirtyOccupancyHour.objects.exists())
+
+        # Moving a transaction dirties both its old and new hours
+        moved.entry_time = aware(2024, 5, 20, 9)
+        moved.exit_time = aware(2024, 5, 20, 9, 30)
+        moved.save()
+        ParkingTransaction.objects.filter(license_plate='A').update(exit_time=aware(2024, 5, 1, 9, 15))
+        call_command('calculate_hourly_occupancy', '--incremental', stdout=io.StringIO())
+        incremental = self.rates()
+
+        HourlyOccupancy.objects.all().delete()
+        call_command('calculate_hourly_occupancy', '--start', '2024-05-01', '--end', '2024-05-20', stdout=io.StringIO())
+        self.assertEqual(incremental, self.rates())
+        self.assertEqual(incremental, [
+            (date(2024, 5, 1), time(8), Decimal('25.00')),
+            (date(2024, 5, 1), time(9), Decimal('25.00')),
+            (date(2024, 5, 20), time(9), Decimal('25.00')),
+        ])
+
+
+@override_settings(IMPORT_IN_BACKGROUND=False)
+class ParkingTransactionImportTests(APITestCase):
+    url = '/api/parking-transaction/import/'
+    header = ["Parking Lot", "License Plate", "Entry Time", "Exit Time", "Revenue"]
+
+    def setUp(self):
+        self.lot = ParkingLot.objects.create(name='Central', capacity=10)
+
+    def test_imports_rows_in_batches(self):
+        rows = [self.header]
+        for i in range(25):
+            rows.append(['Central', f'P{i}', datetime(2024, 5, 1, 8, i), '2024-05-01 10:00:00', 2.5])
+        rows.append(['Central', 'OPEN', '2024-05-01T11:00:00', None, None])
+
+        response = self.client.post(self.url, {'file': xlsx_upload(rows)}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 26)
+        open_session = ParkingTransaction.objects.get(license_plate='OPEN')
+        self.assertIsNone(open_session.exit_time)
+        self.assertEqual(open_session.revenue, Decimal('0.00'))
+        self.assertEqual(ParkingTransaction.objects.get(license_plate='P3').entry_time, aware(2024, 5, 1, 8, 3))
+
+    def test_unknown_lot_rejects_whole_file(self):
+        rows = [self.header,
+                ['Central', 'A', '2024-05-01 08:00:00', '2024-05-01 09:00:00', 1],
+                ['Nowhere', 'B', '2024-05-01 08:00:00', '2024-05-01 09:00:00', 1]]
+
+        response = self.client.post(self.url, {'file': xlsx_upload(rows)}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Nowhere', response.data['error'])
+        self.assertFalse(ParkingTransaction.objects.exists())
+
+    def test_second_open_session_rejects_whole_file(self):
+        rows = [self.header,
+                ['Central', 'AB-123', '2024-05-01 08:00:00', None, None],
+                ['Central', 'ab 123', '2024-05-01 09:00:00', None, None]]
+
+        response = self.client.post(self.url, {'file': xlsx_upload(rows)}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already parked', response.data['error'])
+        self.assertFalse(ParkingTransaction.objects.exists())
+
+    def test_imports_csv(self):
+        content = (
+            "Parking Lot,License Plate,Entry Time,Exit Time,Revenue\n"
+            "Central,A,2024-05-01 08:00:00,2024-05-01 09:30:00,4.50\n"
+            "Central,B,2024-05-01T10:00:00,,\n"
+        )
+        upload = SimpleUploadedFile('transactions.csv', content.encode())
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ParkingTransaction.objects.get(license_plate='A').revenue, Decimal('4.50'))
+        self.assertIsNone(ParkingTransaction.objects.get(license_plate='B').exit_time)
+
+    def test_imports_offsets_either_side_of_a_dst_change(self):
+        content = (
+            "Parking Lot,License Plate,Entry Time,Exit Time,Revenue\n"
+            "Central,A,2024-03-31T01:30:00+01:00,2024-03-31T03:30:00+02:00,3\n"
+            "Central,B,2024-03-31 04:00:00,2024-03-31T05:00:00Z,1\n"
+        )
+        upload = SimpleUploadedFile('transactions.csv', content.encode())
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        utc = timezone.utc
+        a = ParkingTransaction.objects.get(license_plate='A')
+        self.assertEqual((a.entry_time, a.exit_time),
+                         (datetime(2024, 3, 31, 0, 30, tzinfo=utc), datetime(2024, 3, 31, 1, 30, tzinfo=utc)))
+        b = ParkingTransaction.objects.get(license_plate='B')
+        self.assertEqual((b.entry_time, b.exit_time), (aware(2024, 3, 31, 4), datetime(2024, 3, 31, 5, tzinfo=utc)))
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_imports_parquet(self):
+        frame = pd.DataFrame({
+            "Parking Lot": ['Central', 'Central'],
+            "License Plate": ['A', 'B'],
+            "Entry Time": pd.to_datetime(['2024-05-01 08:00', '2024-05-01 09:00']),
+            "Exit Time": pd.to_datetime(['2024-05-01 09:00', None]),
+            "Revenue": [3.0, 0.0],
+        })
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+
+        response = self.client.post(
+            self.url, {'file': SimpleUploadedFile('transactions.parquet', buffer.getvalue())}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(ParkingTransaction.objects.get(license_plate='A').exit_time, aware(2024, 5, 1, 9))
+
+
+@override_settings(IMPORT_IN_BACKGROUND=False)
+class ParkingHistoryImportTests(APITestCase):
+    url = '/api/parking-history/import/'
+    header = ["parking_lot", "date", "occupancy_rate", "total_revenue"]
+
+    def setUp(self):
+        ParkingLot.objects.create(name='Central', capacity=10)
+        ParkingLot.objects.create(name='North', capacity=10)
+
+    def post(self, rows):
+        return self.client.post(self.url, {'file': xlsx_upload([self.header] + rows)}, format='multipart')
+
+    def test_reimport_is_idempotent(self):
+        rows = [['Central', datetime(2024, 5, 1), 40, 100.5],
+                ['North', '2024-05-01', None, 20],
+                ['Central', '2024-05-02', 55.5, 80]]
+        first = self.post(rows)
+        self.assertEqual((first.data['inserted'], first.data['updated'], first.data['unchanged']), (3, 0, 0))
+
+        rows[2][3] = 95
+        second = self.post(rows)
+        self.assertEqual((second.data['inserted'], second.data['updated'], second.data['unchanged']), (0, 1, 2))
+
+        self.assertEqual(ParkingHistory.objects.count(), 3)
+        self.assertEqual(ParkingHistory.objects.get(parking_lot__name='Central', date=date(2024, 5, 2)).total_revenue,
+                         Decimal('95.00'))
+        self.assertIsNone(ParkingHistory.objects.get(parking_lot__name='North').occupancy_rate)
+
+    def test_imports_csv(self):
+        content = "parking_lot,date,occupancy_rate,total_revenue\nCentral,2024-05-01,12.5,100\nNorth,2024-05-01,,7\n"
+
+        response = self.client.post(
+            self.url, {'file': SimpleUploadedFile('history.csv', content.encode())}, format='multipart')
+
+        self.assertEqual(response.data['inserted'], 2)
+        self.assertEqual(ParkingHistory.objects.get(parking_lot__name='Central').occupancy_rate, Decimal('12.50'))
+
+    def test_unknown_lot_is_rejected(self):
+        response = self.post([['Nowhere', '2024-05-01', 10, 10]])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Parking lot Nowhere does not exist.')
+
+
+class BackgroundImportTests(APITestCase):
+    def setUp(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.settings_override = override_settings(IMPORT_IN_BACKGROUND=True, IMPORT_SPOOL_DIR=spool.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        ParkingLot.objects.create(name='Central', capacity=10)
+
+    def test_upload_is_queued_and_processed(self):
+        content = "parking_lot,date,occupancy_rate,total_revenue\nCentral,2024-05-01,12.5,100\nCentral,2024-05-02,,7\n"
+        response = self.client.post('/api/parking-history/import/',
+                                    {'file': SimpleUploadedFile('history.csv', content.encode())}, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertFalse(ParkingHistory.objects.exists())
+
+        job = run_job(claim_next_job())
+        self.assertIsNone(claim_next_job())
+
+        status_response = self.client.get(response['Location'])
+        self.assertEqual(status_response.data['status'], 'succeeded')
+        self.assertEqual(status_response.data['rowsProcessed'], 2)
+        self.assertEqual(status_response.data['result']['inserted'], 2)
+        self.assertEqual(ParkingHistory.objects.count(), 2)
+        self.assertFalse(os.path.exists(job.file_path))
+
+    def test_invalid_file_fails_without_writing(self):
+        content = ("Parking Lot,License Plate,Entry Time,Exit Time,Revenue\n"
+                   "Central,A,2024-05-01 08:00:00,2024-05-01 09:00:00,1\n"
+                   "Nowhere,B,2024-05-01 08:00:00,2024-05-01 09:00:00,1\n")
+        response = self.client.post('/api/parking-transaction/import/',
+                                    {'file': SimpleUploadedFile('transactions.csv', content.encode())}, format='multipart')
+
+        run_job(claim_next_job())
+
+        job = ImportJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertIn('Nowhere', job.error)
+        self.assertFalse(ParkingTransaction.objects.exists())
+
+    def test_second_open_sessions_fail_validation_without_writing(self):
+        ParkingTransaction.objects.create(parking_lot=ParkingLot.objects.get(), license_plate='AB-1',
+                                          entry_time=aware(2024, 5, 1, 7))
+        header = "Parking Lot,License Plate,Entry Time,Exit Time,Revenue\n"
+        for rows, error in (("Central,C,2024-05-01 08:00:00,,\nCentral,ab 1,2024-05-01 09:00:00,,\n",
+                             'Vehicle already parked in row(s) 3'),
+                            ("Central,C,2024-05-01 08:00:00,,\nCentral,c,2024-05-01 09:00:00,,\n",
+                             'Row 3 opens a second session for c, already open in row 2.')):
+            response = self.client.post('/api/parking-transaction/import/',
+                                        {'file': SimpleUploadedFile('transactions.csv', (header + rows).encode())},
+                                        format='multipart')
+            run_job(claim_next_job())
+
+            job = ImportJob.objects.get(pk=response.data['id'])
+            self.assertEqual((job.status, job.error), (ImportJob.STATUS_FAILED, error))
+            self.assertEqual(ParkingTransaction.objects.count(), 1)
+
+    def test_job_of_a_dead_worker_is_requeued_and_resumed(self):
+        content = ("Parking Lot,License Plate,Entry Time,Exit Time,Revenue\n"
+                   "Central,A,2024-05-01 08:00:00,,\n"
+                   "Central,B,2024-05-01 08:00:00,2024-05-01 09:00:00,1\n"
+                   "Central,C,2024-05-01 08:00:00,2024-05-01 09:00:00,1\n")
+        self.client.post('/api/parking-transaction/import/',
+                         {'file': SimpleUploadedFile('transactions.csv', content.encode())}, format='multipart')
+        job = claim_next_job()
+        # The worker committed the first row, an open session, then died
+        ParkingTransaction.objects.create(parking_lot=ParkingLot.objects.get(), license_plate='A',
+                                          entry_time=aware(2024, 5, 1, 8))
+        ImportJob.objects.filter(pk=job.pk).update(rows_processed=1)
+        self.assertIsNone(claim_next_job())
+
+        ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=make_aware(datetime.now()) - timedelta(minutes=10))
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual((job.rows_processed, job.result), (3, {'imported': 3}))
+        self.assertEqual(sorted(ParkingTransaction.objects.values_list('license_plate', flat=True)), ['A', 'B', 'C'])
+
+
+class QueryPlanTests(APITestCase):
+    """
+    EXPLAIN every query behind the filtered analytics endpoints and fail on a full table scan,
+    so a filter that wraps an indexed column in a function can't slip back in.
+    """
+
+    def setUp(self):
+        self.lot = ParkingLot.objects.create(name='Central', capacity=10)
+        ParkingHistory.objects.create(parking_lot=self.lot, date=date(2024, 5, 1), occupancy_rate=10, total_revenue=5)
+        HourlyOccupancy.objects.create(parking_lot=self.lot, date=date(2024, 5, 1), hour=time(8), occupancy_rate=10)
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[-1] for row in cursor.fetchall()]
+                return [line for line in plan if line.startswith('SCAN parking_')]
+            if connection.vendor == 'postgresql':
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN {sql}")
+                plan = [row[0] for row in cursor.fetchall()]
+                return [line for line in plan if 'Seq Scan on parking_' in line]
+        self.skipTest(f"No plan check for {connection.vendor}")
+
+    def assertNoFullScans(self, queries):
+        self.assertTrue(queries)
+        for query in queries:
+            self.assertEqual(self.full_scans(query['sql']), [], query['sql'])
+            # An index seek on parking_lot alone can hide a date filter that isn't sargable
+            where = query['sql'].partition(' WHERE ')[2].partition(' GROUP BY ')[0]
+            self.assertNotIn('extract', where.lower(), query['sql'])
+
+    def test_endpoints_use_indexes(self):
+        urls = [
+            f'/api/parking-lot/{self.lot.id}/historical-occupancy/?month=2024-05',
+            f'/api/parking-lot/{self.lot.id}/peak-hours/?date=2024-05-01',
+            f'/api/parking-lot/{self.lot.id}/revenue/?month=2024-05',
+            f'/api/parking-lot/{self.lot.id}/monthly-revenue/?year=2024',
+            '/api/revenue-bar/?month=5&year=2024',
+        ]
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+            self.assertNoFullScans(context.captured_queries)
+
+    def test_transaction_pages_use_index_order(self):
+        ParkingTransaction.objects.create(parking_lot=self.lot, license_plate='A1', entry_time=aware(2024, 5, 1, 8))
+        cursor = encode_cursor(aware(2024, 6, 1), 10 ** 6)
+        urls = [
+            f'/api/parking-transactions/?cursor={cursor}',
+            f'/api/parking-transactions/?lot={self.lot.id}&start=2024-05-01&end=2024-05-31&cursor={cursor}',
+            f'/api/parking-transactions/?plate=A1&cursor={cursor}',
+            '/api/parking-transactions/?plate=a-1&status=open',
+        ]
+        for url in urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+            self.assertNoFullScans(context.captured_queries)
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as db_cursor:
+                    db_cursor.execute(f"EXPLAIN QUERY PLAN {context.captured_queries[0]['sql']}")
+                    plan = ' '.join(row[-1] for row in db_cursor.fetchall())
+                # Rows come off the index in page order instead of being sorted
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_open_session_lookups_use_partial_indexes(self):
+        ParkingTransaction.objects.create(parking_lot=self.lot, license_plate='AB 123', entry_time=aware(2024, 5, 1, 8))
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(len(self.client.get('/api/parked-vehicles/?plate=ab1').json()), 1)
+            self.client.get(f'/api/parked-vehicles/?plate=ab&lot={self.lot.id}')
+            self.client.post(f'/api/parking-lot/{self.lot.id}/exits/', {'licensePlate': 'ab-123'}, format='json')
+        self.assertNoFullScans(context.captured_queries)
+
+    def test_occupancy_scan_uses_index(self):
+        with CaptureQueriesContext(connection) as context:
+            hourly_counts(self.lot.id, hour_buckets(date(2024, 5, 1), date(2024, 5, 1)))
+        self.assertNoFullScans(context.captured_queries)
+
+
+class RevenueRollupTests(APITestCase):
+    def setUp(self):
+        self.central = ParkingLot.objects.create(name='Central', capacity=10)
+        self.north = ParkingLot.objects.create(name='North', capacity=10)
+
+    def test_endpoints_read_maintained_rollups(self):
+        ParkingHistory.objects.bulk_create([
+            ParkingHistory(parking_lot=self.central, date=date(2024, 5, 1), total_revenue=10),
+            ParkingHistory(parking_lot=self.central, date=date(2024, 5, 20), total_revenue=5.5),
+            ParkingHistory(parking_lot=self.north, date=date(2024, 5, 3), total_revenue=7),
+            ParkingHistory(parking_lot=self.north, date=date(2024, 6, 3), total_revenue=1),
+        ])
+        edited = ParkingHistory.objects.create(parking_lot=self.central, date=date(2024, 6, 9), total_revenue=2)
+        edited.date = date(2024, 7, 1)
+        edited.save()
+
+        summary = self.client.get('/api/summary/').data
+        self.assertEqual(Decimal(summary['totalRevenue']), Decimal('25.50'))
+        self.assertEqual(self.client.get('/api/revenue-line/').json(), [
+            {'month': 'May 2024', 'revenue': 22.5},
+            {'month': 'June 2024', 'revenue': 1.0},
+            {'month': 'July 2024', 'revenue': 2.0},
+        ])
+        self.assertEqual(self.client.get('/api/revenue-bar/?month=5&year=2024').json(), [
+            {'lotName': 'Central', 'revenue': 15.5},
+            {'lotName': 'North', 'revenue': 7.0},
+        ])
+        self.assertEqual(self.client.get(f'/api/parking-lot/{self.central.id}/monthly-revenue/?year=2024').json(), [
+            {'month': '2024-05-01', 'total_revenue': 15.5},
+            {'month': '2024-07-01', 'total_revenue': 2.0},
+        ])
+
+        edited.delete()
+        self.assertFalse(MonthlyRevenueRollup.objects.filter(month=date(2024, 7, 1)).exists())
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+
+    def test_rebuild_repairs_drift(self):
+        ParkingHistory.objects.create(parking_lot=self.central, date=date(2024, 5, 1), total_revenue=10)
+        MonthlyRevenueRollup.objects.filter(parking_lot=self.central).update(total_revenue=99)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        call_command('rebuild_rollups', '--check', stdout=io.StringIO())
+
+    def test_grand_total_row_is_unique(self):
+        ParkingHistory.objects.create(parking_lot=self.central, date=date(2024, 5, 1), total_revenue=10)
+        with self.assertRaises(IntegrityError):
+            MonthlyRevenueRollup.objects.create(parking_lot=None, month=None, total_revenue=1)
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'dashboard': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'response-cache-tests'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        caches['dashboard'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lot = ParkingLot.objects.create(name='Central', capacity=10)
+            ParkingHistory.objects.create(parking_lot=self.lot, date=date(2024, 5, 1), total_revenue=10)
+
+    def test_cached_until_data_changes(self):
+        url = f'/api/parking-lot/{self.lot.id}/revenue/?month=2024-05'
+        first = self.client.get(url).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ParkingHistory.objects.create(parking_lot=self.lot, date=date(2024, 5, 2), total_revenue=3)
+        self.assertEqual(len(self.client.get(url).json()), 2)
+
+        stats = self.client.get('/api/cache-stats/').json()
+        self.assertEqual(stats['endpoints']['parking-lot-revenue'], {'hits': 1, 'misses': 2})
+
+    def test_writes_only_retire_responses_of_the_scopes_they_touch(self):
+        self.client.get('/api/summary/')
+        revenue_url = f'/api/parking-lot/{self.lot.id}/revenue/?month=2024-05'
+        self.client.get(revenue_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/parking-lot/{self.lot.id}/entries/', {'licensePlate': 'AB 123'}, format='json')
+        with self.assertNumQueries(0):
+            self.client.get('/api/summary/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            north = ParkingLot.objects.create(name='North', capacity=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            ParkingHistory.objects.create(parking_lot=north, date=date(2024, 5, 1), total_revenue=1)
+        with self.assertNumQueries(0):
+            self.client.get(revenue_url)
+        self.assertEqual(self.client.get('/api/summary/').json()['totalLots'], 2)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        may = self.client.get('/api/revenue-bar/?month=5&year=2024').json()
+        june = self.client.get('/api/revenue-bar/?month=6&year=2024').json()
+        self.assertEqual(len(may), 1)
+        self.assertEqual(june, [])
+
+    def test_occupancy_command_invalidates(self):
+        url = f'/api/parking-lot/{self.lot.id}/peak-hours/?date=2024-05-01'
+        self.assertEqual(self.client.get(url).json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('calculate_hourly_occupancy', '--start', '2024-05-01', stdout=io.StringIO())
+        self.assertEqual(len(self.client.get(url).json()), 24)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        caches['dashboard'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.central = ParkingLot.objects.create(name='Central', capacity=10)
+            self.north = ParkingLot.objects.create(name='North', capacity=10)
+            ParkingHistory.objects.create(parking_lot=self.central, date=date(2024, 5, 1), total_revenue=10)
+        self.url = f'/api/parking-lot/{self.central.id}/revenue/?month=2024-05'
+
+    def test_unchanged_lot_answers_304_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'])
+        self.assertTrue(first['Last-Modified'])
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        # Another lot's writes leave this lot's ETag alone
+        with self.captureOnCommitCallbacks(execute=True):
+            ParkingHistory.objects.create(parking_lot=self.north, date=date(2024, 5, 1), total_revenue=1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ParkingHistory.objects.create(parking_lot=self.central, date=date(2024, 5, 2), total_revenue=1)
+        third = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_query_parameters_change_the_etag(self):
+        may = self.client.get(self.url)
+        june = self.client.get(f'/api/parking-lot/{self.central.id}/revenue/?month=2024-06',
+                               HTTP_IF_NONE_MATCH=may['ETag'])
+        self.assertEqual(june.status_code, 200)
+
+    def test_if_modified_since(self):
+        first = self.client.get('/api/summary/')
+        self.assertEqual(self.client.get('/api/summary/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code,
+                         304)
+
+
+class ParkingLotDetailTests(APITestCase):
+    def setUp(self):
+        self.lot = ParkingLot.objects.create(name='Central', capacity=10)
+        ParkingHistory.objects.bulk_create([
+            ParkingHistory(parking_lot=self.lot, date=date(2024, 5, 1), occupancy_rate=40, total_revenue=10),
+            ParkingHistory(parking_lot=self.lot, date=date(2024, 5, 2), occupancy_rate=50, total_revenue=5),
+            ParkingHistory(parking_lot=self.lot, date=date(2024, 6, 1), occupancy_rate=60, total_revenue=3),
+            ParkingHistory(parking_lot=self.lot, date=date(2023, 6, 1), occupancy_rate=60, total_revenue=100),
+        ])
+        HourlyOccupancy.objects.create(parking_lot=self.lot, date=date(2024, 5, 1), hour=time(8), occupancy_rate=20)
+
+    def test_matches_single_endpoints_in_three_queries(self):
+        params = {'month': '2024-05', 'date': '2024-05-01', 'year': '2024'}
+        with self.assertNumQueries(3):
+            detail = self.client.get(f'/api/parking-lot/{self.lot.id}/detail/', params).json()
+
+        base = f'/api/parking-lot/{self.lot.id}'
+        self.assertEqual(detail['summary'], {'id': self.lot.id, 'name': 'Central', 'capacity': 10, 'totalRevenue': 118.0})
+        self.assertEqual(detail['historicalOccupancy'],
+                         self.client.get(f'{base}/historical-occupancy/', {'month': '2024-05'}).json())
+        self.assertEqual(detail['revenueData'], self.client.get(f'{base}/revenue/', {'month': '2024-05'}).json())
+        self.assertEqual(detail['peakHours'], self.client.get(f'{base}/peak-hours/', {'date': '2024-05-01'}).json())
+        self.assertEqual(detail['monthlyRevenueData'],
+                         self.client.get(f'{base}/monthly-revenue/', {'year': '2024'}).json())
+
+    def test_missing_parameters_give_empty_lists(self):
+        detail = self.client.get(f'/api/parking-lot/{self.lot.id}/detail/').json()
+        self.assertEqual(detail['historicalOccupancy'], [])
+        self.assertEqual(detail['monthlyRevenueData'], [])
+
+    def test_unknown_lot(self):
+        self.assertEqual(self.client.get('/api/parking-lot/999/detail/').status_code, 404)
+
+
+class BatchAnalyticsTests(APITestCase):
+    url = '/api/analytics/batch/'
+
+    def setUp(self):
+        self.central = ParkingLot.objects.create(name='Central', capacity=10)
+        self.north = ParkingLot.objects.create(name='North', capacity=20)
+        ParkingLot.objects.create(name='Empty', capacity=5)
+        ParkingHistory.objects.bulk_create([
+            ParkingHistory(parking_lot=self.central, date=date(2024, 4, 1), occupancy_rate=40, total_revenue=10),
+            ParkingHistory(parking_lot=self.central, date=date(2024, 6, 30), occupancy_rate=60, total_revenue=5),
+            ParkingHistory(parking_lot=self.central, date=date(2024, 7, 1), occupancy_rate=90, total_revenue=50),
+            ParkingHistory(parking_lot=self.north, date=date(2024, 5, 1), occupancy_rate=10, total_revenue=1),
+        ])
+        HourlyOccupancy.objects.bulk_create([
+            HourlyOccupancy(parking_lot=self.central, date=date(2024, 4, 1), hour=time(8), occupancy_rate=20),
+            HourlyOccupancy(parking_lot=self.central, date=date(2024, 4, 2), hour=time(8), occupancy_rate=40),
+        ])
+
+    def test_columnar_quarter_for_selected_lots(self):
+        params = {'lots': f'{self.central.id},{self.north.id}', 'start': '2024-04-01', 'end': '2024-06-30',
+                  'metrics': 'occupancy,revenue,peak_hours'}
+        with self.assertNumQueries(4):
+            data = self.client.get(self.url, params).json()
+
+        self.assertEqual(data['lots']['name'], ['Central', 'North'])
+        self.assertEqual(data['daily'], {
+            'lot': [self.central.id, self.central.id, self.north.id],
+            'date': ['2024-04-01', '2024-06-30', '2024-05-01'],
+            'occupancy_rate': [40.0, 60.0, 10.0],
+            'total_revenue': [10.0, 5.0, 1.0],
+        })
+        self.assertEqual(data['totals']['total_revenue'], [15.0, 1.0])
+        self.assertEqual(data['totals']['average_occupancy_rate'], [50.0, 10.0])
+        self.assertEqual(data['peakHours'], {'lot': [self.central.id], 'hour': ['08:00:00'],
+                                             'average_occupancy_rate': [30.0]})
+
+    def test_all_lots_and_metric_selection(self):
+        data = self.client.get(self.url, {'lots': 'all', 'start': '2024-07-01', 'end': '2024-07-31',
+                                          'metrics': 'revenue'}).json()
+        self.assertEqual(len(data['lots']['id']), 3)
+        self.assertEqual(set(data['daily']), {'lot', 'date', 'total_revenue'})
+        self.assertNotIn('peakHours', data)
+
+    def test_validation(self):
+        self.assertEqual(self.client.get(self.url, {'start': '2024-07-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2024-07-01', 'end': '2024-06-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2024-07-01', 'end': '2024-07-02',
+                                                    'metrics': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'lots': 'a,b', 'start': '2024-07-01',
+                                                    'end': '2024-07-02'}).status_code, 400)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.central = ParkingLot.objects.create(name='Central', capacity=10)
+        self.north = ParkingLot.objects.create(name='North', capacity=20)
+        ParkingTransaction.objects.bulk_create([
+            ParkingTransaction(parking_lot=self.central, license_plate='A1', entry_time=aware(2024, 3, 1, 8),
+                               exit_time=aware(2024, 3, 1, 10), revenue=Decimal('4.50')),
+            ParkingTransaction(parking_lot=self.central, license_plate='A2', entry_time=aware(2024, 3, 2, 23),
+                               exit_time=None, revenue=0),
+            ParkingTransaction(parking_lot=self.north, license_plate='B1', entry_time=aware(2024, 3, 1, 9),
+                               exit_time=aware(2024, 3, 1, 9, 30), revenue=2),
+        ])
+        ParkingHistory.objects.bulk_create([
+            ParkingHistory(parking_lot=self.central, date=date(2024, 3, 1), occupancy_rate=40, total_revenue=10),
+            ParkingHistory(parking_lot=self.north, date=date(2024, 3, 1), occupancy_rate=10, total_revenue=1),
+        ])
+
+    def test_transaction_csv_streams_filtered_rows(self):
+        response = self.client.get('/api/parking-transaction/export/',
+                                   {'lot': str(self.central.id), 'start': '2024-03-01', 'end': '2024-03-02'})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        frame = pd.read_csv(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(list(frame.columns), ['Parking Lot', 'License Plate', 'Entry Time', 'Exit Time', 'Revenue'])
+        self.assertEqual(list(frame['License Plate']), ['A1', 'A2'])
+        self.assertEqual(frame['Entry Time'][0], '2024-03-01 08:00:00')
+        self.assertTrue(pd.isna(frame['Exit Time'][1]))
+
+        response = self.client.get('/api/parking-transaction/export/', {'end': '2024-03-01'})
+        frame = pd.read_csv(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(list(frame['License Plate']), ['A1', 'B1'])
+
+    def test_exported_transactions_import_back(self):
+        response = self.client.get('/api/parking-transaction/export/', {'format': 'xlsx'})
+        content = b''.join(response.streaming_content)
+        ParkingTransaction.objects.all().delete()
+
+        upload = SimpleUploadedFile('export.xlsx', content)
+        with override_settings(IMPORT_IN_BACKGROUND=False):
+            response = self.client.post('/api/parking-transaction/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ParkingTransaction.objects.count(), 3)
+        self.assertEqual(ParkingTransaction.objects.get(license_plate='A1').revenue, Decimal('4.50'))
+
+    def test_history_xlsx(self):
+        response = self.client.get('/api/parking-history/export/', {'format': 'xlsx', 'lot': str(self.north.id)})
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('parking_lot', 'date', 'occupancy_rate', 'total_revenue'))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], 'North')
+
+    def test_invalid_parameters(self):
+        for params in ({'format': 'pdf'}, {'lot': 'x'}, {'start': '2024-13-01'}, {'end': 'yesterday'}):
+            response = self.client.get('/api/parking-history/export/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ParkingTransactionListTests(APITestCase):
+    url = '/api/parking-transactions/'
+
+    def setUp(self):
+        self.central = ParkingLot.objects.create(name='Central', capacity=10)
+        self.north = ParkingLot.objects.create(name='North', capacity=20)
+        transactions = [
+            ParkingTransaction(parking_lot=self.central, license_plate=f'C{i}', entry_time=aware(2024, 3, 1, 8 + i // 2),
+                               exit_time=aware(2024, 3, 1, 12) if i % 3 else None)
+            for i in range(7)
+        ]
+        transactions.append(ParkingTransaction(parking_lot=self.north, license_plate='C1',
+                                               entry_time=aware(2024, 3, 2, 9), exit_time=aware(2024, 3, 2, 10)))
+        ParkingTransaction.objects.bulk_create(transactions)
+
+    def pages(self, params, limit):
+        results, url, params = [], self.url, {**params, 'limit': limit}
+        while url:
+            data = self.client.get(url, params).json()
+            results.extend(data['results'])
+            url, params = data['next'], None
+        return results
+
+    def test_pages_cover_every_row_once_with_ties(self):
+        results = self.pages({}, 3)
+        expected = list(ParkingTransaction.objects.order_by('-entry_time', '-id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in results], expected)
+        self.assertEqual(results[0]['parkingLotName'], 'North')
+
+    def test_filters(self):
+        central = self.pages({'lot': str(self.central.id), 'status': 'open'}, 2)
+        self.assertEqual(sorted(row['licensePlate'] for row in central), ['C0', 'C3', 'C6'])
+        self.assertTrue(all(row['exitTime'] is None for row in central))
+
+        plate = self.pages({'plate': 'C1', 'start': '2024-03-02'}, 10)
+        self.assertEqual([row['parkingLot'] for row in plate], [self.north.id])
+
+        window = self.pages({'start': '2024-03-01T09:00:00', 'end': '2024-03-01', 'status': 'closed'}, 10)
+        self.assertEqual(sorted(row['licensePlate'] for row in window), ['C2', 'C4', 'C5'])
+
+    def test_page_queries_do_not_grow_with_depth(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(self.url, {'limit': 1}).json()
+        with self.assertNumQueries(1):
+            self.client.get(data['next'])
+
+    def test_invalid_parameters(self):
+        for params in ({'cursor': 'nope'}, {'status': 'parked'}, {'start': 'soon'}, {'limit': '0'}, {'lot': 'x'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+
+class LiveOccupancyTests(APITestCase):
+    def setUp(self):
+        self.lot = ParkingLot.objects.create(name='Central', capacity=2)
+        self.base = f'/api/parking-lot/{self.lot.id}'
+
+    def test_gate_events_maintain_counter(self):
+        response = self.client.post(f'{self.base}/entries/', {'licensePlate': 'AB123'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['live']['occupied'], 1)
+        self.client.post(f'{self.base}/entries/', {'licensePlate': 'CD456', 'time': '2024-05-01T08:00:00'},
+                         format='json')
+        self.client.post(f'{self.base}/entries/', {'licensePlate': 'EF789'}, format='json')
+
+        with CaptureQueriesContext(connection) as context:
+            live = self.client.get(f'{self.base}/live/').json()
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('parking_parkingtransaction', context.captured_queries[0]['sql'])
+        self.assertEqual((live['occupied'], live['free']), (3, 0))
+
+        response = self.client.post(f'{self.base}/exits/', {'licensePlate': 'CD456', 'revenue': '7.50'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['live']['free'], 0)
+        self.assertEqual(response.json()['transaction']['revenue'], '7.50')
+        self.assertEqual(LiveOccupancy.objects.get(parking_lot=self.lot).occupied, 2)
+        self.assertEqual(ParkingTransaction.objects.filter(exit_time__isnull=True).count(), 2)
+
+    def test_rejected_events(self):
+        self.client.post(f'{self.base}/entries/', {'licensePlate': 'AB123'}, format='json')
+        duplicate = self.client.post(f'{self.base}/entries/', {'licensePlate': 'AB123'}, format='json')
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(self.client.post(f'{self.base}/exits/', {'licensePlate': 'ZZ'}, format='json').status_code, 409)
+        self.assertEqual(self.client.post(f'{self.base}/exits/', {'licensePlate': 'AB123', 'time': 'later'},
+                                          format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/parking-lot/999/entries/', {'licensePlate': 'X'},
+                                          format='json').status_code, 404)
+        self.assertEqual(self.client.get('/api/parking-lot/999/live/').status_code, 404)
+        self.assertEqual(LiveOccupancy.objects.get(parking_lot=self.lot).occupied, 1)
+
+    def test_racing_entries_open_one_session(self):
+        ParkingTransaction.objects.create(parking_lot=self.lot, license_plate='AB123', entry_time=aware(2024, 5, 1, 8))
+        # An entry that got past the open session check before the first one committed
+        with mock.patch('parking.live.normalize_plate', return_value='UNSEEN'):
+            with self.assertRaises(GateEventError):
+                record_entry(self.lot, 'ab-123')
+        self.assertEqual(ParkingTransaction.objects.filter(exit_time__isnull=True).count(), 1)
+        with self.assertRaises(IntegrityError):
+            ParkingTransaction.objects.bulk_create([
+                ParkingTransaction(parking_lot=self.lot, license_plate='AB 123', entry_time=aware(2024, 5, 1, 9))])
+
+    def test_duplicate_open_sessions_block_the_migration_until_closed(self):
+        # Sessions opened twice before unique_open_session existed
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX unique_open_session')
+        ParkingTransaction.objects.bulk_create([
+            ParkingTransaction(parking_lot=self.lot, license_plate=plate, entry_time=aware(2024, 5, 1, hour))
+            for plate, hour in (('AB123', 8), ('ab-123', 10), ('AB 123', 12), ('CD456', 9))
+        ])
+        migration = importlib.import_module('parking.migrations.0019_unique_open_session')
+        with self.assertRaisesMessage(RuntimeError, f'lot {self.lot.id}, plate AB123: 3 open sessions'):
+            migration.check_duplicate_open_sessions(django_apps, None)
+
+        out = io.StringIO()
+        call_command('close_duplicate_open_sessions', dry_run=True, stdout=out)
+        self.assertIn('2 duplicate open sessions would be closed', out.getvalue())
+        self.assertEqual(ParkingTransaction.objects.filter(exit_time__isnull=True).count(), 4)
+
+        call_command('close_duplicate_open_sessions', stdout=out)
+        self.assertIn('entered 2024-05-01 08:00) closed at 2024-05-01 10:00', out.getvalue())
+        self.assertEqual(list(ParkingTransaction.objects.filter(exit_time__isnull=True)
+                              .order_by('license_plate').values_list('license_plate', flat=True)), ['AB 123', 'CD456'])
+        self.assertEqual(LiveOccupancy.objects.get(parking_lot=self.lot).occupied, 2)
+        self.assertTrue(DirtyOccupancyHour.objects.filter(parking_lot=self.lot, date=date(2024, 5, 1)).exists())
+        migration.check_duplicate_open_sessions(django_apps, None)
+
+    def test_reconcile_corrects_drift(self):
+        self.client.post(f'{self.base}/entries/', {'licensePlate': 'AB123'}, format='json')
+        # Imported open sessions bypass the gate API
+        ParkingTransaction.objects.bulk_create([
+            ParkingTransaction(parking_lot=self.lot, license_plate=f'IMP{i}', entry_time=aware(2024, 5, 1, 8))
+            for i in range(3)
+        ])
+        self.assertEqual(self.client.get(f'{self.base}/live/').json()['occupied'], 1)
+
+        out = io.StringIO()
+        call_command('reconcile_live_occupancy', stdout=out)
+        self.assertIn('counter was 1, 4 sessions are open', out.getvalue())
+        self.assertEqual(self.client.get(f'{self.base}/live/').json()['occupied'], 4)
+
+
+class PlateSearchTests(APITestCase):
+    def setUp(self):
+        self.central = ParkingLot.objects.create(name='Central', capacity=10)
+        self.north = ParkingLot.objects.create(name='North', capacity=10)
+        ParkingTransaction.objects.bulk_create([
+            ParkingTransaction(parking_lot=self.central, license_plate='ab-123', entry_time=aware(2024, 5, 1, 8)),
+            ParkingTransaction(parking_lot=self.north, license_plate='AB 129', entry_time=aware(2024, 5, 1, 9)),
+            ParkingTransaction(parking_lot=self.north, license_plate='AB124', entry_time=aware(2024, 5, 1, 7),
+                               exit_time=aware(2024, 5, 1, 8)),
+            ParkingTransaction(parking_lot=self.central, license_plate='AC100', entry_time=aware(2024, 5, 1, 9)),
+        ])
+
+    def test_plate_key_is_normalised_on_bulk_writes(self):
+        self.assertEqual(sorted(ParkingTransaction.objects.values_list('plate_key', flat=True)),
+                         ['AB123', 'AB124', 'AB129', 'AC100'])
+        ParkingTransaction.objects.filter(license_plate='AC100').update(license_plate='zz 9')
+        self.assertTrue(ParkingTransaction.objects.filter(plate_key='ZZ9').exists())
+
+    def test_parked_vehicles_prefix_search(self):
+        plates = [row['licensePlate'] for row in self.client.get('/api/parked-vehicles/', {'plate': 'a b-1'}).json()]
+        self.assertEqual(plates, ['ab-123', 'AB 129'])
+        in_lot = self.client.get('/api/parked-vehicles/', {'plate': 'AB12', 'lot': self.north.id}).json()
+        self.assertEqual([row['licensePlate'] for row in in_lot], ['AB 129'])
+        self.assertEqual(self.client.get('/api/parked-vehicles/', {'plate': ' - '}).status_code, 400)
+
+    def test_gate_events_match_normalised_plates(self):
+        duplicate = self.client.post(f'/api/parking-lot/{self.central.id}/entries/', {'licensePlate': 'AB 123'},
+                                     format='json')
+        self.assertEqual(duplicate.status_code, 409)
+
+    def test_admin_search_uses_prefix(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        response = self.client.get('/admin/parking/parkingtransaction/', {'q': 'ab12'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(obj.plate_key for obj in response.context['cl'].result_list),
+                         ['AB123', 'AB124', 'AB129'])
+
+
+class AsyncURLConf:
+    urlpatterns = [path('api/', include(read_urlpatterns(use_async=True)))]
+
+
+def read_urls(lot_id):
+    return [
+        '/api/summary/',
+        '/api/parking-lots/',
+        '/api/revenue-line/',
+        '/api/revenue-bar/?month=5&year=2024',
+        f'/api/parking-lot/{lot_id}/historical-occupancy/?month=2024-05',
+        f'/api/parking-lot/{lot_id}/peak-hours/?date=2024-05-01',
+        f'/api/parking-lot/{lot_id}/revenue/?month=2024-05',
+        f'/api/parking-lot/{lot_id}/monthly-revenue/?year=2024',
+        f'/api/parking-lot/{lot_id}/detail/?month=2024-05&year=2024&date=2024-05-01',
+        f'/api/parking-lot/{lot_id}/live/',
+        '/api/parking-lot/999/detail/',
+    ]
+
+
+def create_read_data():
+    lot = ParkingLot.objects.create(name='Central', capacity=10)
+    ParkingLot.objects.create(name='North', capacity=20)
+    ParkingHistory.objects.bulk_create([
+        ParkingHistory(parking_lot=lot, date=date(2024, 5, 1), occupancy_rate=40, total_revenue=Decimal('10.50')),
+        ParkingHistory(parking_lot=lot, date=date(2024, 5, 2), occupancy_rate=60, total_revenue=5),
+        ParkingHistory(parking_lot=lot, date=date(2024, 6, 1), occupancy_rate=20, total_revenue=7),
+    ])
+    HourlyOccupancy.objects.bulk_create([
+        HourlyOccupancy(parking_lot=lot, date=date(2024, 5, 1), hour=time(hour), occupancy_rate=hour)
+        for hour in (8, 9)
+    ])
+    return lot
+
+
+@override_settings(ASYNC_CONCURRENT_QUERIES=False)
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        self.lot = create_read_data()
+
+    def test_async_views_match_sync_views(self):
+        for url in read_urls(self.lot.id):
+            with self.subTest(url=url):
+                expected = self.client.get(url)
+                with override_settings(ROOT_URLCONF=AsyncURLConf):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    def test_only_get_is_allowed(self):
+        self.assertEqual(self.client.post('/api/summary/').status_code, 405)
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf, CACHES=LOCMEM_CACHES)
+    def test_async_views_cache_and_answer_conditional_requests(self):
+        caches['dashboard'].clear()
+        url = f'/api/parking-lot/{self.lot.id}/revenue/?month=2024-05'
+        first = self.client.get(url)
+        self.assertTrue(first['ETag'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf, ASYNC_CONCURRENT_QUERIES=True)
+class ConcurrentQueryTests(TransactionTestCase):
+    # Committed data, so the extra connections opened for concurrent sub-queries can see it.
+    # Outside a transaction these reads go to the replica alias when one is configured
+    databases = '__all__'
+
+    def test_detail_and_summary_sub_queries_run_concurrently(self):
+        lot = create_read_data()
+        detail = self.client.get(f'/api/parking-lot/{lot.id}/detail/?month=2024-05&year=2024&date=2024-05-01').json()
+        self.assertEqual(detail['summary']['name'], 'Central')
+        self.assertEqual(len(detail['historicalOccupancy']), 2)
+        self.assertEqual(len(detail['peakHours']), 2)
+        self.assertEqual(len(detail['monthlyRevenueData']), 2)
+        summary = self.client.get('/api/summary/').json()
+        self.assertEqual((summary['totalLots'], summary['totalCapacity'], summary['totalRevenue']), (2, 30, '22.50'))
+
+
+class SyntheticDataTests(TestCase):
+    def generated(self):
+        return list(ParkingTransaction.objects.order_by('id').values_list(
+            'parking_lot__name', 'license_plate', 'entry_time', 'exit_time', 'revenue'))
+
+    def test_same_seed_gives_same_data(self):
+        counts = generate_synthetic_data(lots=3, transactions=300, days=5, seed=7)
+        self.assertEqual(counts, {'lots': 3, 'transactions': 300, 'history': 15, 'hourly_occupancy': 360})
+        first = self.generated()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(clear_synthetic_data(batch_size=100), 3)
+        # Per lot: its change record and archive removal; then one record per dependent table
+        self.assertEqual(len(callbacks), 3 * 2 + 3)
+        self.assertFalse(ParkingTransaction.objects.exists())
+
+        generate_synthetic_data(lots=3, transactions=300, days=5, seed=7)
+        self.assertEqual(self.generated(), first)
+        self.assertFalse(DirtyOccupancyHour.objects.exists())
+        self.assertEqual(grand_total(), ParkingHistory.objects.aggregate(total=Sum('total_revenue'))['total'])
+
+        clear_synthetic_data()
+        generate_synthetic_data(lots=3, transactions=300, days=5, seed=8)
+        self.assertNotEqual(self.generated(), first)
+
+    def test_benchmark_times_every_route(self):
+        result = run_scale(200, lots=2, days=3, repeat=1, import_rows=50)
+        timed = set(result['urls']) | set(result['gate_events']) | {name.split(':')[0] for name in result['imports']}
+        self.assertEqual(timed, {pattern.name for pattern in parking_urls.urlpatterns})
+        for name, entry in result['urls'].items():
+            self.assertLess(entry['status'], 400, name)
+        self.assertEqual(regressions({'scales': [result]}, {'scales': [result]}), [])
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        reset_metrics()
+        self.lot = create_read_data()
+
+    def metric(self, text, line_start):
+        values = [line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(line_start)]
+        self.assertEqual(len(values), 1, line_start)
+        return float(values[0])
+
+    def test_requests_are_recorded_per_url_name(self):
+        with self.assertNumQueries(3):
+            self.client.get('/api/summary/')
+        self.client.get('/api/summary/')
+        self.client.get('/api/parking-lots/')
+        self.client.get('/api/no-such-endpoint/')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE parking_http_request_duration_seconds histogram', text)
+        self.assertEqual(self.metric(text, 'parking_http_request_duration_seconds_count{view="summary",method="GET",status="200"}'), 2)
+        self.assertEqual(self.metric(text, 'parking_http_request_duration_seconds_bucket{view="summary",method="GET",status="200",le="+Inf"}'), 2)
+        self.assertEqual(self.metric(text, 'parking_http_request_db_queries_sum{view="summary",method="GET"}'), 6)
+        self.assertGreater(self.metric(text, 'parking_http_request_db_duration_seconds_sum{view="summary",method="GET"}'), 0)
+        self.assertEqual(self.metric(text, 'parking_http_request_duration_seconds_count{view="<unmatched>",method="GET",status="404"}'), 1)
+        self.assertEqual(self.metric(text, 'parking_http_response_size_bytes_sum{view="parking-lot-list",method="GET"}'),
+                         len(self.client.get('/api/parking-lots/').content))
+
+    def test_streamed_bodies_are_measured_when_sent(self):
+        response = self.client.get('/api/parking-history/export/')
+        size = len(b''.join(response.streaming_content))
+        text = self.client.get('/metrics').content.decode()
+        self.assertEqual(self.metric(text, 'parking_http_response_size_bytes_sum{view="export_parking_history",method="GET"}'), size)
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf, ASYNC_CONCURRENT_QUERIES=False)
+    def test_async_view_queries_are_attributed(self):
+        self.client.get(f'/api/parking-lot/{self.lot.id}/detail/?month=2024-05&year=2024&date=2024-05-01')
+        with override_settings(ROOT_URLCONF='parking_lot_system.urls'):
+            text = self.client.get('/metrics').content.decode()
+        self.assertEqual(self.metric(text, 'parking_http_request_db_queries_sum{view="parking-lot-detail",method="GET"}'), 3)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_TOKEN='secret', PROFILING_SAMPLE_RATE=0.0)
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        self.lot = create_read_data()
+        self.url = f'/api/parking-lot/{self.lot.id}/monthly-revenue/?year=2024'
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(PROFILING_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_inline_report(self):
+        report = self.client.get(self.url, HTTP_X_PROFILE='secret', HTTP_X_PROFILE_OUTPUT='inline').json()
+        self.assertEqual((report['view'], report['status'], report['sqlCount']), ('parking-lot-monthly-revenue', 200, 1))
+        self.assertIn('parking_monthlyrevenuerollup', report['sql'][0]['sql'])
+        self.assertIn('views.py', report['profile'])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_report_written_to_directory(self):
+        response = self.client.get(f'{self.url}&profile=secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+        profile_id = response['X-Profile-Id']
+        self.assertEqual(sorted(os.listdir(self.directory)), [f'{profile_id}.json', f'{profile_id}.prof'])
+
+    def test_unauthorized_requests_are_not_profiled(self):
+        response = self.client.get(self.url, HTTP_X_PROFILE='guess', HTTP_X_PROFILE_OUTPUT='inline')
+        self.assertEqual(len(response.json()), 2)
+        self.assertNotIn('X-Profile-Id', response)
+        with override_settings(PROFILING_TOKEN=None):
+            self.assertNotIn('X-Profile-Id', self.client.get(self.url, HTTP_X_PROFILE='secret'))
+
+    def test_sampling(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            self.assertIn('X-Profile-Id', self.client.get(self.url))
+
+    def test_connection_opened_during_request_keeps_metrics_wrapper(self):
+        self.addCleanup(setattr, connection, 'execute_wrappers', connection.execute_wrappers)
+        connection.execute_wrappers = []
+
+        def get_response(request):
+            # What connection_created does for a connection the view opens
+            install_query_wrapper(sender=None, connection=connection)
+            ParkingLot.objects.count()
+            return HttpResponse()
+
+        request = RequestFactory().get('/', HTTP_X_PROFILE='secret', HTTP_X_PROFILE_OUTPUT='inline')
+        report = json.loads(ProfilingMiddleware(get_response)(request).content)
+        self.assertEqual(report['sqlCount'], 1)
+        self.assertEqual(connection.execute_wrappers, [record_query])
+
+    def test_disabled_middleware_is_not_loaded(self):
+        with override_settings(PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: None)
+            response = self.client_class().get(self.url, HTTP_X_PROFILE='secret', HTTP_X_PROFILE_OUTPUT='inline')
+        self.assertEqual(len(response.json()), 2)
+
+
+class FastRendererTests(APITestCase):
+    def setUp(self):
+        self.lot = create_read_data()
+
+    def test_matches_drf_rendering(self):
+        from rest_framework.renderers import JSONRenderer
+        rows = [(date(2024, 5, 1), time(8), Decimal('10.50'), aware(2024, 5, 1, 8, 30), None)]
+        columns = ['date', 'hour', 'rate', 'at', 'missing']
+        self.assertEqual(FastJSONRenderer().render(Rows(columns, rows)),
+                         JSONRenderer().render([dict(zip(columns, row)) for row in rows]))
+        self.assertEqual(FastJSONRenderer().render(Rows(columns, rows, columnar=True)),
+                         b'{"date":["2024-05-01"],"hour":["08:00:00"],"rate":[10.5],"at":["2024-05-01T08:30:00Z"],'
+                         b'"missing":[null]}')
+        self.assertEqual(FastJSONRenderer().render({'nested': Rows(['a'], [])}), b'{"nested":[]}')
+
+    def test_columnar_layout(self):
+        url = f'/api/parking-lot/{self.lot.id}/historical-occupancy/?month=2024-05'
+        self.assertEqual(self.client.get(url).json(), [{'date': '2024-05-01', 'occupancy_rate': 40.0},
+                                                       {'date': '2024-05-02', 'occupancy_rate': 60.0}])
+        self.assertEqual(self.client.get(f'{url}&layout=columns').json(),
+                         {'date': ['2024-05-01', '2024-05-02'], 'occupancy_rate': [40.0, 60.0]})
+        self.assertEqual(self.client.get('/api/revenue-line/?layout=columns').json(),
+                         {'month': ['May 2024', 'June 2024'], 'revenue': [15.5, 7.0]})
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_cached_rows_render_the_same(self):
+        caches['dashboard'].clear()
+        url = f'/api/parking-lot/{self.lot.id}/revenue/?month=2024-05&layout=columns'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+
+
+@override_settings(DATABASE_READ_REPLICA='replica')
+class ReadReplicaRouterTests(SimpleTestCase):
+    router = ReadReplicaRouter()
+
+    def test_analytics_reads_of_get_requests_use_the_replica(self):
+        self.assertEqual(self.router.db_for_read(ParkingHistory), 'default')
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(ParkingHistory), 'replica')
+            self.assertEqual(self.router.db_for_read(ParkingLot), 'replica')
+            self.assertEqual(self.router.db_for_read(LiveOccupancy), 'default')
+            self.assertEqual(self.router.db_for_read(ImportJob), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+            self.assertEqual(self.router.db_for_write(ParkingHistory), 'default')
+            with read_from_replica(False):
+                self.assertEqual(self.router.db_for_read(ParkingHistory), 'default')
+        with override_settings(DATABASE_READ_REPLICA=None), read_from_replica():
+            self.assertEqual(self.router.db_for_read(ParkingHistory), 'default')
+
+    def test_live_counters_are_read_from_the_primary(self):
+        with read_from_replica():
+            self.assertEqual(live_occupancy_row(1).db, 'default')
+
+    def test_related_reads_follow_the_instance(self):
+        lot = ParkingLot(name='Lot', capacity=1)
+        lot._state.db = 'default'
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(ParkingHistory, instance=lot), 'default')
+
+    def test_replica_is_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'parking'))
+        self.assertTrue(self.router.allow_migrate('default', 'parking'))
+
+    def test_middleware_enables_replica_reads_for_safe_methods(self):
+        middleware = ReplicaReadMiddleware(lambda request: replica_reads.get())
+        self.assertTrue(middleware(RequestFactory().get('/api/summary/')))
+        self.assertFalse(middleware(RequestFactory().post('/api/parking-lot/1/entries/')))
+        self.assertFalse(replica_reads.get())
+        with override_settings(DATABASE_READ_REPLICA=None), self.assertRaises(MiddlewareNotUsed):
+            ReplicaReadMiddleware(lambda request: None)
+
+    def test_cached_responses_are_computed_on_the_primary(self):
+        def get(view, request):
+            return Response({'replica': replica_reads.get()})
+
+        async def view(request):
+            return HttpResponse(str(replica_reads.get()))
+
+        request = RequestFactory().get('/api/summary/')
+        with read_from_replica():
+            self.assertEqual(cached_get('summary', lambda request: [('lot', None)])(get)(None, request).data,
+                             {'replica': False})
+            response = async_to_sync(async_cached_view('summary', lambda request: [('lot', None)])(view))(request)
+            self.assertEqual(response.content, b'False')
+            self.assertTrue(replica_reads.get())
+
+
+class ReadReplicaTransactionTests(TestCase):
+    @override_settings(DATABASE_READ_REPLICA='replica')
+    def test_reads_inside_a_primary_transaction_stay_on_the_primary(self):
+        # TestCase wraps each test in a transaction on the primary
+        with read_from_replica():
+            self.assertEqual(ReadReplicaRouter().db_for_read(ParkingHistory), 'default')
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(ARCHIVE_DIR=directory.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.lot = ParkingLot.objects.create(name='Central', capacity=10)
+        recent = make_aware(datetime.now()) - timedelta(days=1)
+        ParkingTransaction.objects.bulk_create([
+            ParkingTransaction(parking_lot=self.lot, license_plate='A1', entry_time=aware(2024, 1, 31, 22),
+                               exit_time=aware(2024, 2, 1, 2), revenue=Decimal('8.00')),
+            ParkingTransaction(parking_lot=self.lot, license_plate='A2', entry_time=aware(2024, 2, 1, 1),
+                               exit_time=aware(2024, 2, 1, 3), revenue=Decimal('4.50')),
+            ParkingTransaction(parking_lot=self.lot, license_plate='A3', entry_time=aware(2024, 2, 1, 1),
+                               exit_time=None),
+            ParkingTransaction(parking_lot=self.lot, license_plate='A4', entry_time=recent - timedelta(hours=2),
+                               exit_time=recent, revenue=2),
+        ])
+        DirtyOccupancyHour.objects.all().delete()
+        self.buckets = hour_buckets(date(2024, 1, 31), date(2024, 2, 1))
+
+    def export(self, **params):
+        response = self.client.get('/api/parking-transaction/export/', params)
+        return pd.read_csv(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_closed_rows_move_to_monthly_files_and_stay_readable(self):
+        counts = hourly_counts(self.lot.id, self.buckets)
+        stays = period_stays(self.lot.id, date(2024, 1, 1), date(2024, 2, 29))
+        out = io.StringIO()
+        call_command('archive_transactions', older_than=30, stdout=out)
+
+        self.assertIn('Archived 2 transactions into 2 files', out.getvalue())
+        self.assertEqual([path.name for path in archived_partitions([self.lot.id])], ['2024-01.parquet', '2024-02.parquet'])
+        self.assertEqual(sorted(ParkingTransaction.objects.values_list('license_plate', flat=True)), ['A3', 'A4'])
+        self.assertFalse(DirtyOccupancyHour.objects.exists())
+
+        self.assertEqual(hourly_counts(self.lot.id, self.buckets), counts)
+        clear_stays_cache()
+        archived = period_stays(self.lot.id, date(2024, 1, 1), date(2024, 2, 29))
+        self.assertEqual(archived.ids.tolist(), stays.ids.tolist())
+        self.assertEqual(archived.exits.tolist(), stays.exits.tolist())
+        frame = self.export()
+        self.assertEqual(list(frame['License Plate']), ['A1', 'A2', 'A3', 'A4'])
+        self.assertEqual(frame['Exit Time'][0], '2024-02-01 02:00:00')
+        self.assertEqual(frame['Revenue'][1], 4.5)
+        self.assertEqual(list(self.export(start='2024-02-01', end='2024-02-29')['License Plate']), ['A2', 'A3'])
+
+    def test_rows_written_but_not_yet_deleted_are_counted_once(self):
+        counts = hourly_counts(self.lot.id, self.buckets)
+        closed = list(ParkingTransaction.objects.filter(license_plate__in=['A1', 'A2'])
+                      .order_by('id').values_list(*ARCHIVE_COLUMNS))
+        write_partition(self.lot.id, date(2024, 2, 1), closed[1:])
+        write_partition(self.lot.id, date(2024, 2, 1), closed[1:])
+        self.assertEqual(hourly_counts(self.lot.id, self.buckets), counts)
+        self.assertEqual(list(self.export()['License Plate']), ['A1', 'A2', 'A3', 'A4'])
+
+        call_command('archive_transactions', older_than=30, stdout=io.StringIO())
+        self.assertEqual(hourly_counts(self.lot.id, self.buckets), counts)
+        self.assertEqual(list(self.export()['License Plate']), ['A1', 'A2', 'A3', 'A4'])
+
+    def test_archiving_skips_the_per_row_delete_signals(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            archive_transactions(make_aware(datetime.now()) - timedelta(days=30))
+        # One change record for the lot, none per deleted row, and no hours to recompute
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(DirtyOccupancyHour.objects.exists())
+
+        ParkingTransaction.objects.get(license_plate='A4').delete()
+        self.assertTrue(DirtyOccupancyHour.objects.exists())
+
+    def test_rows_are_archived_in_keyset_pages(self):
+        ParkingTransaction.objects.bulk_create([
+            ParkingTransaction(parking_lot=self.lot, license_plate=f'B{i}', entry_time=aware(2024, 1, 31, 22),
+                               exit_time=aware(2024, 1, 31, 23)) for i in range(3)
+        ])
+        cutoff = make_aware(datetime.now()) - timedelta(days=30)
+        archived = archive_transactions(cutoff, batch_size=2)
+        self.assertEqual(archived, {(self.lot.id, date(2024, 1, 1)): 4, (self.lot.id, date(2024, 2, 1)): 1})
+        self.assertEqual(sorted(ParkingTransaction.objects.values_list('license_plate', flat=True)), ['A3', 'A4'])
+        rows = list(archived_transaction_rows(batch_size=1))
+        self.assertEqual([row[0] for row in rows], sorted(row[0] for row in rows))
+        self.assertEqual(list(self.export()['License Plate']), ['A1', 'A2', 'A3', 'A4', 'B0', 'B1', 'B2'])
+
+    def test_deleting_a_lot_removes_its_archive(self):
+        call_command('archive_transactions', older_than=30, stdout=io.StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lot.delete()
+        self.assertEqual(archived_partitions(), [])
+
+
+class LotAnalyticsTests(APITestCase):
+    def setUp(self):
+        clear_stays_cache()
+        self.addCleanup(clear_stays_cache)
+        self.lot = ParkingLot.objects.create(name='Central', capacity=2)
+        ParkingTransaction.objects.bulk_create([
+            ParkingTransaction(parking_lot=self.lot, license_plate='A1', entry_time=aware(2024, 3, 1, 8),
+                               exit_time=aware(2024, 3, 1, 9)),
+            ParkingTransaction(parking_lot=self.lot, license_plate='A2', entry_time=aware(2024, 3, 1, 8, 30),
+                               exit_time=aware(2024, 3, 1, 10, 30)),
+            ParkingTransaction(parking_lot=self.lot, license_plate='A3', entry_time=aware(2024, 2, 29, 23),
+                               exit_time=aware(2024, 3, 1, 0, 30)),
+            ParkingTransaction(parking_lot=self.lot, license_plate='A4', entry_time=aware(2024, 3, 1, 7),
+                               exit_time=None),
+            ParkingTransaction(parking_lot=self.lot, license_plate='A5', entry_time=aware(2024, 3, 2, 10),
+                               exit_time=aware(2024, 3, 2, 10, 10)),
+        ])
+        self.url = f'/api/parking-lot/{self.lot.id}'
+
+    def test_dwell_time(self):
+        data = self.client.get(f'{self.url}/dwell-time/', {'month': '2024-03'}).json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['mean_minutes'], 63.33)
+        self.assertEqual(data['percentiles']['p50'], 60.0)
+        self.assertEqual([bucket['count'] for bucket in data['histogram']], [1, 0, 0, 1, 1, 0, 0, 0, 0])
+        self.assertEqual(data['histogram'][-1], {'minutes_from': 1440, 'minutes_to': None, 'count': 0})
+        self.assertEqual(self.client.get(f'{self.url}/dwell-time/', {'month': '2024-02'}).json()['count'], 1)
+
+    def test_turnover(self):
+        rows = self.client.get(f'{self.url}/turnover/', {'month': '2024-03'}).json()
+        self.assertEqual(len(rows), 31)
+        self.assertEqual(rows[:2], [{'date': '2024-03-01', 'sessions': 3, 'turnover_rate': 1.5},
+                                    {'date': '2024-03-02', 'sessions': 1, 'turnover_rate': 0.5}])
+
+    def test_occupancy_curve_matches_a_count_per_mark(self):
+        data = self.client.get(f'{self.url}/occupancy-curve/',
+                               {'date': '2024-03-01', 'resolution': '30', 'layout': 'columns'}).json()
+        self.assertEqual(len(data['time']), 48)
+        self.assertEqual(data['time'][17], '08:30:00')
+        for moment, occupied in zip(data['time'], data['occupied']):
+            mark = make_aware(datetime.combine(date(2024, 3, 1), time.fromisoformat(moment)))
+            # A4 is still open, so parked ever since it came in
+            expected = ParkingTransaction.objects.filter(
+                Q(exit_time__gt=mark) | Q(exit_time__isnull=True), entry_time__lte=mark).count()
+            self.assertEqual(occupied, expected, moment)
+        self.assertEqual(data['occupancy_rate'][17], 150.0)
+
+    def test_open_sessions_are_parked_until_now(self):
+        with mock.patch('parking.analytics.timezone.now', return_value=aware(2024, 3, 1, 9, 15)):
+            rows = self.client.get(f'{self.url}/occupancy-curve/', {'date': '2024-03-01', 'resolution': '60'}).json()
+        # A4 counts from 07:00 until now; by 10:00 only A2 is left
+        self.assertEqual([row['occupied'] for row in rows[6:11]], [0, 1, 2, 2, 1])
+        self.assertEqual(rows[11]['occupied'], 0)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_curves_from_today_on_are_not_cached(self):
+        caches['dashboard'].clear()
+        self.assertIn('ETag', self.client.get(f'{self.url}/occupancy-curve/', {'date': '2024-03-01'}))
+        today = localdate()
+        params = {'date': today.isoformat(), 'resolution': '60'}
+        parked = []
+        for hour in (9, 10):
+            now = make_aware(datetime.combine(today, time(hour)))
+            with mock.patch('parking.analytics.timezone.now', return_value=now):
+                response = self.client.get(f'{self.url}/occupancy-curve/', params)
+            self.assertNotIn('ETag', response)
+            parked.append(response.json()[9]['occupied'])
+        # A4, open since March, is parked at 09:00 only once that has passed
+        self.assertEqual(parked, [0, 1])
+
+    def test_invalid_parameters(self):
+        for url, params in ((f'{self.url}/dwell-time/', {}), (f'{self.url}/turnover/', {'month': '2024-13'}),
+                            (f'{self.url}/occupancy-curve/', {'date': '2024-03-01', 'resolution': '7'}),
+                            (f'{self.url}/occupancy-curve/', {'date': 'today'})):
+            self.assertEqual(self.client.get(url, params).status_code, 400, (url, params))
+        self.assertEqual(self.client.get('/api/parking-lot/999/turnover/', {'month': '2024-03'}).status_code, 404)
+
+    def test_stays_crossing_months_are_counted_once(self):
+        stays = period_stays(self.lot.id, date(2024, 2, 1), date(2024, 3, 31))
+        self.assertEqual(len(stays), 5)
+        self.assertEqual(len(Stays.concat([month_stays(self.lot.id, date(2024, 2, 1))] * 2)), 1)
+
+    @override_settings(CACHES=LOCMEM_CACHES, ANALYTICS_CACHE_MONTHS=1)
+    def test_month_arrays_are_cached_until_the_lot_changes(self):
+        caches['dashboard'].clear()
+        march = month_stays(self.lot.id, date(2024, 3, 1))
+        with self.assertNumQueries(0):
+            self.assertIs(month_stays(self.lot.id, date(2024, 3, 1)), march)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ParkingTransaction.objects.create(parking_lot=self.lot, license_plate='A6',
+                                              entry_time=aware(2024, 3, 5, 8), exit_time=aware(2024, 3, 5, 9))
+        self.assertEqual(len(month_stays(self.lot.id, date(2024, 3, 1))), len(march) + 1)
+
+        # Only one lot-month fits: loading February evicts March
+        month_stays(self.lot.id, date(2024, 2, 1))
+        with self.assertNumQueries(1):
+            month_stays(self.lot.id, date(2024, 3, 1))
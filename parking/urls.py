@@ -1,24 +1,57 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (ParkingLotListView, SummaryView, RevenueLineView, RevenueBarView,
                     HistoricalOccupancyView, PeakHoursView, RevenueView, MonthlyRevenueView,
                     BatchImportParkingHistoryView, generate_parking_history_excel_template,
-                    BatchImportParkingTransactionView, generate_parking_transaction_excel_template)
+                    BatchImportParkingTransactionView, generate_parking_transaction_excel_template,
+                    ImportJobView, CacheStatsView, ParkingLotDetailView, BatchAnalyticsView,
+                    export_parking_transactions, export_parking_history, ParkingTransactionListView,
+                    GateEntryView, GateExitView, LiveOccupancyView, ParkedVehiclesView,
+                    DwellTimeView, TurnoverView, OccupancyCurveView)
 
-urlpatterns = [
-    path('summary/', SummaryView.as_view(), name='summary'),
-    path('parking-lots/', ParkingLotListView.as_view(), name='parking-lot-list'),
-    path('revenue-line/', RevenueLineView.as_view(), name='revenue-line'),
-    path('revenue-bar/', RevenueBarView.as_view(), name='revenue-bar'),
 
-    path('parking-lot/<int:pk>/historical-occupancy/', HistoricalOccupancyView.as_view(), name='parking-lot-historical-occupancy'),
-    path('parking-lot/<int:pk>/peak-hours/', PeakHoursView.as_view(), name='parking-lot-peak-hours'),
-    path('parking-lot/<int:pk>/revenue/', RevenueView.as_view(), name='parking-lot-revenue'),
-    path('parking-lot/<int:pk>/monthly-revenue/', MonthlyRevenueView.as_view(), name='parking-lot-monthly-revenue'),
+
+def read_urlpatterns(use_async=False):
+    # The dashboard read endpoints, as DRF views or as their async variants for ASGI
+    def view(sync_view, async_view):
+        return async_view if use_async else sync_view.as_view()
+
+    return [
+        path('summary/', view(SummaryView, async_views.summary), name='summary'),
+        path('parking-lots/', view(ParkingLotListView, async_views.parking_lot_list), name='parking-lot-list'),
+        path('revenue-line/', view(RevenueLineView, async_views.revenue_line), name='revenue-line'),
+        path('revenue-bar/', view(RevenueBarView, async_views.revenue_bar), name='revenue-bar'),
+
+        path('parking-lot/<int:pk>/historical-occupancy/', view(HistoricalOccupancyView, async_views.historical_occupancy), name='parking-lot-historical-occupancy'),
+        path('parking-lot/<int:pk>/peak-hours/', view(PeakHoursView, async_views.peak_hours), name='parking-lot-peak-hours'),
+        path('parking-lot/<int:pk>/revenue/', view(RevenueView, async_views.revenue), name='parking-lot-revenue'),
+        path('parking-lot/<int:pk>/monthly-revenue/', view(MonthlyRevenueView, async_views.monthly_revenue), name='parking-lot-monthly-revenue'),
+        path('parking-lot/<int:pk>/detail/', view(ParkingLotDetailView, async_views.parking_lot_detail), name='parking-lot-detail'),
+        path('parking-lot/<int:pk>/live/', view(LiveOccupancyView, async_views.live), name='parking-lot-live'),
+    ]
+
+
+urlpatterns = read_urlpatterns(getattr(settings, 'ASYNC_READ_VIEWS', False)) + [
+    path('analytics/batch/', BatchAnalyticsView.as_view(), name='batch-analytics'),
+    path('parking-lot/<int:pk>/dwell-time/', DwellTimeView.as_view(), name='parking-lot-dwell-time'),
+    path('parking-lot/<int:pk>/turnover/', TurnoverView.as_view(), name='parking-lot-turnover'),
+    path('parking-lot/<int:pk>/occupancy-curve/', OccupancyCurveView.as_view(), name='parking-lot-occupancy-curve'),
+
+    path('parking-lot/<int:pk>/entries/', GateEntryView.as_view(), name='parking-lot-entries'),
+    path('parking-lot/<int:pk>/exits/', GateExitView.as_view(), name='parking-lot-exits'),
 
     path('parking-history/import/', BatchImportParkingHistoryView.as_view(), name='batch_import_parking_history'),
     path('parking-history/template/', generate_parking_history_excel_template, name='generate_parking_history_excel_template'),
+    path('parking-history/export/', export_parking_history, name='export_parking_history'),
 
+    path('parking-transactions/', ParkingTransactionListView.as_view(), name='parking-transactions'),
+    path('parked-vehicles/', ParkedVehiclesView.as_view(), name='parked-vehicles'),
     path('parking-transaction/import/', BatchImportParkingTransactionView.as_view(), name='batch_import_parking_transaction'),
     path('parking-transaction/template/', generate_parking_transaction_excel_template, name='generate_parking_transaction_excel_template'),
+    path('parking-transaction/export/', export_parking_transactions, name='export_parking_transactions'),
+
+    path('imports/<int:pk>/', ImportJobView.as_view(), name='import-job'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
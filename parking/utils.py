@@ -0,0 +1,41 @@
+# utils.py
+import datetime
+
+from django.utils.timezone import make_aware
+
+
+def month_range(value):
+    # Half-open [first day, first day of next month) for a "YYYY-MM" string
+    start = datetime.datetime.strptime(value, "%Y-%m").date()
+    return start, next_month(start)
+
+
+def year_range(year):
+    start = datetime.date(int(year), 1, 1)
+    return start, datetime.date(start.year + 1, 1, 1)
+
+
+def next_month(day):
+    if day.month == 12:
+        return datetime.date(day.year + 1, 1, 1)
+    return datetime.date(day.year, day.month + 1, 1)
+
+
+def start_of_day(day):
+    return make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def normalize_plate(value):
+    # Same normalisation as ParkingTransaction.plate_key
+    return value.replace(' ', '').replace('-', '').upper()
+
+
+def plate_prefix_range(prefix):
+    """
+    Half-open [low, high) range of normalised plates starting with ``prefix``.
+
+    A range comparison is an index seek on every backend, unlike LIKE 'AB%', which SQLite and
+    non-C-collation PostgreSQL indexes can't serve.
+    """
+    low = normalize_plate(prefix)
+    return low, low[:-1] + chr(ord(low[-1]) + 1)
@@ -1,23 +1,41 @@
 # views.py
 import datetime
-import io
 import logging
-from django.db.models import Sum, Count
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+from django.db.models import Sum, Count, Avg, Q, OuterRef, Subquery
 from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, localdate, make_aware
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy
+from .models import ParkingLot, ParkingTransaction, ParkingHistory, HourlyOccupancy, ImportJob, MonthlyRevenueRollup
 from .serializers import (SummarySerializer, RevenueLineSerializer, RevenueBarSerializer, ParkingLotSerializer,
-                          ParkingLotDetailSerializer)
-from django.db.models.functions import TruncMonth
-from django.http import HttpResponse
-import pandas as pd
+                          ParkingLotDetailSerializer, ParkingTransactionSerializer, ImportJobSerializer)
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from .analytics import dwell_time, occupancy_curve, period_stays, turnover
+from .exports import EXPORTS, stream_csv, write_xlsx
+from .cache import cache_stats, cached_get
+from .jobs import submit_import
+from .metrics import render_metrics
+from .rollups import grand_total
+from .live import GateEventError, record_entry, record_exit, live_occupancy
+from .pagination import InvalidCursor, keyset_page
+from .renderers import Rows, wants_columns
+from .utils import month_range, year_range, start_of_day, normalize_plate, plate_prefix_range
+from .importers import (ImportValidationError, read_upload_chunks, import_parking_transactions,
+                        upsert_parking_history)
 import openpyxl
 from openpyxl.utils import get_column_letter
 
 
 class ParkingLotListView(APIView):
+    @cached_get('parking-lot-list', lambda request: [('lot', None)])
     def get(self, request):
         parking_lots = ParkingLot.objects.all()
         serializer = ParkingLotSerializer(parking_lots, many=True)
@@ -25,57 +43,328 @@ class ParkingLotListView(APIView):
 
 
 class HistoricalOccupancyView(APIView):
+    @cached_get('parking-lot-historical-occupancy', lambda request, pk: [('history', pk)])
     def get(self, request, pk):
         selected_month = request.query_params.get('month')
-        date = datetime.datetime.strptime(selected_month, "%Y-%m")
+        month_start, month_end = month_range(selected_month)
         occupancy_data = ParkingHistory.objects.filter(
             parking_lot_id=pk,
-            date__year=date.year,
-            date__month=date.month,
-        ).values('date', 'occupancy_rate')
+            date__gte=month_start,
+            date__lt=month_end,
+        ).values_list('date', 'occupancy_rate')
 
-        return Response(occupancy_data, status=status.HTTP_200_OK)
+        return Response(Rows(['date', 'occupancy_rate'], occupancy_data, wants_columns(request)),
+                        status=status.HTTP_200_OK)
 
 
 class PeakHoursView(APIView):
+    @cached_get('parking-lot-peak-hours', lambda request, pk: [('hourly', pk)])
     def get(self, request, pk):
         selected_date = request.query_params.get('date')
         peak_hours_data = HourlyOccupancy.objects.filter(
             parking_lot_id=pk,
             date=parse_date(selected_date) if selected_date else None
-        ).values('hour', 'occupancy_rate')
+        ).values_list('hour', 'occupancy_rate')
 
-        return Response(peak_hours_data, status=status.HTTP_200_OK)
+        return Response(Rows(['hour', 'occupancy_rate'], peak_hours_data, wants_columns(request)),
+                        status=status.HTTP_200_OK)
 
 
 class RevenueView(APIView):
+    @cached_get('parking-lot-revenue', lambda request, pk: [('history', pk)])
     def get(self, request, pk):
         selected_month = request.query_params.get('month')
-        date = datetime.datetime.strptime(selected_month, "%Y-%m")
+        month_start, month_end = month_range(selected_month)
         revenue_data = ParkingHistory.objects.filter(
             parking_lot_id=pk,
-            date__year=date.year,
-            date__month=date.month,
-        ).values('date', 'total_revenue')
+            date__gte=month_start,
+            date__lt=month_end,
+        ).values_list('date', 'total_revenue')
 
-        return Response(revenue_data, status=status.HTTP_200_OK)
+        return Response(Rows(['date', 'total_revenue'], revenue_data, wants_columns(request)),
+                        status=status.HTTP_200_OK)
 
 
 class MonthlyRevenueView(APIView):
+    @cached_get('parking-lot-monthly-revenue', lambda request, pk: [('history', pk)])
     def get(self, request, pk):
         selected_year = request.query_params.get('year')
-        monthly_revenue_data = ParkingHistory.objects.filter(
+        if not selected_year:
+            return Response([], status=status.HTTP_200_OK)
+        year_start, year_end = year_range(selected_year)
+        monthly_revenue_data = MonthlyRevenueRollup.objects.filter(
             parking_lot_id=pk,
-            date__year=selected_year if selected_year else None
-        ).annotate(month=TruncMonth('date')).values('month').annotate(total_revenue=Sum('total_revenue')).values('month', 'total_revenue')
+            month__gte=year_start,
+            month__lt=year_end,
+        ).order_by('month').values_list('month', 'total_revenue')
+
+        return Response(Rows(['month', 'total_revenue'], monthly_revenue_data, wants_columns(request)),
+                        status=status.HTTP_200_OK)
+
+
+
+def lot_summary(pk):
+    # The lot with its all-time revenue summed from the rollups, or None
+    return (
+        ParkingLot.objects
+        .filter(pk=pk)
+        .annotate(total_revenue=Subquery(
+            MonthlyRevenueRollup.objects
+            .filter(parking_lot=OuterRef('pk'))
+            .values('parking_lot')
+            .annotate(total=Sum('total_revenue'))
+            .values('total')
+        ))
+        .values('id', 'name', 'capacity', 'total_revenue')
+        .first()
+    )
+
+
+def lot_history(pk, selected_month=None, selected_year=None):
+    # (historical occupancy, daily revenue, monthly revenue) from one read of the history rows
+    month_start, month_end = month_range(selected_month) if selected_month else (None, None)
+    year_start, year_end = year_range(selected_year) if selected_year else (None, None)
+    ranges = []
+    if month_start:
+        ranges.append(Q(date__gte=month_start, date__lt=month_end))
+    if year_start:
+        ranges.append(Q(date__gte=year_start, date__lt=year_end))
+
+    historical_occupancy, revenue_data, monthly_revenue = [], [], {}
+    if ranges:
+        history = ParkingHistory.objects.filter(reduce(or_, ranges), parking_lot_id=pk).order_by('date').values_list(
+            'date', 'occupancy_rate', 'total_revenue')
+        for day, occupancy_rate, total_revenue in history:
+            if month_start and month_start <= day < month_end:
+                historical_occupancy.append({'date': day, 'occupancy_rate': occupancy_rate})
+                revenue_data.append({'date': day, 'total_revenue': total_revenue})
+            if year_start and year_start <= day < year_end:
+                month = day.replace(day=1)
+                monthly_revenue[month] = monthly_revenue.get(month, 0) + total_revenue
+    return historical_occupancy, revenue_data, [
+        {'month': month, 'total_revenue': total_revenue} for month, total_revenue in monthly_revenue.items()
+    ]
+
+
+def lot_peak_hours(pk, selected_date=None):
+    if not selected_date:
+        return []
+    return list(HourlyOccupancy.objects.filter(
+        parking_lot_id=pk,
+        date=parse_date(selected_date),
+    ).order_by('hour').values('hour', 'occupancy_rate'))
+
+
+def lot_detail(parking_lot, history, peak_hours):
+    historical_occupancy, revenue_data, monthly_revenue_data = history
+    return {
+        'summary': {
+            'id': parking_lot['id'],
+            'name': parking_lot['name'],
+            'capacity': parking_lot['capacity'],
+            'totalRevenue': parking_lot['total_revenue'] or 0,
+        },
+        'historicalOccupancy': historical_occupancy,
+        'peakHours': peak_hours,
+        'revenueData': revenue_data,
+        'monthlyRevenueData': monthly_revenue_data,
+    }
+
+
+def parking_lot_detail_data(pk, selected_month=None, selected_date=None, selected_year=None):
+    """
+    Data for ParkingLotDetailSerializer in three queries: the lot with its all-time revenue,
+    the history rows covering the selected month and year, and the selected day's hours.
+    """
+    parking_lot = lot_summary(pk)
+    if parking_lot is None:
+        return None
+    return lot_detail(parking_lot, lot_history(pk, selected_month, selected_year), lot_peak_hours(pk, selected_date))
+
+
+class ParkingLotDetailView(APIView):
+    @cached_get('parking-lot-detail', lambda request, pk: [('lot', pk), ('history', pk), ('hourly', pk)])
+    def get(self, request, pk):
+        # Everything the lot page needs, with the same month/date/year parameters as the single views
+        detail_data = parking_lot_detail_data(
+            pk,
+            selected_month=request.query_params.get('month'),
+            selected_date=request.query_params.get('date'),
+            selected_year=request.query_params.get('year'),
+        )
+        if detail_data is None:
+            return Response({'error': 'Parking lot not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = ParkingLotDetailSerializer(detail_data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def parse_month(value):
+    # First and last day of a "YYYY-MM" month, or None when missing or malformed
+    try:
+        month_start, month_end = month_range(value or '')
+    except ValueError:
+        return None
+    return month_start, month_end - datetime.timedelta(days=1)
+
+
+class DwellTimeView(APIView):
+    # ?month=YYYY-MM: how long the stays that began in the month lasted
+    @cached_get('parking-lot-dwell-time', lambda request, pk: [('transaction', pk)])
+    def get(self, request, pk):
+        month = parse_month(request.query_params.get('month'))
+        if month is None:
+            return Response({'error': 'A valid month (YYYY-MM) is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        get_object_or_404(ParkingLot, pk=pk)
+        return Response(dwell_time(period_stays(pk, *month), *month), status=status.HTTP_200_OK)
+
+
+class TurnoverView(APIView):
+    # ?month=YYYY-MM: sessions started per day, and per space
+    @cached_get('parking-lot-turnover', lambda request, pk: [('lot', pk), ('transaction', pk)])
+    def get(self, request, pk):
+        month = parse_month(request.query_params.get('month'))
+        if month is None:
+            return Response({'error': 'A valid month (YYYY-MM) is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        parking_lot = get_object_or_404(ParkingLot, pk=pk)
+        rows = turnover(period_stays(pk, *month), parking_lot.capacity, *month)
+        return Response(Rows(['date', 'sessions', 'turnover_rate'], rows, wants_columns(request)),
+                        status=status.HTTP_200_OK)
+
+
+OCCUPANCY_CURVE_RESOLUTIONS = {1, 5, 10, 15, 30, 60}
+
+
+def curve_is_settled(request, pk):
+    # Open sessions count as parked until now, so curves of today and later change by the minute
+    try:
+        selected_date = parse_date(request.query_params.get('date') or '')
+    except ValueError:
+        return True
+    return selected_date is None or selected_date < localdate()
+
+
+class OccupancyCurveView(APIView):
+    # ?date=YYYY-MM-DD&resolution=minutes: vehicles parked through the day
+    @cached_get('parking-lot-occupancy-curve', lambda request, pk: [('lot', pk), ('transaction', pk)],
+                cacheable=curve_is_settled)
+    def get(self, request, pk):
+        try:
+            selected_date = parse_date(request.query_params.get('date') or '')
+            resolution = int(request.query_params.get('resolution', 1))
+        except ValueError:
+            selected_date = resolution = None
+        if selected_date is None or resolution not in OCCUPANCY_CURVE_RESOLUTIONS:
+            return Response({'error': 'A valid date (YYYY-MM-DD) and resolution (1, 5, 10, 15, 30 or 60) '
+                                      'are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        parking_lot = get_object_or_404(ParkingLot, pk=pk)
+        rows = occupancy_curve(period_stays(pk, selected_date, selected_date), parking_lot.capacity,
+                               selected_date, resolution)
+        return Response(Rows(['time', 'occupied', 'occupancy_rate'], rows, wants_columns(request)),
+                        status=status.HTTP_200_OK)
+
+
+BATCH_METRICS = {'occupancy', 'revenue', 'peak_hours'}
+
+
+def columns(rows, names):
+    # Column-oriented payload: one list per column instead of one dict per row
+    data = {name: [] for name in names}
+    for row in rows:
+        for name, value in zip(names, row):
+            data[name].append(value)
+    return data
+
+
+def batch_analytics_data(lot_ids, start_date, end_date, metrics):
+    """
+    Occupancy/revenue for many lots over a date range (end inclusive) with one grouped query
+    per section, whatever the number of lots.
+    """
+    parking_lots = ParkingLot.objects.order_by('id')
+    history = ParkingHistory.objects.filter(date__gte=start_date, date__lt=end_date + datetime.timedelta(days=1))
+    hourly = HourlyOccupancy.objects.filter(date__gte=start_date, date__lte=end_date)
+    if lot_ids is not None:
+        parking_lots = parking_lots.filter(id__in=lot_ids)
+        history = history.filter(parking_lot_id__in=lot_ids)
+        hourly = hourly.filter(parking_lot_id__in=lot_ids)
+
+    data = {
+        'start': start_date,
+        'end': end_date,
+        'lots': columns(parking_lots.values_list('id', 'name', 'capacity'), ['id', 'name', 'capacity']),
+    }
+
+    daily_fields = [field for metric, field in (('occupancy', 'occupancy_rate'), ('revenue', 'total_revenue'))
+                    if metric in metrics]
+    if daily_fields:
+        data['daily'] = columns(
+            history.order_by('parking_lot_id', 'date').values_list('parking_lot_id', 'date', *daily_fields),
+            ['lot', 'date', *daily_fields],
+        )
+        totals = {'days': Count('id')}
+        if 'occupancy' in metrics:
+            totals['average_occupancy_rate'] = Avg('occupancy_rate')
+        if 'revenue' in metrics:
+            totals['total_revenue'] = Sum('total_revenue')
+        data['totals'] = columns(
+            history.values('parking_lot_id').annotate(**totals).order_by('parking_lot_id')
+            .values_list('parking_lot_id', *totals),
+            ['lot', *totals],
+        )
+
+    if 'peak_hours' in metrics:
+        data['peakHours'] = columns(
+            hourly.values('parking_lot_id', 'hour').annotate(average_occupancy_rate=Avg('occupancy_rate'))
+            .order_by('parking_lot_id', 'hour').values_list('parking_lot_id', 'hour', 'average_occupancy_rate'),
+            ['lot', 'hour', 'average_occupancy_rate'],
+        )
+    return data
+
+
+def batch_scopes(request):
+    lots = request.query_params.get('lots', 'all')
+    if lots == 'all':
+        return [('lot', None), ('history', None), ('hourly', None)]
+    lot_ids = [int(lot_id) for lot_id in lots.split(',') if lot_id.strip().isdigit()]
+    if not lot_ids:
+        return [('lot', None), ('history', None), ('hourly', None)]
+    return [(table, lot_id) for lot_id in lot_ids for table in ('lot', 'history', 'hourly')]
+
+
+class BatchAnalyticsView(APIView):
+    @cached_get('batch-analytics', batch_scopes)
+    def get(self, request):
+        # ?lots=1,2,3 or all, start/end as YYYY-MM-DD (inclusive), metrics=occupancy,revenue,peak_hours
+        lots = request.query_params.get('lots', 'all')
+        try:
+            lot_ids = None if lots == 'all' else [int(lot_id) for lot_id in lots.split(',') if lot_id.strip()]
+        except ValueError:
+            return Response({'error': "lots must be 'all' or a comma-separated list of ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(monthly_revenue_data, status=status.HTTP_200_OK)
+        try:
+            start_date = parse_date(request.query_params.get('start') or '')
+            end_date = parse_date(request.query_params.get('end') or '')
+        except ValueError:
+            start_date = end_date = None
+        if not start_date or not end_date or end_date < start_date:
+            return Response({'error': 'Valid start and end dates (YYYY-MM-DD) are required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
+        metrics = set(request.query_params.get('metrics', 'occupancy,revenue').split(','))
+        unknown = metrics - BATCH_METRICS
+        if unknown:
+            return Response({'error': f"Unknown metrics: {', '.join(sorted(unknown))}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(batch_analytics_data(lot_ids, start_date, end_date, metrics), status=status.HTTP_200_OK)
 
 
 class SummaryView(APIView):
+    @cached_get('summary', lambda request: [('lot', None), ('history', None)])
     def get(self, request):
-        total_revenue = ParkingHistory.objects.aggregate(totalRevenue=Sum('total_revenue'))['totalRevenue'] or 0
+        total_revenue = grand_total()
         total_lots = ParkingLot.objects.count()
         total_capacity = ParkingLot.objects.aggregate(totalCapacity=Sum('capacity'))['totalCapacity'] or 0
 
@@ -89,32 +378,29 @@ class SummaryView(APIView):
 
 
 class RevenueLineView(APIView):
+    @cached_get('revenue-line', lambda request: [('history', None)])
     def get(self, request):
         try:
-            # Aggregate monthly revenue data
+            # Aggregate monthly revenue data from the per-lot rollups
             revenue_data = (
-                ParkingHistory.objects
-                .values('date__month', 'date__year')
+                MonthlyRevenueRollup.objects
+                .filter(parking_lot__isnull=False)
+                .values('month')
                 .annotate(monthly_revenue=Sum('total_revenue'))
-                .order_by('date__year', 'date__month')
+                .order_by('month')
+                .values_list('month', 'monthly_revenue')
             )
 
-            # Prepare the data for the response
-            response_data = []
-            for entry in revenue_data:
-                month_year = datetime.date(entry['date__year'], entry['date__month'], 1).strftime('%B %Y')
-                response_data.append({
-                    'month': month_year,
-                    'revenue': entry['monthly_revenue']
-                })
-
-            return Response(response_data, status=status.HTTP_200_OK)
+            response_data = [(month.strftime('%B %Y'), revenue) for month, revenue in revenue_data]
+            return Response(Rows(['month', 'revenue'], response_data, wants_columns(request)),
+                            status=status.HTTP_200_OK)
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class RevenueBarView(APIView):
+    @cached_get('revenue-bar', lambda request: [('lot', None), ('history', None)])
     def get(self, request):
         try:
             # Get the month and year from the request query parameters
@@ -124,68 +410,217 @@ class RevenueBarView(APIView):
             if not month or not year:
                 return Response({'error': 'Month and year are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Filter the ParkingHistory records for the selected month and year
+            # Read the selected month's per-lot rollups
+            month_start = datetime.date(int(year), int(month), 1)
             revenue_data = (
-                ParkingHistory.objects
-                .filter(date__year=year, date__month=month)
+                MonthlyRevenueRollup.objects
+                .filter(month=month_start, parking_lot__isnull=False)
                 .values('parking_lot__name')
                 .annotate(monthly_revenue=Sum('total_revenue'))
                 .order_by('parking_lot__name')
+                .values_list('parking_lot__name', 'monthly_revenue')
             )
 
-            # Prepare the data for the response
-            response_data = []
-            for entry in revenue_data:
-                response_data.append({
-                    'lotName': entry['parking_lot__name'],
-                    'revenue': entry['monthly_revenue']
-                })
-
-            return Response(response_data, status=status.HTTP_200_OK)
+            return Response(Rows(['lotName', 'revenue'], revenue_data, wants_columns(request)),
+                            status=status.HTTP_200_OK)
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+CACHED_ENDPOINTS = ['summary', 'parking-lot-list', 'revenue-line', 'revenue-bar', 'parking-lot-historical-occupancy',
+                    'parking-lot-peak-hours', 'parking-lot-revenue', 'parking-lot-monthly-revenue', 'parking-lot-detail',
+                    'batch-analytics', 'parking-lot-dwell-time', 'parking-lot-turnover', 'parking-lot-occupancy-curve']
+
+
+class CacheStatsView(APIView):
+    def get(self, request):
+        return Response(cache_stats(CACHED_ENDPOINTS), status=status.HTTP_200_OK)
+
+
+def import_in_background(request):
+    # ?background=0/1 overrides the IMPORT_IN_BACKGROUND setting for a single upload
+    flag = request.query_params.get('background')
+    if flag is None:
+        return getattr(settings, 'IMPORT_IN_BACKGROUND', False)
+    return flag.lower() in ('1', 'true', 'yes')
+
+
+def queue_import(kind, file):
+    job = submit_import(kind, file)
+    return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': reverse('import-job', args=[job.id])})
+
+
+TRANSACTION_PAGE_SIZE = 50
+TRANSACTION_MAX_PAGE_SIZE = 500
+
+
+def parse_time_bound(value, end=False):
+    # A datetime is used as is; a date covers that whole day, so an end date is inclusive
+    day = parse_date(value)
+    if day is not None:
+        return start_of_day(day + datetime.timedelta(days=1) if end else day)
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(value)
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+class ParkingTransactionListView(APIView):
+    """
+    ?lot=1,2&plate=ABC123&start=...&end=...&status=open|closed&limit=50&cursor=...
+
+    Newest first, keyset-paginated on (entry_time, id): follow ``next`` for the following page.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        transactions = ParkingTransaction.objects.select_related('parking_lot')
+        try:
+            if params.get('lot'):
+                transactions = transactions.filter(
+                    parking_lot_id__in=[int(lot_id) for lot_id in params['lot'].split(',') if lot_id.strip()])
+            if params.get('start'):
+                transactions = transactions.filter(entry_time__gte=parse_time_bound(params['start']))
+            if params.get('end'):
+                transactions = transactions.filter(entry_time__lt=parse_time_bound(params['end'], end=True))
+            limit = min(int(params.get('limit', TRANSACTION_PAGE_SIZE)), TRANSACTION_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'Invalid lot, start, end or limit.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if params.get('plate'):
+            transactions = transactions.filter(plate_key=normalize_plate(params['plate']))
+        transaction_status = params.get('status')
+        if transaction_status in ('open', 'closed'):
+            transactions = transactions.filter(exit_time__isnull=transaction_status == 'open')
+        elif transaction_status:
+            return Response({'error': 'status must be open or closed.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            rows, next_cursor = keyset_page(transactions, params.get('cursor'), limit)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if next_cursor:
+            query = params.copy()
+            query['cursor'] = next_cursor
+            next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+        return Response({
+            'results': ParkingTransactionSerializer(rows, many=True).data,
+            'next': next_url,
+        }, status=status.HTTP_200_OK)
+
+
+class ParkedVehiclesView(APIView):
+    """
+    ?plate=AB1&lot=1&limit=50: vehicles parked right now whose normalised plate starts with ``plate``.
+
+    Served from the partial index on open sessions, so the cost follows the number of cars
+    currently parked rather than the size of the transaction history.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        plate = normalize_plate(params.get('plate', ''))
+        if not plate:
+            return Response({'error': 'plate is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(params.get('limit', TRANSACTION_PAGE_SIZE)), TRANSACTION_MAX_PAGE_SIZE)
+            lot_id = int(params['lot']) if params.get('lot') else None
+        except ValueError:
+            return Response({'error': 'Invalid lot or limit.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        low, high = plate_prefix_range(plate)
+        sessions = ParkingTransaction.objects.select_related('parking_lot').filter(
+            exit_time__isnull=True, plate_key__gte=low, plate_key__lt=high)
+        if lot_id is not None:
+            sessions = sessions.filter(parking_lot_id=lot_id)
+        sessions = sessions.order_by('plate_key', 'parking_lot_id')[:limit]
+        return Response(ParkingTransactionSerializer(sessions, many=True).data, status=status.HTTP_200_OK)
+
+
+def parse_gate_event(data):
+    # {"licensePlate": "...", "time": ISO datetime (default now), "revenue": "12.50" (exits only)}
+    license_plate = (data.get('licensePlate') or '').strip()
+    if not license_plate:
+        raise ValueError('licensePlate is required.')
+    event_time = None
+    if data.get('time'):
+        event_time = parse_datetime(str(data['time']))
+        if event_time is None:
+            raise ValueError('time must be an ISO 8601 datetime.')
+        if is_naive(event_time):
+            event_time = make_aware(event_time)
+    revenue = None
+    if data.get('revenue') not in (None, ''):
+        try:
+            revenue = Decimal(str(data['revenue']))
+        except InvalidOperation:
+            raise ValueError('revenue must be a number.')
+    return license_plate, event_time, revenue
+
+
+class GateEntryView(APIView):
+    def post(self, request, pk):
+        parking_lot = get_object_or_404(ParkingLot, pk=pk)
+        try:
+            license_plate, entry_time, _ = parse_gate_event(request.data)
+            parking_transaction = record_entry(parking_lot, license_plate, entry_time)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except GateEventError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'transaction': ParkingTransactionSerializer(parking_transaction).data,
+                         'live': live_occupancy(pk)}, status=status.HTTP_201_CREATED)
+
+
+class GateExitView(APIView):
+    def post(self, request, pk):
+        parking_lot = get_object_or_404(ParkingLot, pk=pk)
+        try:
+            license_plate, exit_time, revenue = parse_gate_event(request.data)
+            parking_transaction = record_exit(parking_lot, license_plate, exit_time, revenue)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except GateEventError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'transaction': ParkingTransactionSerializer(parking_transaction).data,
+                         'live': live_occupancy(pk)}, status=status.HTTP_200_OK)
+
+
+class LiveOccupancyView(APIView):
+    # Not response-cached: the counter row is a primary key read and changes on every gate event
+    def get(self, request, pk):
+        data = live_occupancy(pk)
+        if data is None:
+            return Response({'error': 'Parking lot not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class ImportJobView(APIView):
+    def get(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
 class BatchImportParkingHistoryView(APIView):
     def post(self, request):
         # Check if the 'file' is in request.FILES
         if 'file' not in request.FILES:
             return Response({'error': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
         file = request.FILES['file']
+        if import_in_background(request):
+            return queue_import(ImportJob.KIND_PARKING_HISTORY, file)
         try:
-            workbook = openpyxl.load_workbook(io.BytesIO(file.read()))
-            sheet = workbook.active
-
-            records = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip the header row
-                parking_lot_name, date_v, occupancy_rate, total_revenue = row
-
-                try:
-                    parking_lot = ParkingLot.objects.get(name=parking_lot_name)
-
-                    # Check if date is already a datetime object
-                    if isinstance(date_v, datetime.datetime):
-                        date_v = date_v.date()  # Convert to date if it's a datetime
-                    elif isinstance(date_v, str):
-                        date_v = datetime.datetime.strptime(date_v, '%Y-%m-%d').date()
-
-                    occupancy_rate = float(occupancy_rate) if occupancy_rate else None
-                    total_revenue = float(total_revenue)
-
-                    records.append(ParkingHistory(
-                        parking_lot=parking_lot,
-                        date=date_v,
-                        occupancy_rate=occupancy_rate,
-                        total_revenue=total_revenue
-                    ))
-                except ParkingLot.DoesNotExist:
-                    return Response({'error': f"Parking lot {parking_lot_name} does not exist."}, status=status.HTTP_400_BAD_REQUEST)
-                except Exception as e:
-                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-            ParkingHistory.objects.bulk_create(records)
-            return Response({'success': 'Data imported successfully!'}, status=status.HTTP_200_OK)
+            # Upsert on (parking_lot, date) so re-uploading a corrected sheet doesn't duplicate days
+            counts = upsert_parking_history(read_upload_chunks(file))
+            return Response({'success': 'Data imported successfully!', **counts}, status=status.HTTP_200_OK)
 
+        except ImportValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': f"Error processing file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -218,22 +653,13 @@ class BatchImportParkingTransactionView(APIView):
         file = request.FILES.get('file')
         if not file:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        if import_in_background(request):
+            return queue_import(ImportJob.KIND_PARKING_TRANSACTION, file)
 
         try:
-            df = pd.read_excel(file)
-            transactions = []
-            for _, row in df.iterrows():
-                lot_name = row['Parking Lot']
-                lot = ParkingLot.objects.get(name=lot_name)
-                transactions.append(ParkingTransaction(
-                    parking_lot=lot,
-                    license_plate=row['License Plate'],
-                    entry_time=parse_datetime(row['Entry Time']),
-                    exit_time=parse_datetime(row['Exit Time']),
-                    revenue=row['Revenue']
-                ))
-            ParkingTransaction.objects.bulk_create(transactions)
-            return Response({"status": "success"}, status=status.HTTP_201_CREATED)
+            # Stream the file in chunks instead of loading it into a DataFrame at once
+            imported = import_parking_transactions(read_upload_chunks(file))
+            return Response({"status": "success", "imported": imported}, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -259,4 +685,50 @@ def generate_parking_transaction_excel_template(request):
     # Save the workbook to the response
     wb.save(response)
 
-    return response
\ No newline at end of file
+    return response
+
+
+def export_data(request, kind):
+    # ?format=csv|xlsx&lot=1,2&start=YYYY-MM-DD&end=YYYY-MM-DD (all optional, end inclusive)
+    headers, rows, title = EXPORTS[kind]
+    export_format = request.GET.get('format', 'csv')
+    try:
+        parking_lot_ids = [int(lot_id) for lot_id in request.GET.get('lot', '').split(',') if lot_id.strip()]
+        start_date = parse_date(request.GET.get('start') or '')
+        end_date = parse_date(request.GET.get('end') or '')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid lot or date filter.'}, status=400)
+    if (request.GET.get('start') and not start_date) or (request.GET.get('end') and not end_date):
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD.'}, status=400)
+    if export_format not in ('csv', 'xlsx'):
+        return JsonResponse({'error': 'format must be csv or xlsx.'}, status=400)
+
+    selected_rows = rows(parking_lot_ids, start_date, end_date)
+    filename = f"{kind}_export.{export_format}"
+    if export_format == 'csv':
+        # Rows are written as the database cursor yields them; nothing is buffered
+        response = StreamingHttpResponse(stream_csv(headers, selected_rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+
+    return FileResponse(
+        write_xlsx(headers, selected_rows, title),
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+@require_GET
+def export_parking_transactions(request):
+    return export_data(request, 'parking_transaction')
+
+
+@require_GET
+def export_parking_history(request):
+    return export_data(request, 'parking_history')
+
+
+@require_GET
+def metrics(request):
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
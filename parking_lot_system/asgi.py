@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_lot_system.settings')
+# Route the read endpoints to parking.async_views; set to 0 to keep the DRF views under ASGI
+os.environ.setdefault('PARKING_ASYNC_READ_VIEWS', '1')
+# Async views run their queries in sync_to_async worker threads, where persistent connections
+# are never closed at the end of a request; open one per request instead
+os.environ.setdefault('PARKING_DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'parking.middleware.MetricsMiddleware',
+    'parking.middleware.ProfilingMiddleware',
+    'parking.middleware.ReplicaReadMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,12 +81,80 @@ WSGI_APPLICATION = 'parking_lot_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# SQLite by default, in WAL mode so dashboard reads carry on while an import writes, with writers
+# queueing on the lock for up to 20s instead of failing. PARKING_DB_ENGINE=postgresql switches to
+# Postgres (PARKING_DB_NAME, _USER, _PASSWORD, _HOST, _PORT). Connections are kept for
+# PARKING_DB_CONN_MAX_AGE seconds and checked before reuse; asgi.py defaults it to 0.
+#
+# PARKING_DB_REPLICA adds a read replica: a file path for SQLite, a host for Postgres. Analytics
+# reads of GET requests go there (see parking.routers); to try it locally, copy db.sqlite3 to
+# the replica file and start the server with PARKING_DB_REPLICA=<that file>.
+
+DB_ENGINE = os.environ.get('PARKING_DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('PARKING_DB_CONN_MAX_AGE', '60'))
+DB_REPLICA = os.environ.get('PARKING_DB_REPLICA')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PARKING_DB_NAME', 'parking'),
+            'USER': os.environ.get('PARKING_DB_USER', 'parking'),
+            'PASSWORD': os.environ.get('PARKING_DB_PASSWORD', ''),
+            'HOST': os.environ.get('PARKING_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('PARKING_DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'application_name': 'parking_lot_system',
+                'options': '-c statement_timeout=30000',
+            },
+        }
     }
-}
+    if DB_REPLICA:
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': DB_REPLICA,
+            'OPTIONS': {**DATABASES['default']['OPTIONS'],
+                        'options': '-c statement_timeout=30000 -c default_transaction_read_only=on'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('PARKING_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 20,
+                # Take the write lock when the transaction starts, so it can wait for the busy
+                # timeout instead of failing with "database is locked" on upgrade
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-65536;'
+                    'PRAGMA mmap_size=268435456'
+                ),
+            },
+        }
+    }
+    if DB_REPLICA:
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'NAME': DB_REPLICA,
+            'OPTIONS': {**DATABASES['default']['OPTIONS'],
+                        'init_command': DATABASES['default']['OPTIONS']['init_command'] + ';PRAGMA query_only=1'},
+        }
+
+if DB_REPLICA:
+    # Tests run against the primary's test database for both aliases
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_READ_REPLICA = 'replica'
+DATABASE_ROUTERS = ['parking.routers.ReadReplicaRouter']
 
 
 # Password validation
@@ -126,9 +198,47 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Dashboard responses are cached under the change markers of the tables and lots they
+# read (see parking.cache); every committed write to a table sets the markers of the lots
+# it touched and the table-wide one, so only the affected responses are recomputed. Use a
+# backend shared by every process (file, Redis, Memcached) so background workers' writes are seen.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'dashboard_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+DASHBOARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Batch imports are spooled to disk and processed by `manage.py process_imports`;
+# an upload can still be processed inline with ?background=0
+IMPORT_IN_BACKGROUND = True
+IMPORT_SPOOL_DIR = BASE_DIR / 'import_spool'
+# Seconds without a heartbeat before a running import is considered dead and re-queued
+IMPORT_JOB_TIMEOUT = 300
+
+# Closed transactions moved out of the table by `manage.py archive_transactions`, as
+# zstd-compressed Parquet files per lot and month; occupancy recompute and exports read them back
+ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Lot-months of transaction arrays kept in memory by parking.analytics, per process
+ANALYTICS_CACHE_MONTHS = 128
+
 # Allow all origins (not recommended for production)
 CORS_ALLOW_ALL_ORIGINS = True
 
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'parking.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 # Alternatively, specify allowed origins
 # CORS_ALLOWED_ORIGINS = [
 #     "http://localhost:3000",  # For development if your React app is running on port 3000
@@ -150,3 +260,16 @@ CORS_ALLOW_ALL_ORIGINS = True
 #     'DELETE',
 #     'OPTIONS',
 # ]
+
+# Serve the read endpoints from parking.async_views; asgi.py turns this on unless the
+# environment says otherwise
+ASYNC_READ_VIEWS = os.environ.get('PARKING_ASYNC_READ_VIEWS', '0') == '1'
+# Let async views run independent queries on separate connections at the same time
+ASYNC_CONCURRENT_QUERIES = True
+
+# Opt-in request profiling, see parking.middleware.ProfilingMiddleware. Off means no overhead at all:
+# the middleware is dropped from the stack when the server starts
+PROFILING_ENABLED = os.environ.get('PARKING_PROFILING', '0') == '1'
+PROFILING_TOKEN = os.environ.get('PARKING_PROFILING_TOKEN')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PARKING_PROFILING_SAMPLE_RATE', '0'))
+PROFILING_DIR = BASE_DIR / 'profiles'